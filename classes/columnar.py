@@ -0,0 +1,233 @@
+"""
+PURPOSE
+Binary columnar copy of the cleaned database. Loading it is just a memory
+map: no text parsing, and several processes reading the same file share
+it through the page cache.
+
+FILE LAYOUT
+8 bytes      magic, b'MOVCOL01'
+4 bytes      little endian length of the JSON header
+JSON header  {"rows": number of rows,
+              "byteorder": "little" or "big",
+              "columns": [{"name": column name,
+                           "typecode": array typecode of the codes,
+                           "offset": byte offset of the column,
+                           "values": list of string values}, ...]}
+columns      one fixed width integer code per row, each column starting
+             on an 8 byte boundary. Code i of a column stands for
+             values[i] of that column.
+
+The schema is fixed (see COLUMNS). Titles are not stored, they are only
+kept in the CSV for the report.
+
+AUTHOR
+Warren Lacaba
+"""
+
+import csv
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+MAGIC = b'MOVCOL01'
+COLUMNS = ('genre', 'company', 'release', 'prod_budget', 'revenue')
+ALIGN = 8
+
+def is_columnar(path):
+    """
+    PURPOSE
+    Check by extension if a database path is a columnar file.
+
+    INPUT
+    path: name of database, path and everything
+
+    OUTPUT
+    True for .bin files
+    """
+    return path.endswith('.bin')
+
+def _typecode(num_values):
+    """
+    Smallest unsigned array typecode that can hold num_values codes
+    """
+    if num_values <= 0xFF:
+        return 'B'
+    if num_values <= 0xFFFF:
+        return 'H'
+    return 'I'
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+def write_columnar(rows, path):
+    """
+    PURPOSE
+    Write rows to a columnar file.
+
+    INPUT
+    rows: iterable of dicts of column name -> string value, with at least
+          the columns in COLUMNS
+    path: where to write the file
+
+    OUTPUT
+    num_rows: number of rows written
+    """
+    codes = {name: array('I') for name in COLUMNS}
+    value_codes = {name: {} for name in COLUMNS}
+    num_rows = 0
+
+    for row in rows:
+        num_rows += 1
+        for name in COLUMNS:
+            column_codes = value_codes[name]
+            value = row[name]
+            if value not in column_codes:
+                column_codes[value] = len(column_codes)
+            codes[name].append(column_codes[value])
+
+    #Sort each value dictionary so the same values get the same codes
+    #no matter what order the rows came in
+    columns = []
+    for name in COLUMNS:
+        values = sorted(value_codes[name])
+        remap = [0] * len(values)
+        for new_code, value in enumerate(values):
+            remap[value_codes[name][value]] = new_code
+        typecode = _typecode(len(values))
+        columns.append((name, values,
+                        array(typecode, [remap[code] for code in codes[name]])))
+
+    #Offsets depend on the header length, which depends on the offsets, so
+    #leave room for the offsets by sizing the header with a large number
+    def header_bytes(offsets):
+        header = {'rows': num_rows,
+                  'byteorder': sys.byteorder,
+                  'columns': [{'name': columns[i][0],
+                               'typecode': columns[i][2].typecode,
+                               'offset': offsets[i],
+                               'values': columns[i][1]}
+                              for i in range(len(columns))]}
+        return json.dumps(header).encode('utf-8')
+
+    placeholder = header_bytes([10 ** 15] * len(columns))
+    offsets = []
+    offset = _aligned(len(MAGIC) + 4 + len(placeholder))
+    for name, values, column in columns:
+        offsets.append(offset)
+        offset = _aligned(offset + column.itemsize * len(column))
+
+    header = header_bytes(offsets).ljust(len(placeholder))
+
+    with open(path, 'wb') as write:
+        write.write(MAGIC)
+        write.write(struct.pack('<I', len(header)))
+        write.write(header)
+        for i in range(len(columns)):
+            write.write(b'\0' * (offsets[i] - write.tell()))
+            columns[i][2].tofile(write)
+
+    return num_rows
+
+def csv_to_columnar(csv_path, path):
+    """
+    PURPOSE
+    Write a columnar copy of a cleaned CSV database.
+
+    INPUT
+    csv_path: cleaned database, eg. data/new_database2.csv
+    path: where to write the columnar file
+
+    OUTPUT
+    num_rows: number of rows written
+    """
+    with open(csv_path, 'r', encoding='utf-8') as read:
+        return write_columnar(csv.DictReader(read), path)
+
+class ColumnarDataset:
+    """
+    PURPOSE
+    A memory mapped columnar file. columns[name] is a read only
+    memoryview of the integer codes of that column, backed directly by
+    the mapped file.
+
+    INPUT
+    path: path of a file written by write_columnar
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(path + ' is not a columnar database')
+
+        start = len(MAGIC) + 4
+        length = struct.unpack('<I', self._map[len(MAGIC):start])[0]
+        header = json.loads(self._map[start:start + length].decode('utf-8'))
+
+        if header['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError(path + ' was written with a different byte order')
+
+        self.num_rows = header['rows']
+        self.names = [column['name'] for column in header['columns']]
+        self.values = {}
+        self.columns = {}
+        view = memoryview(self._map)
+
+        for column in header['columns']:
+            itemsize = array(column['typecode']).itemsize
+            end = column['offset'] + itemsize * self.num_rows
+            self.values[column['name']] = column['values']
+            self.columns[column['name']] = (view[column['offset']:end]
+                                            .cast(column['typecode']))
+
+    def __len__(self):
+        return self.num_rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        PURPOSE
+        Release the memory map. Views from columns can't be used after.
+
+        INPUT
+        None
+
+        OUTPUT
+        None
+        """
+        for column in getattr(self, 'columns', {}).values():
+            column.release()
+        self.columns = {}
+        self._map.close()
+        self._file.close()
+
+    def rows(self, names=None):
+        """
+        PURPOSE
+        Decode rows back into string values, one row at a time.
+
+        INPUT
+        names: columns to decode, all of them by default
+
+        OUTPUT
+        generator of dicts of column name -> string value, same as a
+        csv.DictReader row of the cleaned database (without title)
+        """
+        if names is None:
+            names = self.names
+
+        decoded = [(name, self.values[name], self.columns[name])
+                   for name in names]
+
+        for i in range(self.num_rows):
+            yield {name: values[codes[i]] for name, values, codes in decoded}
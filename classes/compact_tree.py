@@ -0,0 +1,221 @@
+"""
+PURPOSE
+Memory-compact storage for ID3 trees. Instead of one Node object per
+node, the tree is kept as a handful of flat integer arrays (a struct of
+arrays). Attribute names and attribute values are stored once in code
+tables, and nodes refer to them by integer code.
+
+Nodes are stored in breadth first order, so the children of a node are
+always next to each other. child_ptr works like the row pointer of a CSR
+matrix: the children of node i are nodes child_ptr[i] up to (but not
+including) child_ptr[i + 1]. A node with no children is a leaf.
+
+AUTHOR
+Warren Lacaba
+"""
+
+from array import array
+from collections import deque
+
+from classes.node import Node
+
+class CompactTree:
+    """
+    PURPOSE
+    See above.
+
+    INPUT
+    attributes: list of attribute names, index is the attribute code
+    values: list of attribute values and class labels, index is the
+            value code
+    label: array, attribute code for internal nodes, class label value
+           code for leaves
+    branch: array, value code of the branch leading into each node
+            (-1 for the root)
+    child_ptr: array of len(label) + 1 child offsets
+    """
+
+    __slots__ = ('attributes', 'values', 'label', 'branch', 'child_ptr',
+                 '_attribute_codes', '_value_codes')
+
+    def __init__(self, attributes, values, label, branch, child_ptr):
+        self.attributes = attributes
+        self.values = values
+        self.label = label
+        self.branch = branch
+        self.child_ptr = child_ptr
+        self._attribute_codes = {name: i for i, name in enumerate(attributes)}
+        self._value_codes = {value: i for i, value in enumerate(values)}
+
+    @classmethod
+    def from_node(cls, root):
+        """
+        PURPOSE
+        Pack a tree of Node objects (as built by id3.id3_tree) into arrays.
+
+        INPUT
+        root: root Node of the tree
+
+        OUTPUT
+        compact: CompactTree with the same structure
+        """
+        attributes = []
+        attribute_codes = {}
+        values = []
+        value_codes = {}
+
+        def code(table, codes, key):
+            if key not in codes:
+                codes[key] = len(table)
+                table.append(key)
+            return codes[key]
+
+        label = array('i')
+        branch = array('i')
+        child_ptr = array('I', [1])
+        queue = deque([(root, -1)])
+
+        while queue:
+            node, branch_code = queue.popleft()
+            branch.append(branch_code)
+
+            if len(node.branches) == 0:
+                label.append(code(values, value_codes, node.label))
+            else:
+                label.append(code(attributes, attribute_codes, node.label))
+                for i in range(len(node.branches)):
+                    queue.append((node.children[i],
+                                  code(values, value_codes, node.branches[i])))
+
+            child_ptr.append(child_ptr[-1] + len(node.branches))
+
+        return cls(attributes, values, label, branch, child_ptr)
+
+    def __len__(self):
+        return len(self.label)
+
+    def is_leaf(self, i):
+        """
+        PURPOSE
+        Check if node i has no children.
+
+        INPUT
+        i: node index
+
+        OUTPUT
+        True if node i is a leaf
+        """
+        return self.child_ptr[i] == self.child_ptr[i + 1]
+
+    def find_leaf(self, movie):
+        """
+        PURPOSE
+        Follow the branches matching movie down from the root.
+
+        INPUT
+        movie: dict of attribute name -> value
+
+        OUTPUT
+        i: index of the leaf reached, or -1 if the movie has a value the
+           tree has no branch for
+        """
+        i = 0
+        child_ptr = self.child_ptr
+
+        while child_ptr[i] != child_ptr[i + 1]:
+            value = self._value_codes.get(movie[self.attributes[self.label[i]]])
+            start = child_ptr[i]
+            end = child_ptr[i + 1]
+            i = -1
+            for child in range(start, end):
+                if self.branch[child] == value:
+                    i = child
+                    break
+            if i == -1:
+                break
+
+        return i
+
+    def classify(self, movie):
+        """
+        PURPOSE
+        Predict the class label of a movie.
+
+        INPUT
+        movie: dict of attribute name -> value
+
+        OUTPUT
+        class label, or None if no rule covers the movie
+        """
+        i = self.find_leaf(movie)
+
+        if i == -1:
+            return None
+        return self.values[self.label[i]]
+
+    def iter_rules(self):
+        """
+        PURPOSE
+        Yield one rule per leaf, lazily, in the same order and layout as
+        Tree.rules: [attribute, value, ..., class label]
+
+        INPUT
+        None
+
+        OUTPUT
+        generator of rules
+        """
+        stack = [(0, [])]
+
+        while stack:
+            i, path = stack.pop()
+            start = self.child_ptr[i]
+            end = self.child_ptr[i + 1]
+
+            if start == end:
+                yield path + [self.values[self.label[i]]]
+            else:
+                attribute = self.attributes[self.label[i]]
+                for child in range(end - 1, start - 1, -1):
+                    stack.append((child, path + [attribute,
+                                                 self.values[self.branch[child]]]))
+
+    def to_node(self):
+        """
+        PURPOSE
+        Unpack back into a tree of Node objects.
+
+        INPUT
+        None
+
+        OUTPUT
+        root: root Node of the tree
+        """
+        nodes = []
+
+        for i in range(len(self)):
+            if self.is_leaf(i):
+                nodes.append(Node(self.values[self.label[i]]))
+            else:
+                nodes.append(Node(self.attributes[self.label[i]]))
+
+        for i in range(len(self)):
+            for child in range(self.child_ptr[i], self.child_ptr[i + 1]):
+                nodes[i].new_branch(self.values[self.branch[child]])
+                nodes[i].new_child(nodes[child])
+
+        return nodes[0]
+
+    def nbytes(self):
+        """
+        PURPOSE
+        Bytes used by the node arrays, not counting the code tables.
+
+        INPUT
+        None
+
+        OUTPUT
+        size in bytes
+        """
+        return sum(a.itemsize * len(a)
+                   for a in (self.label, self.branch, self.child_ptr))
@@ -9,6 +9,86 @@ Warren Lacaba
 import csv
 import random
 
+from classes.columnar import ColumnarDataset, is_columnar
+
+#Weight of a compressed movie or row, see compress_movies
+WEIGHT = 'weight'
+
+#Columns of the cleaned database that are never used as splitting attributes
+NOT_ATTRIBUTES = ('title', 'revenue', 'revenue_adjusted', WEIGHT)
+
+#Prefixes that keep values from different columns distinct
+PREFIXES = {'release': 're', 'prod_budget': 'b', 'genre': '', 'company': ''}
+
+def encode_movie(row, partial=False):
+    """
+    PURPOSE
+    Turn a row from the cleaned database into the movie dict used for
+    training. Prefixes keep values from different columns distinct.
+
+    INPUT
+    row: dict of column name -> string value, as given by csv.DictReader
+    partial: allow attributes to be left out, eg. for rule queries
+
+    OUTPUT
+    movie_dict: dict of attribute name -> encoded value
+    """
+    movie_dict = {name: prefix + row[name]
+                  for name, prefix in PREFIXES.items()
+                  if not partial or name in row}
+
+    #Movies we only want to predict won't have a revenue yet
+    if 'revenue' in row:
+        movie_dict['revenue'] = 'rv' + row['revenue']
+
+    return movie_dict
+
+def decode_value(name, value):
+    """
+    PURPOSE
+    Undo the prefix encode_movie put on a value.
+
+    INPUT
+    name: attribute name, or 'revenue' for a class label
+    value: encoded value
+
+    OUTPUT
+    value as written in the cleaned database
+    """
+    prefix = 'rv' if name == 'revenue' else PREFIXES.get(name, '')
+
+    return value[len(prefix):]
+
+def compress_movies(movies):
+    """
+    PURPOSE
+    Collapse movies with the same attributes and revenue into one movie
+    with a WEIGHT key saying how many there were. The feature space is
+    small (at most about 30k combinations), so training on the
+    compressed set costs the number of distinct movies, not the number
+    of rows.
+
+    INPUT
+    movies: list of movie dicts, possibly already weighted
+
+    OUTPUT
+    weighted: list of movie dicts with a WEIGHT, in first seen order
+    """
+    groups = {}
+
+    for movie in movies:
+        key = tuple(sorted((name, value) for name, value in movie.items()
+                           if name != WEIGHT))
+        weight = movie.get(WEIGHT, 1)
+        if key in groups:
+            groups[key][WEIGHT] += weight
+        else:
+            weighted = dict(movie)
+            weighted[WEIGHT] = weight
+            groups[key] = weighted
+
+    return list(groups.values())
+
 class Dataset:
     """
     PURPOSE
@@ -21,19 +101,30 @@ class Dataset:
         self.test_set = []
         self.attribute_set = set()
 
-    def get_data(self, database_name):
+    def get_data(self, database_name, rng=random):
         """
         PURPOSE
         Read in the whole database file, split into a learn set and
         test set, add labels for attribute list.
 
         INPUT
-        database_name: name of database, path and everything
+        database_name: name of database, path and everything. A .bin
+                       columnar copy is memory mapped instead of parsed.
+        rng: where the coin tosses come from, eg. a seeded random.Random
+             to get the same split every time
 
         OUTPUT
         None
         """
 
+        if is_columnar(database_name):
+            columnar = ColumnarDataset(database_name)
+            self.attribute_set = set(columnar.names)
+            self.attribute_set.difference_update(NOT_ATTRIBUTES)
+            self._split(columnar.rows(), rng)
+            columnar.close()
+            return
+
         read = open(database_name, 'r', encoding='utf-8')
         reader = csv.DictReader(read)
 
@@ -41,20 +132,32 @@ class Dataset:
         Remove these because you don't want them as splitting attributes.
         I only included title in the database just in case we need it for
         the written report (or for printing), and revenue is the class we 
-        want to classify by.
+        want to classify by. revenue_adjusted (if cleanup wrote it) is the
+        target of the regression trees.
         """
         self.attribute_set = set(reader.fieldnames)
-        self.attribute_set.discard('title')
-        self.attribute_set.discard('revenue')
+        self.attribute_set.difference_update(NOT_ATTRIBUTES)
 
-        for row in reader:
-            movie_dict = { 'revenue': 'rv' + row['revenue'],
-                           'release': 're' + row['release'],
-                           'prod_budget': 'b' + row['prod_budget'],
-                           'genre': row['genre'],
-                           'company': row['company']}
+        self._split(reader, rng)
+        read.close()
+
+    def _split(self, rows, rng):
+        """
+        PURPOSE
+        Encode rows and toss a coin for each one to put it in the learn
+        set or test set.
+
+        INPUT
+        rows: iterable of dicts of column name -> string value
+        rng: where the coin tosses come from
+
+        OUTPUT
+        None
+        """
+        for row in rows:
+            movie_dict = encode_movie(row)
 
-            coin_toss = random.randint(0, 1)
+            coin_toss = rng.randint(0, 1)
 
             if coin_toss == 0:
                 self.learn_set.append(movie_dict)
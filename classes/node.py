@@ -16,6 +16,9 @@ class Node:
            of leaf node
     """
 
+    #No per-instance __dict__, deep trees hold a lot of these
+    __slots__ = ('label', 'branches', 'children')
+
     def __init__(self, label):
         self.label = label
         self.branches = []
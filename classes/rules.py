@@ -0,0 +1,200 @@
+"""
+PURPOSE
+Rule sets for analysts. A rule is a (conditions, class label) tuple, where
+conditions is a tuple of (attribute, value) pairs, as given by
+Tree.rule_tuples.
+
+RuleTrie stores a rule set as a prefix trie of conditions, so conditions
+shared by many rules (eg. every rule under genre == Action) are stored
+once, and can answer which rules fire for a movie that only has some of
+its attributes filled in.
+
+write_rules_csv and write_rules_json export any iterable of rules one
+rule at a time, so a rule set never has to be held in memory to be
+written out.
+
+AUTHOR
+Warren Lacaba
+"""
+import csv
+import json
+
+#CSV cell of an attribute a rule doesn't test
+ANY = '*'
+
+class _TrieNode:
+    """
+    PURPOSE
+    One condition of the trie. Children are indexed by attribute, then
+    value, so a known attribute value is a dict lookup.
+    """
+
+    __slots__ = ('children', 'labels')
+
+    def __init__(self):
+        self.children = {}
+        self.labels = []
+
+class RuleTrie:
+    """
+    PURPOSE
+    See above.
+
+    INPUT
+    rules: iterable of (conditions, class label), eg. tree.rule_tuples()
+    """
+
+    def __init__(self, rules=()):
+        self.root = _TrieNode()
+        self.num_rules = 0
+        self.num_nodes = 1
+
+        for conditions, label in rules:
+            self.insert(conditions, label)
+
+    def __len__(self):
+        return self.num_rules
+
+    def insert(self, conditions, label):
+        """
+        PURPOSE
+        Add one rule, reusing the nodes of any prefix already stored.
+
+        INPUT
+        conditions: sequence of (attribute, value) pairs
+        label: class label of the rule
+
+        OUTPUT
+        None
+        """
+        node = self.root
+
+        for attribute, value in conditions:
+            values = node.children.setdefault(attribute, {})
+            child = values.get(value)
+            if child is None:
+                child = _TrieNode()
+                values[value] = child
+                self.num_nodes += 1
+            node = child
+
+        node.labels.append(label)
+        self.num_rules += 1
+
+    def __iter__(self):
+        """
+        Yield every rule as (conditions, class label)
+        """
+        return self.matching({}, partial=True)
+
+    def matching(self, movie, partial=True):
+        """
+        PURPOSE
+        Find the rules that fire for a movie.
+
+        INPUT
+        movie: dict of attribute -> value, may leave attributes out
+        partial: True to treat left out attributes as unknown, so rules
+                 that test them still fire if everything else matches.
+                 False to only fire rules whose every condition is met.
+
+        OUTPUT
+        generator of (conditions, class label)
+        """
+        path = []
+        #Each entry is a node and an iterator over the children to visit
+        stack = [(self.root, self._next_nodes(self.root, movie, partial))]
+
+        for label in self.root.labels:
+            yield (), label
+
+        while stack:
+            node, children = stack[-1]
+            step = next(children, None)
+
+            if step is None:
+                stack.pop()
+                if path:
+                    path.pop()
+                continue
+
+            condition, child = step
+            path.append(condition)
+            for label in child.labels:
+                yield tuple(path), label
+            stack.append((child, self._next_nodes(child, movie, partial)))
+
+    @staticmethod
+    def _next_nodes(node, movie, partial):
+        """
+        Children of node whose condition the movie meets (or may meet)
+        """
+        for attribute, values in node.children.items():
+            if attribute in movie:
+                child = values.get(movie[attribute])
+                if child is not None:
+                    yield (attribute, movie[attribute]), child
+            elif partial:
+                for value, child in values.items():
+                    yield (attribute, value), child
+
+#EXPORT-----------------------------------------------------------------------
+
+def write_rules_csv(rules, write, attributes, target='revenue'):
+    """
+    PURPOSE
+    Write rules to a CSV file one at a time, one column per attribute
+    and the class label last. An attribute the rule doesn't test is
+    written as ANY (*), so it can't be mistaken for a real empty value.
+    None of the cleaned database's values is *; use write_rules_json if
+    yours can be.
+
+    INPUT
+    rules: iterable of (conditions, class label)
+    write: text file opened for writing, with newline=''
+    attributes: column order of the attributes
+    target: name of the class label column
+
+    OUTPUT
+    number of rules written
+    """
+    writer = csv.writer(write)
+    writer.writerow(list(attributes) + [target])
+    num_rules = 0
+
+    for conditions, label in rules:
+        values = dict(conditions)
+        writer.writerow([values.get(attribute, ANY)
+                         for attribute in attributes] + [label])
+        num_rules += 1
+
+    return num_rules
+
+def write_rules_json(rules, write):
+    """
+    PURPOSE
+    Write rules to a JSON array one at a time. Each rule is an object
+    with its conditions as [attribute, value] pairs, in order, and its
+    label.
+
+    INPUT
+    rules: iterable of (conditions, class label)
+    write: text file opened for writing
+
+    OUTPUT
+    number of rules written
+    """
+    num_rules = 0
+    write.write('[')
+
+    for conditions, label in rules:
+        if num_rules:
+            write.write(',')
+        write.write('\n')
+        json.dump({'conditions': [list(condition) for condition in conditions],
+                   'label': label}, write)
+        num_rules += 1
+
+    write.write('\n]\n')
+
+    return num_rules
@@ -12,20 +12,74 @@ class Tree:
         self.root = tree_root
         self.rules = []
 
+    def rule_tuples(self):
+        """
+        PURPOSE
+        Walk the tree and yield one structured rule per leaf. The path
+        is a single list grown and shrunk along the walk, so each rule
+        costs only the copy of its own conditions.
+
+        INPUT
+        None
+
+        OUTPUT
+        generator of (conditions, class label), where conditions is a
+        tuple of (attribute, value) pairs from the root down. Rules come
+        out in branch order, the same order as insert_rules.
+        """
+        path = []
+        #Each entry is a node and the index of its next branch to visit
+        stack = [[self.root, 0]]
+
+        while stack:
+            entry = stack[-1]
+            node, i = entry
+
+            if len(node.branches) == 0:
+                yield tuple(path), node.label
+                stack.pop()
+                if path:
+                    path.pop()
+            elif i < len(node.branches):
+                entry[1] += 1
+                path.append((node.label, node.branches[i]))
+                stack.append([node.children[i], 0])
+            else:
+                stack.pop()
+                if path:
+                    path.pop()
+
+    def iter_rules(self):
+        """
+        PURPOSE
+        Walk the tree and yield one rule per leaf, without building the
+        whole rule list first.
+
+        INPUT
+        None
+
+        OUTPUT
+        generator of rules, same layout as self.rules:
+        [attribute, value, attribute, value, ..., class label]
+        """
+        for conditions, label in self.rule_tuples():
+            rule = []
+            for attribute, value in conditions:
+                rule.append(attribute)
+                rule.append(value)
+            rule.append(label)
+            yield rule
+
     def insert_rules(self):
-        self.read_in_rules(self.root, '')
-
-    def read_in_rules(self, node, parent):
-        branch_length = len(node.branches)
-        curr = parent + "," + node.label + ","
-        
-        if branch_length != 0:
-            for i in range(0, branch_length):
-                rule_part = curr + node.branches[i]
-                self.read_in_rules(node.children[i], rule_part)
-        else:
-            #There's ',' on each side of the string
-            #so it's giving spaces on either end of the list
-            curr = curr[1:-1]
-            self.rules.append(curr.split(','))
+        """
+        PURPOSE
+        Fill in self.rules with every rule of the tree. Values are kept
+        as they are, so they may contain commas.
+
+        INPUT
+        None
 
+        OUTPUT
+        None
+        """
+        self.rules.extend(self.iter_rules())
@@ -21,6 +21,8 @@ import json
 import re
 from collections import Counter
 
+from classes.columnar import csv_to_columnar
+
 #Consumer Price Index values from 1913-2017
 CPI_FROM_1913 = [9.9, 10.0, 10.1, 10.9, 12.8, 15.1, 17.3, 20.0, 17.9, 16.8,
                  17.1, 17.1, 17.5, 17.7, 17.4, 17.1, 17.1, 16.7, 15.2, 13.7,
@@ -42,6 +44,16 @@ CURR_YEAR = 2017                  #Current year for calculating inflation
 MAX_COMMON_MOVIES = 21            #Need 21 because you want 20 movies, also a
                                   #majority are labelled 'empty' which
                                   #obviously doesn't count
+CLEAN_CSV = 'data/new_database2.csv'      #Cleaned database, text
+CLEAN_COLUMNAR = 'data/new_database2.bin' #Cleaned database, binary columns
+FIELDNAMES = ['title',            #Column order of the cleaned database
+              'genre',
+              'prod_budget',
+              'company',
+              'release',
+              'revenue']
+ADJUSTED_FIELD = 'revenue_adjusted'       #Optional column of raw revenue in
+                                          #CURR_YEAR dollars
 #DATA VALIDATION FUNCTIONS----------------------------------------------------
 
 def valid_list_of_genre(data_entry):
@@ -133,7 +145,7 @@ def valid_data(genre, company, release):
 
 #HELPER-----------------------------------------------------------------------
 
-def most_common_companies():
+def most_common_companies(max_common=MAX_COMMON_MOVIES):
     """
     PURPOSE
     Find most common companies in database, before, we had 1300 companies
@@ -141,7 +153,8 @@ def most_common_companies():
     5000 movies to begin with. 
 
     INPUT
-    None
+    max_common: how many of the most common to look at, counting 'Empty'.
+                None keeps every company.
 
     OUTPUT
     set_companies: set of 20 most common movies
@@ -169,7 +182,7 @@ def most_common_companies():
             comp_list.append(company)
 
     count = Counter(comp_list)
-    common = count.most_common(MAX_COMMON_MOVIES)
+    common = count.most_common(max_common)
 
     set_companies = set()
 
@@ -330,41 +343,42 @@ def calculate_bracket(old_year, curr_year, dollar, abs_limit, increment):
 
 #MAIN-------------------------------------------------------------------------
 
-def clean_data():
+def clean_data(adjusted=False, max_common=MAX_COMMON_MOVIES):
     """
     PURPOSE
     Read the original database to get only the info we need.
     Make sure data is valid, all relevant categories are not blank.
-    Write relevant data into new_database.csv. That database will be
-    used during the actual data mining and classification.
+    Write relevant data into new_database2.csv, plus a binary columnar
+    copy in new_database2.bin (see classes/columnar.py). That database
+    will be used during the actual data mining and classification.
 
     Info needed: Budget, Genre, Title, Company, Release Date, Revenue
 
     INPUT
-    None
+    adjusted: if True, also write the inflation adjusted revenue (whole
+              dollars) in a revenue_adjusted column, for regression trees
+    max_common: see most_common_companies. None keeps every company,
+                meant for CART with subset splits (cart._build_tree with
+                subsets=True), which stays fast with many companies
 
     OUTPUT
     None
 
     NOTES
-    DictWriter will write a random order of headers everytime, not a problem
-    considering this is only gonna be run once. Just something to remember.
+    Columns are written in the fixed order of FIELDNAMES. The columnar
+    copy only holds the bracket columns.
     """
 
-    common_companies = most_common_companies()
+    common_companies = most_common_companies(max_common)
 
     #Note: encoding='utf-8' necessary to be able to read all chars properly.
     #One of the movie titles has a "1/3" symbol that's messing everything up.
     read_csv = open('data/tmdb_5000_movies.csv', 'r', encoding='utf-8')
-    write_csv = open('data/new_database2.csv', 'w', newline='', encoding='utf-8')
+    write_csv = open(CLEAN_CSV, 'w', newline='', encoding='utf-8')
 
     reader = csv.DictReader(read_csv)
-    writer = csv.DictWriter(write_csv, {'title',
-                                        'genre',
-                                        'prod_budget',
-                                        'company',
-                                        'release',
-                                        'revenue'})
+    fieldnames = FIELDNAMES + [ADJUSTED_FIELD] if adjusted else FIELDNAMES
+    writer = csv.DictWriter(write_csv, fieldnames)
     writer.writeheader()
 
     for row in reader:
@@ -400,10 +414,21 @@ def clean_data():
             new_revenue = calculate_bracket(year, 2017, row['revenue'],
                                             REVENUE_LIMIT, REVENUE_INCREMENT)
 
-            writer.writerow({'title': row['title'],
-                             'genre': new_genre,
-                             'prod_budget': new_budget,
-                             'company': new_company,
-                             'release': get_date(release, 1),
-                             'revenue': new_revenue})
+            new_row = {'title': row['title'],
+                       'genre': new_genre,
+                       'prod_budget': new_budget,
+                       'company': new_company,
+                       'release': get_date(release, 1),
+                       'revenue': new_revenue}
+
+            if adjusted:
+                new_row[ADJUSTED_FIELD] = round(correct_inflation(
+                    year, CURR_YEAR, row['revenue']))
+
+            writer.writerow(new_row)
+
+    read_csv.close()
+    write_csv.close()
+
+    csv_to_columnar(CLEAN_CSV, CLEAN_COLUMNAR)
                              
\ No newline at end of file
@@ -0,0 +1,249 @@
+"""
+PURPOSE
+Adaptive evaluation. Instead of a fixed number of trials, trials are run
+in batches until the confidence interval on the mean test accuracy is
+narrower than a target width, or a maximum number of trials is reached.
+
+In compare mode, ID3 and CART are trained and tested on the same split
+in every trial, and the interval is on the mean of the paired
+differences (ID3 accuracy - CART accuracy). Pairing removes the part of
+the variance that comes from how easy a split is, so the difference
+usually settles in far fewer trials than either accuracy.
+
+Intervals use Student's t distribution, since the trial accuracies are
+roughly normal and their variance is estimated from the trials.
+
+AUTHOR
+Warren Lacaba
+"""
+import math
+import random
+import time
+from statistics import NormalDist
+
+from classes.dataset import encode_movie
+from logic import cart
+from logic import id3
+
+ALGORITHMS = ('id3', 'cart', 'compare')
+
+#STATISTICS-------------------------------------------------------------------
+
+def t_quantile(p, df):
+    """
+    PURPOSE
+    Quantile of Student's t distribution. Exact for 1 and 2 degrees of
+    freedom, otherwise the Cornish-Fisher expansion around the normal
+    quantile. That is within 0.01 of the table values for 95% intervals
+    from 3 degrees of freedom up, and for 99% intervals from 5 up.
+
+    INPUT
+    p: probability, eg. 0.975 for a two sided 95% interval
+    df: degrees of freedom, at least 1
+
+    OUTPUT
+    t such that P(T <= t) = p
+    """
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+
+    z = NormalDist().inv_cdf(p)
+    return (z
+            + (z**3 + z) / (4 * df)
+            + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * df**2)
+            + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * df**3)
+            + (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3
+               - 945 * z) / (92160 * df**4))
+
+def confidence_interval(values, confidence=0.95):
+    """
+    PURPOSE
+    Mean and confidence interval of a list of trial results.
+
+    INPUT
+    values: list of numbers, at least 2
+    confidence: coverage of the interval
+
+    OUTPUT
+    mean: mean of values
+    half_width: the interval is mean +- half_width
+    """
+    n = len(values)
+    mean = sum(values) / n
+    variance = sum((value - mean) ** 2 for value in values) / (n - 1)
+    half_width = (t_quantile(0.5 + confidence / 2, n - 1) *
+                  math.sqrt(variance / n))
+
+    return mean, half_width
+
+#TRIALS-----------------------------------------------------------------------
+
+def _accuracy(predictions, actual):
+    correct = sum(1 for i in range(len(actual)) if predictions[i] == actual[i])
+    return correct / len(actual) * 100
+
+def _fit_and_score(header, train, test, algorithm, params):
+    """
+    Train one algorithm and test it, returns its accuracy and the seconds
+    spent building and predicting
+    """
+    revenue_pos = header.index(id3.TARGET)
+    actual = [row[revenue_pos] for row in test]
+
+    start = time.perf_counter()
+    if algorithm == 'cart':
+        model = cart.CartClassifier(header, subsets=params.get('subsets',
+                                                               False),
+                                    engine=params.get('engine', 'rows'),
+                                    dedup=params.get('dedup', False))
+        model.fit(train)
+        built = time.perf_counter()
+        predictions = model.predict_batch(test)
+    else:
+        def movies(rows):
+            return [encode_movie(dict(zip(header, row))) for row in rows]
+
+        model = id3.ID3Classifier(dedup=params.get('dedup', False))
+        model.fit(movies(train))
+        built = time.perf_counter()
+        #ID3 class labels are the bracket with an 'rv' prefix
+        predictions = [label if label is None else label[2:]
+                       for label in model.predict_batch(movies(test))]
+    done = time.perf_counter()
+
+    return _accuracy(predictions, actual), built - start, done - built
+
+def run_trial(header, dataset, algorithm, seed, train_ratio=0.5, params=None):
+    """
+    PURPOSE
+    Run one trial: split with random.Random(seed), train and test.
+
+    INPUT
+    header: column names of dataset
+    dataset: list of row lists, as from cart.load_data
+    algorithm: 'id3' or 'cart'
+    seed: seed of the split
+    train_ratio: portion of rows used for training
+    params: dict of options, 'dedup' for both, 'subsets' and 'engine' for
+            CART, None for the defaults
+
+    OUTPUT
+    dict with the accuracy, build_seconds and predict_seconds
+    """
+    train, test = cart.split_dataset(dataset, train_ratio,
+                                     random.Random(seed))
+    accuracy, build_seconds, predict_seconds = _fit_and_score(
+        header, train, test, algorithm, params or {})
+
+    return {'accuracy': accuracy,
+            'build_seconds': build_seconds,
+            'predict_seconds': predict_seconds}
+
+def _trial(header, dataset, algorithms, seed, train_ratio):
+    """
+    Train and test each algorithm on the same random split, returns
+    their accuracies in the same order
+    """
+    train, test = cart.split_dataset(dataset, train_ratio,
+                                     random.Random(seed))
+
+    return [_fit_and_score(header, train, test, algorithm, {})[0]
+            for algorithm in algorithms]
+
+#MAIN-------------------------------------------------------------------------
+
+def run_adaptive(database_name, algorithm, width, confidence=0.95,
+                 batch_size=5, min_trials=10, max_trials=500, seed=None,
+                 train_ratio=0.5):
+    """
+    PURPOSE
+    Run trials in batches until the confidence interval on the mean
+    accuracy (or on the mean ID3 - CART difference in compare mode) is
+    at most width wide.
+
+    INPUT
+    database_name: name (and path) of database
+    algorithm: 'id3', 'cart' or 'compare'
+    width: full width of the interval to stop at, in accuracy points
+    confidence: coverage of the interval, between 0 and 1
+    batch_size: trials run between checks, at least 1
+    min_trials: trials always run before stopping, so a few lucky trials
+                with a small spread don't stop it early
+    max_trials: most trials to run, at least 2
+    seed: trial i splits the data with random.Random(seed + i)
+    train_ratio: portion of rows used for training
+
+    OUTPUT
+    result: dict with the mean, the interval (low, high), the number of
+            trials used, whether the target width was reached, and the
+            per trial accuracies of each algorithm
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError('algorithm must be one of {0}'.format(ALGORITHMS))
+    if batch_size < 1:
+        raise ValueError('batch_size must be at least 1')
+    if max_trials < 2:
+        raise ValueError('max_trials must be at least 2, an interval needs '
+                         'two trials')
+    if not 0 < confidence < 1:
+        raise ValueError('confidence must be between 0 and 1')
+
+    header, dataset = cart.load_data(database_name)
+    algorithms = ['id3', 'cart'] if algorithm == 'compare' else [algorithm]
+    if seed is None:
+        seed = random.randrange(2**32)
+
+    accuracies = {name: [] for name in algorithms}
+    values = []
+    mean, half_width = 0.0, float('inf')
+
+    while len(values) < max_trials:
+        for i in range(len(values),
+                       min(len(values) + batch_size, max_trials)):
+            trial = _trial(header, dataset, algorithms, seed + i, train_ratio)
+            for name, accuracy in zip(algorithms, trial):
+                accuracies[name].append(accuracy)
+            values.append(trial[0] - trial[1] if algorithm == 'compare'
+                          else trial[0])
+
+        if len(values) >= 2:
+            mean, half_width = confidence_interval(values, confidence)
+            print('{0} trials: {1:.3f} +- {2:.3f}'.format(len(values), mean,
+                                                         half_width))
+            if len(values) >= min_trials and 2 * half_width <= width:
+                break
+
+    return {'algorithm': algorithm,
+            'mean': mean,
+            'interval': (mean - half_width, mean + half_width),
+            'confidence': confidence,
+            'trials': len(values),
+            'converged': 2 * half_width <= width,
+            'accuracies': accuracies}
+
+def summary(result):
+    """
+    PURPOSE
+    Readable summary of a run_adaptive result.
+
+    INPUT
+    result: dict returned by run_adaptive
+
+    OUTPUT
+    string
+    """
+    if result['algorithm'] == 'compare':
+        name = 'ID3 - CART accuracy'
+    else:
+        name = '{0} accuracy'.format(result['algorithm'].upper())
+
+    low, high = result['interval']
+    text = ('{0}: {1:.3f}%, {2:.0%} interval [{3:.3f}, {4:.3f}] after {5} '
+            'trials'.format(name, result['mean'], result['confidence'], low,
+                            high, result['trials']))
+    if not result['converged']:
+        text += ' (stopped at the trial limit before reaching the width)'
+
+    return text
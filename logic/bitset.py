@@ -0,0 +1,308 @@
+"""
+PURPOSE
+Bitset engine for building trees. Every attribute in the cleaned
+database has only a few values (about 20 genres, 21 companies, 12
+months, 6 budget brackets), so the training rows are indexed once as
+one bitset per (attribute, value) and one per class, stored as Python
+ints with bit i standing for training row i.
+
+The rows at a tree node are a bitset too. Partitioning a node is an AND
+(and an XOR for the rest), and counting the rows of a value and class is
+int.bit_count() of two ANDs, so a split search costs a few hundred big
+int operations per node instead of one dict lookup per row per
+candidate.
+
+The trees built are the same node types the row builders return:
+id3 Node trees, and cart _SplittingNode / _Leaf trees.
+
+AUTHOR
+Warren Lacaba
+"""
+import math
+
+from classes.dataset import WEIGHT
+from classes.node import Node
+from logic import cart
+from logic import id3
+
+#INDEX------------------------------------------------------------------------
+
+def _bits_from_positions(positions, num_rows):
+    """
+    Int with the bits at the given row numbers set
+    """
+    packed = bytearray((num_rows + 7) // 8)
+    for i in positions:
+        packed[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(packed, 'little')
+
+class BitsetIndex:
+    """
+    PURPOSE
+    One bitset per (attribute, value) and per class over a list of rows.
+    Values and classes keep the order they first occur in.
+
+    INPUT
+    rows: row lists (CART) or movie dicts (ID3)
+    keys: column numbers or attribute names to index
+    target: column number or name of the class label
+    """
+
+    def __init__(self, rows, keys, target):
+        self.num_rows = len(rows)
+        self.all_rows = (1 << self.num_rows) - 1
+        positions = {key: {} for key in keys}
+        class_positions = {}
+
+        for i in range(self.num_rows):
+            row = rows[i]
+            for key in keys:
+                positions[key].setdefault(row[key], []).append(i)
+            class_positions.setdefault(row[target], []).append(i)
+
+        self.value_bits = {key: {value: _bits_from_positions(rows_of_value,
+                                                             self.num_rows)
+                                 for value, rows_of_value in values.items()}
+                           for key, values in positions.items()}
+        self.class_bits = {label: _bits_from_positions(rows_of_class,
+                                                       self.num_rows)
+                           for label, rows_of_class in class_positions.items()}
+
+    def class_counts(self, bits):
+        """
+        PURPOSE
+        Count the classes of the rows in a bitset.
+
+        INPUT
+        bits: row set
+
+        OUTPUT
+        dict of class label -> count, only classes present, in the order
+        they first occur in the rows (like counting the rows in order)
+        """
+        found = []
+
+        for label, class_bits in self.class_bits.items():
+            both = bits & class_bits
+            if both:
+                #Position of the lowest set bit is the first row of the class
+                found.append(((both & -both).bit_length(), label,
+                              both.bit_count()))
+
+        found.sort()
+
+        return {label: count for first, label, count in found}
+
+    def value_class_counts(self, bits, key, labels):
+        """
+        PURPOSE
+        Count the classes of each value of one attribute in a bitset.
+
+        INPUT
+        bits: row set
+        key: attribute to count
+        labels: classes to count, eg. the ones present in bits
+
+        OUTPUT
+        dict of value -> (value bits, {class label -> count}), only
+        values present in bits
+        """
+        counts = {}
+
+        for value, value_bits in self.value_bits[key].items():
+            in_value = bits & value_bits
+            if not in_value:
+                continue
+            value_counts = {}
+            for label in labels:
+                count = (in_value & self.class_bits[label]).bit_count()
+                if count:
+                    value_counts[label] = count
+            counts[value] = (in_value, value_counts)
+
+        return counts
+
+#ID3--------------------------------------------------------------------------
+
+def _entropy(class_counts, total_size):
+    """
+    Entropy of a class count table, summed in the same order as
+    id3.calculate_entropy (most common first)
+    """
+    entropy = 0
+    ordered = sorted(class_counts.values(), reverse=True)
+
+    for count in ordered:
+        portion = count/total_size
+        entropy -= portion * math.log2(portion)
+
+    return entropy
+
+def build_bitset_id3(learn_set, attribute_set):
+    """
+    PURPOSE
+    Build the ID3 decision tree on bitsets. Same algorithm, tie breaking
+    and node layout as id3.id3_tree.
+
+    INPUT
+    learn_set: list of movie dicts
+    attribute_set: set of all possible attributes to judge by
+
+    OUTPUT
+    root: root node of the decision tree
+    """
+    if learn_set and WEIGHT in learn_set[0]:
+        raise ValueError('The bitset engine counts rows, it needs '
+                         'uncompressed movies')
+
+    index = BitsetIndex(learn_set, list(attribute_set), id3.TARGET)
+
+    def build(bits, attribute_set):
+        curr_node = Node('Empty')
+        attributes = attribute_set.copy()
+        class_counts = index.class_counts(bits)
+
+        if len(class_counts) == 1:
+            curr_node.update_node_label(next(iter(class_counts)))
+            return curr_node
+
+        if len(attributes) == 0:
+            #Majority vote, ties go to the class seen first like Counter
+            majority = max(class_counts.keys(),
+                           key=(lambda label: class_counts[label]))
+            curr_node.update_node_label(majority)
+            return curr_node
+
+        total_size = bits.bit_count()
+        info_of_class = _entropy(class_counts, total_size)
+        info_gain = 0
+        best_attribute = ''
+        best_partitions = None
+
+        #Sorted, with id3.GAIN_TOLERANCE, like id3.find_information_gain
+        for attribute in sorted(attributes):
+            partitions = index.value_class_counts(bits, attribute,
+                                                  class_counts)
+            info_of_attribute = 0
+            for value in sorted(partitions):
+                value_counts = partitions[value][1]
+                value_size = sum(value_counts.values())
+                info_of_attribute += ((value_size/total_size) *
+                                      _entropy(value_counts, value_size))
+
+            new_info_gain = info_of_class - info_of_attribute
+            if new_info_gain >= info_gain - id3.GAIN_TOLERANCE:
+                info_gain = new_info_gain
+                best_attribute = attribute
+                best_partitions = partitions
+
+        attributes.discard(best_attribute)
+        curr_node.update_node_label(best_attribute)
+
+        for value in sorted(best_partitions):
+            curr_node.new_branch(value)
+            curr_node.new_child(build(best_partitions[value][0], attributes))
+
+        return curr_node
+
+    return build(index.all_rows, attribute_set)
+
+#CART-------------------------------------------------------------------------
+
+def _gini(class_counts, total_size):
+    """
+    Gini impurity of a class count table, same formula as cart._gini
+    """
+    gini_impurity = 1
+
+    for count in class_counts.values():
+        gini_impurity -= (count / float(total_size)) ** 2
+
+    return gini_impurity
+
+def _best_cart_split(index, bits, schema, subsets):
+    """
+    Pick the split with the highest gini gain, from bitset counts.
+    Returns the gain, the criterion and the row set of its true branch.
+    """
+    total_size = bits.bit_count()
+    class_counts = index.class_counts(bits)
+    current_uncertainty = _gini(class_counts, total_size)
+    best_gain, best_split_crit, best_bits = 0, None, 0
+
+    for col_num in schema.attributes:
+        partitions = index.value_class_counts(bits, col_num, class_counts)
+        attr_name = schema.header[col_num]
+
+        if subsets:
+            value_counts = {value: partitions[value][1]
+                            for value in partitions}
+            gain, split_crit = cart._best_subset_of_counts(
+                value_counts, schema, col_num, current_uncertainty,
+                class_counts, total_size)
+            if split_crit is not None and cart._beats(gain, best_gain):
+                if isinstance(split_crit, cart._SubsetCriterion):
+                    true_bits = 0
+                    for value in split_crit.values:
+                        true_bits |= partitions[value][0]
+                else:
+                    true_bits = partitions[split_crit.value][0]
+                best_gain, best_split_crit, best_bits = (gain, split_crit,
+                                                         true_bits)
+            continue
+
+        # Sorted values and cart._beats, so ties go like cart._get_best_split
+        for val in sorted(partitions):
+            true_bits, true_counts = partitions[val]
+            true_size = sum(true_counts.values())
+            false_size = total_size - true_size
+
+            # Skip if either partition is empty
+            if false_size == 0:
+                continue
+
+            false_counts = {label: count - true_counts.get(label, 0)
+                            for label, count in class_counts.items()}
+            prob = float(true_size) / total_size
+            gain = (current_uncertainty
+                    - prob * _gini(true_counts, true_size)
+                    - (1 - prob) * _gini(false_counts, false_size))
+
+            if cart._beats(gain, best_gain):
+                best_gain, best_bits = gain, true_bits
+                best_split_crit = cart._SplittingCriterion(col_num, val,
+                                                           attr_name)
+
+    return best_gain, best_split_crit, best_bits, class_counts
+
+def build_bitset_cart(rows, schema, subsets=False):
+    """
+    PURPOSE
+    Build the CART tree on bitsets, choosing splits the same way as
+    cart._build_tree, ties included.
+
+    INPUT
+    rows: training row lists
+    schema: cart.Schema of the rows
+    subsets: split on subsets of values instead of one value
+
+    OUTPUT
+    root of the tree (_SplittingNode or _Leaf)
+    """
+    if schema.weight_pos is not None:
+        raise ValueError('The bitset engine counts rows, it needs '
+                         'uncompressed rows')
+
+    index = BitsetIndex(rows, schema.attributes, schema.target_pos)
+
+    def build(bits):
+        gain, split_crit, true_bits, class_counts = _best_cart_split(
+            index, bits, schema, subsets)
+
+        if gain == 0:
+            return cart._Leaf.from_counts(class_counts)
+
+        return cart._SplittingNode(split_crit, build(true_bits),
+                                   build(bits ^ true_bits))
+
+    return build(index.all_rows)
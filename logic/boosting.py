@@ -0,0 +1,418 @@
+"""
+PURPOSE
+Multiclass gradient boosting of shallow trees on the categorical
+columns.
+
+Each round fits one tree per revenue class to the gradient and hessian
+of the softmax loss. Attribute values are encoded as small integer codes
+(like the columnar file does), so a node's statistics are a histogram:
+the sum of gradients, sum of hessians and row count of every code of
+every attribute. A split is chosen from the histogram alone, by sorting
+the codes of an attribute by gradient / hessian and scanning the
+prefixes of that order (the optimal subset split for this loss).
+
+Only the smaller child of a split scans its rows to build a histogram,
+the larger child's is the parent's minus the smaller one's (sibling
+subtraction), so each level costs O(rows in the smaller children).
+Training scores are updated straight from the rows of each leaf, and
+prediction routes whole lists of row numbers down each tree instead of
+walking one row at a time.
+
+AUTHOR
+Min Gyu Park
+"""
+import math
+import time
+
+from logic import cart
+
+#TREES------------------------------------------------------------------------
+
+def _histogram(codes, num_values, grad, hess, indices):
+    """
+    Sum of gradients, sum of hessians and count per code of each
+    attribute over the rows in indices
+    """
+    hist = []
+
+    for col in range(len(codes)):
+        col_codes = codes[col]
+        grad_sum = [0.0] * num_values[col]
+        hess_sum = [0.0] * num_values[col]
+        count = [0] * num_values[col]
+        for i in indices:
+            code = col_codes[i]
+            grad_sum[code] += grad[i]
+            hess_sum[code] += hess[i]
+            count[code] += 1
+        hist.append((grad_sum, hess_sum, count))
+
+    return hist
+
+def _subtract(parent, child):
+    """
+    Histogram of the sibling of child
+    """
+    return [([p - c for p, c in zip(parent_grad, child_grad)],
+             [p - c for p, c in zip(parent_hess, child_hess)],
+             [p - c for p, c in zip(parent_count, child_count)])
+            for (parent_grad, parent_hess, parent_count),
+            (child_grad, child_hess, child_count) in zip(parent, child)]
+
+class _HistTree:
+    """
+    A shallow tree stored as flat per-node lists.
+
+    column[i]    attribute index (into the model's columns) of node i,
+                 None for leaves
+    goes_left[i] list of booleans by code, True if rows with that code
+                 go to the left child
+    children[i]  (left, right) node numbers
+    value[i]     score added by a leaf
+    """
+
+    def __init__(self):
+        self.column = []
+        self.goes_left = []
+        self.children = []
+        self.value = []
+
+    def _new_node(self):
+        self.column.append(None)
+        self.goes_left.append(None)
+        self.children.append(None)
+        self.value.append(0.0)
+        return len(self.column) - 1
+
+    def add_scores(self, codes, scores, indices):
+        """
+        PURPOSE
+        Add the leaf value of every row to its score, routing the rows
+        down the tree as lists of row numbers.
+
+        INPUT
+        codes: column major codes of the rows
+        scores: list of scores to add to, by row number
+        indices: row numbers to score
+
+        OUTPUT
+        None
+        """
+        stack = [(0, indices)]
+
+        while stack:
+            node, rows = stack.pop()
+            column = self.column[node]
+            if column is None:
+                value = self.value[node]
+                for i in rows:
+                    scores[i] += value
+                continue
+
+            col_codes = codes[column]
+            goes_left = self.goes_left[node]
+            left, right = [], []
+            for i in rows:
+                if goes_left[col_codes[i]]:
+                    left.append(i)
+                else:
+                    right.append(i)
+            stack.append((self.children[node][0], left))
+            stack.append((self.children[node][1], right))
+
+def _best_split(hist, num_values, l2, min_samples):
+    """
+    Best subset split of a node from its histogram. Returns the gain,
+    the attribute index and the set of codes that go left.
+    """
+    grad_sum, hess_sum, count = hist[0]
+    total_grad, total_hess = sum(grad_sum), sum(hess_sum)
+    total_count = sum(count)
+    parent_score = total_grad * total_grad / (total_hess + l2)
+    best_gain, best_column, best_codes = 0.0, None, None
+
+    for col in range(len(hist)):
+        grad_sum, hess_sum, count = hist[col]
+        present = [code for code in range(num_values[col]) if count[code]]
+        present.sort(key=(lambda code: grad_sum[code] / (hess_sum[code] + l2)))
+
+        left_grad, left_hess, left_count = 0.0, 0.0, 0
+        for j in range(len(present) - 1):
+            code = present[j]
+            left_grad += grad_sum[code]
+            left_hess += hess_sum[code]
+            left_count += count[code]
+            right_count = total_count - left_count
+
+            if left_count < min_samples or right_count < min_samples:
+                continue
+
+            right_grad = total_grad - left_grad
+            right_hess = total_hess - left_hess
+            gain = (left_grad * left_grad / (left_hess + l2)
+                    + right_grad * right_grad / (right_hess + l2)
+                    - parent_score)
+
+            if gain > best_gain:
+                best_gain, best_column = gain, col
+                best_codes = present[:j + 1]
+
+    return best_gain, best_column, best_codes
+
+def _grow_tree(codes, num_values, grad, hess, indices, max_depth, l2,
+               min_samples, learning_rate):
+    """
+    Grow one tree to the gradients. Returns the tree and the
+    (leaf value, row numbers) of every leaf.
+    """
+    tree = _HistTree()
+    leaves = []
+    stack = [(tree._new_node(), indices,
+              _histogram(codes, num_values, grad, hess, indices), 0)]
+
+    while stack:
+        node, rows, hist, depth = stack.pop()
+        gain, column, left_codes = (0.0, None, None)
+        if depth < max_depth and len(rows) >= 2 * min_samples:
+            gain, column, left_codes = _best_split(hist, num_values, l2,
+                                                   min_samples)
+
+        if column is None:
+            grad_sum, hess_sum, count = hist[0]
+            value = -sum(grad_sum) / (sum(hess_sum) + l2) * learning_rate
+            tree.value[node] = value
+            leaves.append((value, rows))
+            continue
+
+        goes_left = [False] * (num_values[column] + 1)  # last is unseen
+        for code in left_codes:
+            goes_left[code] = True
+
+        col_codes = codes[column]
+        left, right = [], []
+        for i in rows:
+            if goes_left[col_codes[i]]:
+                left.append(i)
+            else:
+                right.append(i)
+
+        # Scan only the smaller child, subtract for the larger one
+        if len(left) <= len(right):
+            left_hist = _histogram(codes, num_values, grad, hess, left)
+            right_hist = _subtract(hist, left_hist)
+        else:
+            right_hist = _histogram(codes, num_values, grad, hess, right)
+            left_hist = _subtract(hist, right_hist)
+
+        left_node, right_node = tree._new_node(), tree._new_node()
+        tree.column[node] = column
+        tree.goes_left[node] = goes_left
+        tree.children[node] = (left_node, right_node)
+        stack.append((left_node, left, left_hist, depth + 1))
+        stack.append((right_node, right, right_hist, depth + 1))
+
+    return tree, leaves
+
+#MODEL------------------------------------------------------------------------
+
+class GradientBoosting:
+    """
+    PURPOSE
+    Multiclass gradient boosted trees with fit / predict /
+    predict_batch, like cart.CartClassifier.
+
+    INPUT
+    header: list of column names of the rows
+    target: class label column
+    rounds: number of boosting rounds, each adds one tree per class
+    learning_rate: shrinkage of each tree's leaf values
+    max_depth: depth of each tree
+    min_samples: fewest training rows on each side of a split
+    l2: L2 regularization of the leaf values
+    """
+
+    def __init__(self, header, target='revenue', rounds=100,
+                 learning_rate=0.1, max_depth=3, min_samples=20, l2=1.0):
+        self.schema = cart.Schema(header, target)
+        self.rounds = rounds
+        self.learning_rate = learning_rate
+        self.max_depth = max_depth
+        self.min_samples = min_samples
+        self.l2 = l2
+        self.value_codes = []
+        self.classes = []
+        self.base_scores = []
+        self.trees = []
+
+    def _encode(self, rows):
+        """
+        Column major codes of the rows, unseen values get the code
+        after the last one
+        """
+        codes = []
+        for col, value_codes in zip(self.schema.attributes, self.value_codes):
+            unseen = len(value_codes)
+            codes.append([value_codes.get(row[col], unseen) for row in rows])
+        return codes
+
+    def fit(self, rows, verbose=False):
+        """
+        PURPOSE
+        Boost the trees.
+
+        INPUT
+        rows: training row lists laid out like the header
+        verbose: print the training loss every 10 rounds
+
+        OUTPUT
+        self
+        """
+        target_pos = self.schema.target_pos
+        num_rows = len(rows)
+
+        self.value_codes = []
+        for col in self.schema.attributes:
+            value_codes = {}
+            for row in rows:
+                value_codes.setdefault(row[col], len(value_codes))
+            self.value_codes.append(value_codes)
+        num_values = [len(value_codes) for value_codes in self.value_codes]
+        codes = self._encode(rows)
+
+        self.classes = sorted(set(row[target_pos] for row in rows))
+        class_index = {label: k for k, label in enumerate(self.classes)}
+        labels = [class_index[row[target_pos]] for row in rows]
+        num_classes = len(self.classes)
+
+        # Start from the log of the class priors
+        counts = [0] * num_classes
+        for k in labels:
+            counts[k] += 1
+        self.base_scores = [math.log(count / num_rows) for count in counts]
+        scores = [[self.base_scores[k]] * num_rows for k in range(num_classes)]
+
+        self.trees = []
+        indices = list(range(num_rows))
+        for round_num in range(self.rounds):
+            probs = _softmax(scores, num_rows)
+            round_trees = []
+
+            for k in range(num_classes):
+                prob = probs[k]
+                grad = [prob[i] - (labels[i] == k) for i in range(num_rows)]
+                hess = [max(p * (1 - p), 1e-6) for p in prob]
+                tree, leaves = _grow_tree(codes, num_values, grad, hess,
+                                          indices, self.max_depth, self.l2,
+                                          self.min_samples,
+                                          self.learning_rate)
+                round_trees.append(tree)
+
+                # Every training row's new score is its leaf's value
+                class_scores = scores[k]
+                for value, leaf_rows in leaves:
+                    for i in leaf_rows:
+                        class_scores[i] += value
+
+            self.trees.append(round_trees)
+
+            if verbose and (round_num + 1) % 10 == 0:
+                loss = -sum(math.log(max(probs[labels[i]][i], 1e-15))
+                            for i in range(num_rows)) / num_rows
+                print('Round {0}, training loss = {1:.4f}'.format(round_num + 1,
+                                                                   loss))
+
+        return self
+
+    def predict_scores(self, rows):
+        """
+        PURPOSE
+        Raw class scores of the rows.
+
+        INPUT
+        rows: row lists laid out like the header
+
+        OUTPUT
+        scores: list per class of the scores of every row
+        """
+        codes = self._encode(rows)
+        num_rows = len(rows)
+        indices = list(range(num_rows))
+        scores = [[base] * num_rows for base in self.base_scores]
+
+        for round_trees in self.trees:
+            for k in range(len(round_trees)):
+                round_trees[k].add_scores(codes, scores[k], indices)
+
+        return scores
+
+    def predict_batch(self, rows):
+        scores = self.predict_scores(rows)
+        num_classes = len(self.classes)
+        predictions = []
+
+        for i in range(len(rows)):
+            best = max(range(num_classes), key=(lambda k: scores[k][i]))
+            predictions.append(self.classes[best])
+
+        return predictions
+
+    def predict(self, row):
+        return self.predict_batch([row])[0]
+
+def _softmax(scores, num_rows):
+    """
+    Class probabilities of every row from the class scores
+    """
+    num_classes = len(scores)
+    probs = [[0.0] * num_rows for k in range(num_classes)]
+
+    for i in range(num_rows):
+        top = max(scores[k][i] for k in range(num_classes))
+        exps = [math.exp(scores[k][i] - top) for k in range(num_classes)]
+        total = sum(exps)
+        for k in range(num_classes):
+            probs[k][i] = exps[k] / total
+
+    return probs
+
+#MAIN-------------------------------------------------------------------------
+
+def run_boosting(filename, n, rounds=100, learning_rate=0.1, max_depth=3,
+                 min_samples=20, train_ratio=0.5):
+    """
+    PURPOSE
+    Average test accuracy of gradient boosting over n random splits.
+
+    INPUT
+    filename: name (and path) of database
+    n: number of trials
+    rounds, learning_rate, max_depth, min_samples: see GradientBoosting
+    train_ratio: portion of rows used for training
+
+    OUTPUT
+    None
+    """
+    header, dataset = cart.load_data(filename)
+    target_pos = header.index('revenue')
+    av_accuracy = 0
+
+    print('\nBuilding gradient boosted trees ({0} rounds)....\n'.format(
+        rounds))
+
+    for i in range(n):
+        train, test = cart.split_dataset(dataset, train_ratio)
+
+        start = time.perf_counter()
+        model = GradientBoosting(header, 'revenue', rounds, learning_rate,
+                                 max_depth, min_samples).fit(train)
+        build_time = time.perf_counter() - start
+
+        predictions = model.predict_batch(test)
+        correct = sum(1 for j in range(len(test))
+                      if predictions[j] == test[j][target_pos])
+        accuracy = correct / len(test) * 100
+        print('Test #{0}, accuracy = {1}, built in {2:.1f}s'.format(
+            i, accuracy, build_time))
+        av_accuracy += accuracy
+
+    print('Average over {0} trials: {1}%'.format(n, av_accuracy / n))
@@ -2,23 +2,68 @@
 PURPOSE
 Build the CART tree here.
 
+Nothing here reads module state: the column layout of the database is
+passed around as a Schema, so trees on different files can be built
+at the same time in threads or async tasks. CartClassifier wraps the
+builder in a fit / predict / predict_batch estimator.
+
 AUTHOR
 Min Gyu Park
 """
 
 import csv
-from random import shuffle
+import math
+from random import Random, shuffle
+
+from classes.columnar import ColumnarDataset, is_columnar
+from classes.dataset import NOT_ATTRIBUTES, WEIGHT
+from logic.memory import phase
+from logic.model_cache import cache_key, fingerprint_file
+from logic.probability import distribution
+
+
+class Schema:
+    """
+    Column layout of a database: the header, the position of the
+    target column, the column numbers that can be split on and the
+    position of the weight column of compressed rows (None if the rows
+    aren't weighted, see compress_rows)
+    """
+
+    def __init__(self, header, target='revenue'):
+        self.header = list(header)
+        self.target = target
+        self.target_pos = self.header.index(target)  # position of class label
+        self.attributes = [col_num for col_num in range(len(self.header))
+                           if self.header[col_num] not in NOT_ATTRIBUTES
+                           and col_num != self.target_pos]
+        self.weight_pos = (self.header.index(WEIGHT) if WEIGHT in self.header
+                           else None)
+
+
+# Gains closer than this are ties. The builders add up the same gini
+# terms in different orders, so equal gains can differ in the last bits
+GAIN_TOLERANCE = 1e-12
+
+
+def _beats(gain, best_gain):
+    """
+    Whether a split's gain beats the best one so far. Gains within
+    GAIN_TOLERANCE are ties, which go to the split found first
+    """
+    return gain > best_gain + GAIN_TOLERANCE
 
 
 class _SplittingCriterion:
     """
     Records the position of splitting attribute in
-    the header list (column number) and its splitting value.
+    the header list (column number), its name and its splitting value.
     """
 
-    def __init__(self, attr_col_num, value):
+    def __init__(self, attr_col_num, value, attr_name=None):
         self.attr_col_num = attr_col_num
         self.value = value
+        self.attr_name = attr_name
 
     def match(self, row):
         # Check if row's attribute value matches with
@@ -29,7 +74,41 @@ class _SplittingCriterion:
         # Format in a readable way
         # eg. Is 'company' == 'Disney'?
         condition = '=='
-        return "{0} {1} {2}".format(header[self.attr_col_num], condition, self.value)
+        return "{0} {1} {2}".format(_attr_label(self), condition, self.value)
+
+
+class _SubsetCriterion:
+    """
+    Records the position of splitting attribute in the header list
+    (column number), its name and a set of values. Rows with any value
+    in the set go down the true branch.
+    """
+
+    def __init__(self, attr_col_num, values, attr_name=None):
+        self.attr_col_num = attr_col_num
+        self.values = frozenset(values)
+        self.attr_name = attr_name
+
+    def match(self, row):
+        # Check if row's attribute value is in 'this' subset
+        return row[self.attr_col_num] in self.values
+
+    def __str__(self):
+        # Format in a readable way
+        # eg. Is 'company' in {'Disney', 'Pixar'}?
+        return "{0} in {{{1}}}".format(_attr_label(self),
+                                       ', '.join(sorted(self.values)))
+
+
+def _attr_label(split_crit):
+    """
+    Name of the splitting attribute, or its column number for criteria
+    built without a name
+    """
+    attr_name = getattr(split_crit, 'attr_name', None)
+    if attr_name is None:
+        return 'column {0}'.format(split_crit.attr_col_num)
+    return attr_name
 
 
 class _Leaf:
@@ -37,8 +116,16 @@ class _Leaf:
     A Leaf node that holds the frequency of the class values
     """
 
-    def __init__(self, rows):
-        self.predictions = _count_class_values(rows)
+    def __init__(self, rows, target_pos, weight_pos=None):
+        self.predictions = _count_class_values(rows, target_pos, weight_pos)
+
+    @classmethod
+    def from_counts(cls, counts):
+        # Build a leaf from class counts that were already tallied,
+        # eg. by a streaming pass that never held the rows
+        leaf = cls([], None)
+        leaf.predictions = dict(counts)
+        return leaf
 
 
 class _SplittingNode:
@@ -59,20 +146,33 @@ def _get_unique_values(rows, attr_num):
     return set([row[attr_num] for row in rows])
 
 
-def _count_class_values(rows):
+def _count_class_values(rows, target_pos, weight_pos=None):
     """
-    Count how many times each class label occurs in a dataset
+    Count how many times each class label occurs in a dataset,
+    each row counted by its weight if the rows are weighted
     """
     counter = {}  # save it as label -> count
     for row in rows:
-        class_label = row[revenue_pos]  # class label at the last column
+        class_label = row[target_pos]
         if class_label not in counter:
             counter[class_label] = 0
-        counter[class_label] += 1
+        if weight_pos is None:
+            counter[class_label] += 1
+        else:
+            counter[class_label] += row[weight_pos]
 
     return counter
 
 
+def _total_weight(rows, weight_pos):
+    """
+    Number of rows, each counted by its weight if the rows are weighted
+    """
+    if weight_pos is None:
+        return len(rows)
+    return sum(row[weight_pos] for row in rows)
+
+
 def _partition(rows, split_crit):
     """
     Partition a dataset into true/false rows based on the
@@ -90,52 +190,172 @@ def _partition(rows, split_crit):
     return true_rows, false_rows
 
 
-def _gini(rows):
+def _gini(rows, target_pos, weight_pos=None):
     """
     Calculate the Gini Impurity of the rows.
     """
     # Count the unique class values and their frequency in rows
-    class_values = _count_class_values(rows)
+    class_values = _count_class_values(rows, target_pos, weight_pos)
+    size = float(_total_weight(rows, weight_pos))
 
     gini_impurity = 1
     # for each class value
     for class_val in class_values:
-        prob = class_values[class_val] / float(len(rows))  # Get its probability ( frequency / total size )
+        prob = class_values[class_val] / size  # Get its probability ( frequency / total size )
         gini_impurity -= prob ** 2  # Gini = 1 - (sum of prob^2)
     return gini_impurity
 
 
-def _info_gain(left, right, current_uncertainty):
+def _info_gain(left, right, current_uncertainty, target_pos, weight_pos=None):
     """
     Calculate uncertainty given the uncertainty of current node
     and its child nodes
     """
-    prob = float(len(left)) / (len(left) + len(right))
-    return current_uncertainty - prob * _gini(left) - (1 - prob) * _gini(right)
+    left_size = _total_weight(left, weight_pos)
+    right_size = _total_weight(right, weight_pos)
+    prob = float(left_size) / (left_size + right_size)
+    return (current_uncertainty - prob * _gini(left, target_pos, weight_pos)
+            - (1 - prob) * _gini(right, target_pos, weight_pos))
 
 
-def _get_best_split(rows):
+def _gini_of_counts(counts, size):
     """
-    Get the best split by iterating over every attribute
-    and its value and calculating its information gain
+    Gini Impurity of a class label -> count table
     """
-    best_gain = 0  # to hold the best gain to split
-    best_split_crit = None  # to hold the best splitting criterion
-    current_uncertainty = _gini(rows)
-    size = len(header)  # number of columns
+    gini_impurity = 1
+    for count in counts.values():
+        gini_impurity -= (count / float(size)) ** 2
+    return gini_impurity
+
+
+def _class_order_key(class_counts):
+    """
+    Key to order attribute values by their class distribution.
+
+    Values are ordered by their mean class when the labels are numbers
+    (revenue brackets), otherwise by the share of the node's most common
+    class. With two classes either order is Breiman's, and the best gini
+    subset split is one of its prefixes. With more classes (the cleaned
+    database has 5 or more brackets) that no longer holds: scoring the
+    prefixes is an approximation that can miss the best subset, so
+    --subset-splits is not an exhaustive search.
+    """
+    try:
+        numeric = {label: float(label) for label in class_counts}
+
+        def key(counts):
+            size = sum(counts.values())
+            return sum(numeric[label] * count
+                       for label, count in counts.items()) / size
+    except ValueError:
+        top = max(class_counts.keys(), key=(lambda label: class_counts[label]))
+
+        def key(counts):
+            return counts.get(top, 0) / float(sum(counts.values()))
+
+    return key
+
+
+def _best_subset_split(rows, schema, col_num, current_uncertainty,
+                       class_counts):
+    """
+    Get the best subset split of one attribute. One pass counts the
+    classes of each value, the values are sorted by their class
+    distribution, and only the V - 1 prefixes of that order are scored,
+    from running counts. O(V log V) after counting.
+    """
+    weight_pos = schema.weight_pos
+    value_counts = {}  # save it as value -> {class label -> count}
+    for row in rows:
+        value = row[col_num]
+        class_label = row[schema.target_pos]
+        weight = 1 if weight_pos is None else row[weight_pos]
+        if value not in value_counts:
+            value_counts[value] = {}
+        counts = value_counts[value]
+        counts[class_label] = counts.get(class_label, 0) + weight
+
+    return _best_subset_of_counts(value_counts, schema, col_num,
+                                  current_uncertainty, class_counts,
+                                  _total_weight(rows, weight_pos))
+
+
+def _best_subset_of_counts(value_counts, schema, col_num, current_uncertainty,
+                           class_counts, size):
+    """
+    The scoring half of _best_subset_split, for value x class counts
+    that were already tallied
+    """
+    if len(value_counts) < 2:
+        return 0, None
+
+    key = _class_order_key(class_counts)
+    # Sorted by value first, so values with the same key keep one order
+    ordered = sorted(sorted(value_counts),
+                     key=(lambda value: key(value_counts[value])))
+
+    best_gain, best_prefix = 0, 0
+    left, left_size = {}, 0
+    for i in range(len(ordered) - 1):
+        for class_label, count in value_counts[ordered[i]].items():
+            left[class_label] = left.get(class_label, 0) + count
+            left_size += count
+
+        right = {class_label: class_counts[class_label] - left.get(class_label, 0)
+                 for class_label in class_counts}
+        prob = float(left_size) / size
+        gain = (current_uncertainty
+                - prob * _gini_of_counts(left, left_size)
+                - (1 - prob) * _gini_of_counts(right, size - left_size))
+
+        if _beats(gain, best_gain):
+            best_gain, best_prefix = gain, i + 1
+
+    if best_prefix == 0:
+        return 0, None
+
+    # Keep the smaller side as the set, a single value as a plain == split
+    true_values = ordered[:best_prefix]
+    if len(true_values) > len(ordered) - best_prefix:
+        true_values = ordered[best_prefix:]
+    attr_name = schema.header[col_num]
+    if len(true_values) == 1:
+        return best_gain, _SplittingCriterion(col_num, true_values[0],
+                                              attr_name)
+    return best_gain, _SubsetCriterion(col_num, true_values, attr_name)
+
+
+def _candidate_splits(rows, schema, subsets=False):
+    """
+    Yield the info gain and splitting criterion of every attribute
+    value that splits the rows into two non-empty partitions.
+    With subsets, yield the best subset split of each attribute instead
+    """
+    target_pos = schema.target_pos
+    weight_pos = schema.weight_pos
+    current_uncertainty = _gini(rows, target_pos, weight_pos)
+
+    if subsets:
+        class_counts = _count_class_values(rows, target_pos, weight_pos)
+        for col_num in schema.attributes:
+            gain, split_crit = _best_subset_split(rows, schema, col_num,
+                                                  current_uncertainty,
+                                                  class_counts)
+            if split_crit is not None:
+                yield gain, split_crit
+        return
 
     # for each attribute
-    for col_num in range(size):
-        # Get unique values in the column
-        if header[col_num] == 'revenue' or header[col_num] == 'title':
-            continue
-        else:
-            unique_values = _get_unique_values(rows, col_num)
+    for col_num in schema.attributes:
+        # Get unique values in the column, in sorted order so ties
+        # between equally good splits go the same way in every builder
+        unique_values = sorted(_get_unique_values(rows, col_num))
+        attr_name = schema.header[col_num]
 
         # for each value
         for val in unique_values:
             # Try to split the dataset to find the best info gain
-            split_crit = _SplittingCriterion(col_num, val)
+            split_crit = _SplittingCriterion(col_num, val, attr_name)
             true_rows, false_rows = _partition(rows, split_crit)
 
             # Skip if either partition is empty
@@ -143,16 +363,100 @@ def _get_best_split(rows):
                 continue
 
             # Calculate the info gain
-            gain = _info_gain(true_rows, false_rows, current_uncertainty)
+            yield _info_gain(true_rows, false_rows, current_uncertainty,
+                             target_pos, weight_pos), split_crit
 
-            # Save the best gain and its splitting criterion
-            if gain > best_gain:
-                best_gain, best_split_crit = gain, split_crit
+
+def _get_best_split(rows, schema, subsets=False):
+    """
+    Get the best split by iterating over every attribute
+    and its value and calculating its information gain
+    """
+    best_gain = 0  # to hold the best gain to split
+    best_split_crit = None  # to hold the best splitting criterion
+
+    for gain, split_crit in _candidate_splits(rows, schema, subsets):
+        # Save the best gain and its splitting criterion
+        if _beats(gain, best_gain):
+            best_gain, best_split_crit = gain, split_crit
 
     return best_gain, best_split_crit
 
 
-def _build_tree(rows):
+class SplitSampling:
+    """
+    Settings for choosing splits from a sample of the rows at large
+    nodes. A node with more than threshold rows picks its split from
+    sample_size random rows, and only keeps it if the Hoeffding bound
+    says the best candidate beats the runner up with probability at
+    least 1 - delta. Otherwise the node falls back to the exact search.
+
+    If sample_size is None it is sized from the Hoeffding bound so the
+    estimated gains are within tolerance of the true gains.
+    Counts how often each case happened in sampled / exact / fallbacks.
+    The rng and counters are not locked, so give each thread its own.
+    """
+
+    def __init__(self, threshold=10000, delta=0.05, sample_size=None,
+                 tolerance=0.01, seed=None):
+        self.threshold = threshold
+        self.delta = delta
+        if sample_size is None:
+            sample_size = _hoeffding_size(delta, tolerance)
+        self.sample_size = sample_size
+        self.rng = Random(seed)
+        self.sampled = 0
+        self.exact = 0
+        self.fallbacks = 0
+
+
+def _hoeffding_bound(delta, n):
+    """
+    Hoeffding bound on how far a mean of n samples can be from the true
+    mean with probability 1 - delta. Gini gain lies in [0, 1] so the
+    range is 1.
+    """
+    return math.sqrt(math.log(1 / delta) / (2.0 * n))
+
+
+def _hoeffding_size(delta, tolerance):
+    """
+    Number of samples needed for the Hoeffding bound to be tolerance
+    """
+    return int(math.ceil(math.log(1 / delta) / (2.0 * tolerance ** 2)))
+
+
+def _get_sampled_split(rows, schema, sampling, subsets=False):
+    """
+    Get the best split of a large node from a random sample of its
+    rows, falling back to every row when the top two candidates are too
+    close to tell apart
+    """
+    if len(rows) <= max(sampling.threshold, sampling.sample_size):
+        sampling.exact += 1
+        return _get_best_split(rows, schema, subsets)
+
+    sample = sampling.rng.sample(rows, sampling.sample_size)
+    best_gain, second_gain = 0, 0
+    best_split_crit = None
+
+    for gain, split_crit in _candidate_splits(sample, schema, subsets):
+        if gain > best_gain:
+            best_gain, second_gain = gain, best_gain
+            best_split_crit = split_crit
+        elif gain > second_gain:
+            second_gain = gain
+
+    if (best_split_crit is not None and best_gain - second_gain >
+            _hoeffding_bound(sampling.delta, sampling.sample_size)):
+        sampling.sampled += 1
+        return best_gain, best_split_crit
+
+    sampling.fallbacks += 1
+    return _get_best_split(rows, schema, subsets)
+
+
+def _build_tree(rows, schema, sampling=None, subsets=False):
     """
     Build a tree using recursion
 
@@ -161,25 +465,42 @@ def _build_tree(rows):
 
         Else...
         Split the rows using the best splitting criterion
+
+    Pass a SplitSampling to pick the splits of large nodes from a sample,
+    and subsets=True to split on subsets of values instead of one value
     """
     # Get the best gain and splitting criterion
-    gain, split_crit = _get_best_split(rows)
+    if sampling is None:
+        gain, split_crit = _get_best_split(rows, schema, subsets)
+    else:
+        gain, split_crit = _get_sampled_split(rows, schema, sampling, subsets)
 
     # Base case
     if gain == 0:
-        return _Leaf(rows)
+        return _Leaf(rows, schema.target_pos, schema.weight_pos)
 
     # Else... split rows
     true_rows, false_rows = _partition(rows, split_crit)
 
     # Build tree from true and false branches
-    true_branch = _build_tree(true_rows)
-    false_branch = _build_tree(false_rows)
+    true_branch = _build_tree(true_rows, schema, sampling, subsets)
+    false_branch = _build_tree(false_rows, schema, sampling, subsets)
 
     # Return the node containing its child nodes and the splitting criterion
     return _SplittingNode(split_crit, true_branch, false_branch)
 
 
+def _build(rows, schema, sampling=None, subsets=False, engine='rows'):
+    """
+    Build a tree with the given engine: 'rows' is _build_tree,
+    'bitset' is logic.bitset (no sampled splits or weighted rows there)
+    """
+    if engine == 'bitset':
+        from logic import bitset
+        return bitset.build_bitset_cart(rows, schema, subsets)
+    return _build_tree(rows, schema, sampling, subsets)
+
+
 def classify(row, node):
     """
     Classify a row given a splitting node
@@ -198,19 +519,275 @@ def classify(row, node):
 def predict(leaf):
     """
     Based on its class values, predict the class label it belongs
-    by finding the maximum among the class values
+    by finding the maximum among the class values, ties going to the
+    smallest label. This is the class order of CartClassifier.classes,
+    so the label is always the argmax of the leaf's predict_proba tuple
     """
-    return max(leaf.keys(), key=(lambda key: leaf[key]))
+    return max(sorted(leaf), key=leaf.get)
 
 
-def split_dataset(dataset, train_ratio):
+def _leaves(tree):
     """
-    Split the data into training and testing dataset
+    The leaves of a tree, true branches first
+    """
+    leaves = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, _Leaf):
+            leaves.append(node)
+        else:
+            stack.append(node.false_branch)
+            stack.append(node.true_branch)
+    return leaves
+
+
+def _route_batch(rows, tree):
+    """
+    Send a batch of rows down the tree together, one pass over the
+    rows of each node, and return (leaf, row numbers) pairs
+    """
+    routed = []
+    stack = [(tree, list(range(len(rows))))]
+    while stack:
+        node, indices = stack.pop()
+        if isinstance(node, _Leaf):
+            routed.append((node, indices))
+            continue
+
+        match = node.split_crit.match
+        true_indices, false_indices = [], []
+        for i in indices:
+            if match(rows[i]):
+                true_indices.append(i)
+            else:
+                false_indices.append(i)
+        if true_indices:
+            stack.append((node.true_branch, true_indices))
+        if false_indices:
+            stack.append((node.false_branch, false_indices))
+    return routed
+
+
+class CartClassifier:
+    """
+    A CART tree together with the schema it was built for.
+    Each instance owns its own state, so several can be fitted and
+    used at once on different files (give each its own SplitSampling).
+    engine is 'rows' or 'bitset', see _build. With dedup, fit trains on
+    the rows compressed by compress_rows.
+    predict_proba gives the class distribution of each row's leaf, in
+    the order of self.classes.
+
+        model = CartClassifier(header).fit(train)
+        labels = model.predict_batch(test)
+        probabilities = model.predict_proba(test, smoothing=1)
+    """
+
+    def __init__(self, header, target='revenue', sampling=None,
+                 subsets=False, engine='rows', dedup=False):
+        self.schema = Schema(header, target)
+        self.sampling = sampling
+        self.subsets = subsets
+        self.engine = engine
+        self.dedup = dedup
+        self.tree = None
+        self.classes = []
+        self._leaf_tables = {}
+
+    def fit(self, rows):
+        # Build the tree from row lists laid out like the header
+        schema = self.schema
+        if self.dedup:
+            schema, rows = compress_rows(rows, schema)
+        self.tree = _build(rows, schema, self.sampling, self.subsets,
+                           self.engine)
+        # Every training row is counted in some leaf, so the leaves
+        # have every class between them
+        self.classes = sorted(set(label for leaf in _leaves(self.tree)
+                                  for label in leaf.predictions))
+        self._leaf_tables = {}
+        return self
+
+    def predict(self, row):
+        # Most common class label of the leaf the row ends up in
+        return predict(classify(row, self.tree))
+
+    def predict_batch(self, rows):
+        # Same labels as predict, routing the rows in one batch
+        labels = [None] * len(rows)
+        for leaf, indices in _route_batch(rows, self.tree):
+            label = predict(leaf.predictions)
+            for i in indices:
+                labels[i] = label
+        return labels
+
+    def leaf_table(self, smoothing=0.0):
+        # Dense class distribution of every leaf by id of the leaf,
+        # worked out once per smoothing value
+        table = self._leaf_tables.get(smoothing)
+        if table is None:
+            table = {id(leaf): distribution(leaf.predictions, self.classes,
+                                            smoothing)
+                     for leaf in _leaves(self.tree)}
+            self._leaf_tables[smoothing] = table
+        return table
+
+    def predict_proba(self, rows, smoothing=0.0):
+        # Tuple of class probabilities of every row, routing the rows
+        # in one batch and handing out the tuple of the leaf each one
+        # ends up in (rows in the same leaf share it). smoothing adds
+        # that many counts of every class to each leaf
+        table = self.leaf_table(smoothing)
+        probabilities = [None] * len(rows)
+        for leaf, indices in _route_batch(rows, self.tree):
+            leaf_probabilities = table[id(leaf)]
+            for i in indices:
+                probabilities[i] = leaf_probabilities
+        return probabilities
+
+
+class _MeanLeaf:
+    """
+    A Leaf node of a regression tree that holds the mean target value
+    """
+
+    def __init__(self, size, total):
+        self.size = size
+        self.value = total / float(size)
+
+
+def _target_stats(rows, target_pos):
+    """
+    Count, sum and sum of squares of the target column
+    """
+    total, total_sq = 0, 0
+    for row in rows:
+        y = row[target_pos]
+        total += y
+        total_sq += y * y
+
+    return len(rows), total, total_sq
+
+
+def _get_best_regression_split(rows, schema, stats):
+    """
+    Get the split with the largest reduction in squared error.
+    Each attribute takes one pass over the rows to get the running
+    count / sum / sum of squares of every value, then every one-vs-rest
+    split of that attribute is scored from those sums alone.
+    """
+    size, total, total_sq = stats
+    target_pos = schema.target_pos
+    current_sse = total_sq - total * total / float(size)
+    best_gain = 0  # to hold the best reduction in squared error
+    best_split_crit = None
+
+    for col_num in schema.attributes:
+        value_stats = {}  # save it as value -> [count, sum, sum of squares]
+        for row in rows:
+            y = row[target_pos]
+            value_stat = value_stats.get(row[col_num])
+            if value_stat is None:
+                value_stats[row[col_num]] = [1, y, y * y]
+            else:
+                value_stat[0] += 1
+                value_stat[1] += y
+                value_stat[2] += y * y
+
+        for val, (count, value_sum, value_sq) in value_stats.items():
+            rest = size - count
+            # Skip if either partition is empty
+            if rest == 0:
+                continue
+
+            rest_sum = total - value_sum
+            sse = (value_sq - value_sum * value_sum / float(count) +
+                   (total_sq - value_sq) - rest_sum * rest_sum / float(rest))
+            gain = current_sse - sse
+
+            if gain > best_gain:
+                best_gain = gain
+                best_split_crit = _SplittingCriterion(col_num, val,
+                                                      schema.header[col_num])
+
+    return best_gain, best_split_crit
+
+
+def _build_regression_tree(rows, schema, max_depth=None, min_samples=2,
+                           depth=0):
+    """
+    Build a regression tree using recursion, splitting on the largest
+    variance reduction
+
+        Base case: fewer than min_samples rows, max_depth reached,
+                   all targets equal or no split reduces the error
+                   Return a leaf with the mean target
+
+        Else...
+        Split the rows using the best splitting criterion
+    """
+    stats = _target_stats(rows, schema.target_pos)
+    size, total, total_sq = stats
+
+    # All targets equal, checked exactly as size * sum(y^2) == sum(y)^2
+    if (size < min_samples or (max_depth is not None and depth >= max_depth)
+            or size * total_sq == total * total):
+        return _MeanLeaf(size, total)
+
+    gain, split_crit = _get_best_regression_split(rows, schema, stats)
+
+    if split_crit is None:
+        return _MeanLeaf(size, total)
+
+    true_rows, false_rows = _partition(rows, split_crit)
+
+    true_branch = _build_regression_tree(true_rows, schema, max_depth,
+                                         min_samples, depth + 1)
+    false_branch = _build_regression_tree(false_rows, schema, max_depth,
+                                          min_samples, depth + 1)
+
+    return _SplittingNode(split_crit, true_branch, false_branch)
+
+
+def regress(row, node):
+    """
+    Predict the target value of a row given a regression tree
+    """
+    while not isinstance(node, _MeanLeaf):
+        if node.split_crit.match(row):
+            node = node.true_branch
+        else:
+            node = node.false_branch
+
+    return node.value
+
+
+def _to_number(value):
+    """
+    Parse a target value, keeping whole numbers as ints so the
+    sums of squares stay exact
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def split_dataset(dataset, train_ratio, rng=None):
+    """
+    Split the data into training and testing dataset.
+    Given an rng (eg. a seeded Random), a copy is shuffled instead
+    so the split only depends on the rng, not on earlier shuffles
     """
     size = len(dataset)  # size of dataset
 
     # Shuffle the dataset randomly
-    shuffle(dataset)
+    if rng is None:
+        shuffle(dataset)
+    else:
+        dataset = list(dataset)
+        rng.shuffle(dataset)
 
     # Split the data
     train_data = dataset[:int(train_ratio * size)]
@@ -219,54 +796,116 @@ def split_dataset(dataset, train_ratio):
     return train_data, test_data
 
 
-def _get_accuracy(tree, test):
+def _get_accuracy(tree, test, schema, report=None):
     """
     Find out how many predictions are correct given a tree
     and test data
     """
     size = len(test)
+    target_pos = schema.target_pos
     correct = 0.0
 
+    with phase(report, 'evaluate'):
+        # Predict the data
+        predictions = [predict(classify(row, tree)) for row in test]
+
+        for i in range(size):
+            if test[i][target_pos] == predictions[i]:
+                correct += 1
+
     # Write the results
-    with open('results.csv', 'w', newline='\n', encoding='utf-8') as resultFile:
+    with phase(report, 'write results'), \
+            open('results.csv', 'w', newline='\n', encoding='utf-8') as resultFile:
         writer = csv.writer(resultFile, delimiter=',')
         header_row = []
-        for r in header:
+        for r in schema.header:
             header_row.append(r)
         header_row.append('Prediction')
         writer.writerow(header_row)
         # for each row in test data
-        for row in test:
+        for i in range(size):
             # Copy data to write
             result_row = []
-            for r in row:
+            for r in test[i]:
                 result_row.append(r)
 
-            predict_leaf = predict(classify(row, tree))  # Predict the data
-
             # Write the results
-            result_row.append(predict_leaf)
+            result_row.append(predictions[i])
             writer.writerow(result_row)
 
-            if row[revenue_pos] == predict_leaf:
-                correct += 1
-
     accuracy = correct / size * 100
 
     return accuracy
 
 
-def _get_av_accuracy(dataset, train_ratio, n):
+def compress_rows(rows, schema):
+    """
+    Collapse rows with the same attribute values and class label into
+    one row with a weight column on the end, so building costs the
+    number of distinct rows instead of the number of rows. Columns that
+    aren't attributes are kept from the first row of each group.
+    Returns the Schema of the weighted rows and the rows
+    """
+    weight_pos = schema.weight_pos
+    if weight_pos is None:
+        header = schema.header + [WEIGHT]
+        new_pos = len(schema.header)
+    else:
+        header = schema.header
+        new_pos = weight_pos
+
+    groups = {}  # save it as (attribute values, class label) -> row
+    for row in rows:
+        key = (tuple([row[col_num] for col_num in schema.attributes]),
+               row[schema.target_pos])
+        group = groups.get(key)
+        if group is None:
+            group = list(row) if weight_pos is not None else list(row) + [0]
+            group[new_pos] = 0
+            groups[key] = group
+        group[new_pos] += 1 if weight_pos is None else row[weight_pos]
+
+    return Schema(header, schema.target), list(groups.values())
+
+
+def _get_av_accuracy(dataset, schema, train_ratio, n, sampling=None,
+                     report=None, subsets=False, seed=None, cache=None,
+                     data_fingerprint=None, engine='rows', dedup=False):
     """
     Split the data n times and build a tree  to find out the
     average accuracy and the average time to build the tree.
+    With a seed, split i uses Random(seed + i), and with a cache,
+    trees already built on the same data and split are reused.
+    With dedup, each training split is compressed before building
     """
     av_accuracy = 0
     for i in range(n):
-        train, test = split_dataset(dataset, train_ratio)
-
-        tree = _build_tree(train)
-        accuracy = _get_accuracy(tree, test)
+        with phase(report, 'split'):
+            rng = None if seed is None else Random(seed + i)
+            train, test = split_dataset(dataset, train_ratio, rng)
+
+        train_schema = schema
+        if dedup:
+            with phase(report, 'compress'):
+                train_schema, train = compress_rows(train, schema)
+
+        with phase(report, 'build'):
+            if cache is None:
+                tree = _build(train, train_schema, sampling, subsets, engine)
+            else:
+                params = {'train_ratio': train_ratio, 'subsets': subsets,
+                          'sampling': None if sampling is None else
+                          [sampling.threshold, sampling.delta,
+                           sampling.sample_size]}
+                if engine != 'rows':
+                    params['engine'] = engine
+                if dedup:
+                    params['dedup'] = True
+                key = cache_key('cart', [data_fingerprint, seed + i], params)
+                tree = cache.get_or_build(
+                    key, lambda: _build(train, train_schema, sampling, subsets,
+                                        engine))
+        accuracy = _get_accuracy(tree, test, schema, report)
         print('Test #{0}, accuracy = {1}'.format(i, accuracy))
 
         # Get accuracy
@@ -277,20 +916,110 @@ def _get_av_accuracy(dataset, train_ratio, n):
     print('Average over {0} trials: {1}%'.format(n, av_accuracy))
 
 
-def run_cart(filename, n):
-    # Open file and get the data as list
-    with open(filename, 'r') as file:
-        reader = csv.reader(file)
-        dataset = list(reader)
+def load_data(filename):
+    """
+    Read the database as its header and a list of rows.
+    A .bin columnar copy is memory mapped instead of parsed.
+    """
+    if is_columnar(filename):
+        with ColumnarDataset(filename) as columnar:
+            dataset = [list(columnar.names)]
+            dataset.extend([row[name] for name in columnar.names]
+                           for row in columnar.rows())
+    else:
+        # Open file and get the data as list
+        with open(filename, 'r') as file:
+            reader = csv.reader(file)
+            dataset = list(reader)
+
+    # column names, then the rows without them
+    return dataset[0], dataset[1:]
+
+
+def run_cart(filename, n, sampling=None, report=None, subsets=False,
+             seed=None, cache=None, engine='rows', dedup=False):
+    # Pass a logic.memory.MemoryReport as report to get the memory
+    # used by each phase printed with the summary, and a
+    # logic.model_cache.ModelCache as cache (needs a seed) to reuse
+    # trees from earlier runs with the same file and seed. dedup trains
+    # on the training rows compressed by compress_rows
+    if engine == 'bitset' and sampling is not None:
+        raise ValueError('Sampled splits need the rows engine')
+    if dedup and (sampling is not None or engine == 'bitset'):
+        raise ValueError('Compressed rows need the rows engine without '
+                         'sampled splits')
+    if cache is not None and seed is None:
+        # A random seed would key entries no later run can hit
+        raise ValueError('The model cache needs a seed')
+
+    with phase(report, 'load'):
+        header, dataset = load_data(filename)
+        schema = Schema(header)
+
+    data_fingerprint = None
+    if cache is not None:
+        data_fingerprint = fingerprint_file(filename)
+
+    print('\nBuilding decision tree using CART algorithm....\n')
+
+    _get_av_accuracy(dataset, schema, 0.5, n, sampling, report, subsets, seed,
+                     cache, data_fingerprint, engine, dedup)
 
-    global header
-    header = dataset[0]  # get column names
+    if cache is not None:
+        print(cache.summary())
 
-    global revenue_pos
-    revenue_pos = header.index('revenue')  # get position of class label
+    if sampling is not None:
+        print('Sampled splits: {0}, fallbacks to exact: {1}'.format(
+            sampling.sampled, sampling.fallbacks))
 
-    dataset = dataset[1:]  # exclude column names from dataset
+    if report is not None:
+        report.stop()
+        print(report.summary())
 
-    print('\nBuilding decision tree using CART algorithm....\n')
 
-    _get_av_accuracy(dataset, 0.5, n)
+def run_cart_regression(filename, n, target='revenue_adjusted', max_depth=None,
+                        min_samples=5):
+    """
+    Build n regression trees on random splits and print the mean
+    absolute error and root mean squared error on the test data.
+    The target column is written by data_cleanup.clean_data(adjusted=True)
+    (python main.py clean --adjusted), so filename must be the CSV
+    database, not a columnar copy.
+    """
+    if is_columnar(filename):
+        raise ValueError('The columnar file only keeps the bracket columns, '
+                         'regression needs the CSV database')
+
+    header, dataset = load_data(filename)
+
+    if target not in header:
+        raise ValueError('{0} has no {1} column, run "python main.py clean '
+                         '--adjusted" first'.format(filename, target))
+
+    schema = Schema(header, target)
+    target_pos = schema.target_pos
+    for row in dataset:
+        row[target_pos] = _to_number(row[target_pos])
+
+    print('\nBuilding regression tree using CART algorithm....\n')
+
+    av_mae, av_rmse = 0, 0
+    for i in range(n):
+        train, test = split_dataset(dataset, 0.5)
+        tree = _build_regression_tree(train, schema, max_depth, min_samples)
+
+        abs_error, sq_error = 0.0, 0.0
+        for row in test:
+            error = regress(row, tree) - row[target_pos]
+            abs_error += abs(error)
+            sq_error += error * error
+
+        mae = abs_error / len(test)
+        rmse = (sq_error / len(test)) ** 0.5
+        print('Test #{0}, MAE = {1:.0f}, RMSE = {2:.0f}'.format(i, mae, rmse))
+
+        av_mae += mae
+        av_rmse += rmse
+
+    print('Average over {0} trials: MAE = {1:.0f}, RMSE = {2:.0f}'.format(
+        n, av_mae / n, av_rmse / n))
@@ -0,0 +1,295 @@
+"""
+PURPOSE
+Compile a trained ID3 or CART tree into Python source code, so scoring a
+single row is a few inlined comparisons instead of walking node objects.
+
+ID3 nodes become if/elif chains on the attribute value, and nodes whose
+children are all leaves become a constant dict lookup. CART nodes become
+a flat chain of "if matches: ..." blocks (subset splits test membership
+in a constant frozenset), where the false branch follows
+the true block at the same indentation (the true block always returns),
+so nesting only grows along true branches.
+
+The generated module defines predict(row) and predict_batch(rows). It
+only uses builtins, so it can be saved to disk and imported later
+without importing any of the training code.
+
+AUTHOR
+Warren Lacaba
+"""
+import importlib.util
+import os
+import tempfile
+import types
+
+INDENT = '    '
+
+#CODE GENERATION--------------------------------------------------------------
+
+def _id3_lines(node, depth, lines, tables):
+    """
+    Emit the body of an ID3 subtree at the given depth
+    """
+    pad = INDENT * (depth + 1)
+
+    if len(node.branches) == 0:
+        lines.append(pad + 'return ' + repr(node.label))
+        return
+
+    var = 'v' + str(depth)
+    lines.append(pad + var + ' = movie[' + repr(node.label) + ']')
+
+    if all(len(child.branches) == 0 for child in node.children):
+        name = '_TABLE' + str(len(tables))
+        tables.append((name, {node.branches[i]: node.children[i].label
+                              for i in range(len(node.branches))}))
+        lines.append(pad + 'return ' + name + '.get(' + var + ')')
+        return
+
+    for i in range(len(node.branches)):
+        keyword = 'if ' if i == 0 else 'elif '
+        lines.append(pad + keyword + var + ' == ' +
+                     repr(node.branches[i]) + ':')
+        _id3_lines(node.children[i], depth + 1, lines, tables)
+
+    lines.append(pad + 'return None')
+
+def _cart_lines(node, depth, lines, tables):
+    """
+    Emit the body of a CART subtree at the given depth
+    """
+    pad = INDENT * (depth + 1)
+
+    #Leaves are the only nodes with predictions. Checked by attribute
+    #rather than isinstance so loading a model never imports cart.
+    if hasattr(node, 'predictions'):
+        leaf = node.predictions
+        #Ties go to the smallest label, like cart.CartClassifier
+        lines.append(pad + 'return ' + repr(max(sorted(leaf), key=leaf.get)))
+        return
+
+    split_crit = node.split_crit
+    column = 'row[' + str(split_crit.attr_col_num) + ']'
+    if hasattr(split_crit, 'values'):
+        name = '_SET' + str(len(tables))
+        tables.append((name, split_crit.values))
+        lines.append(pad + 'if ' + column + ' in ' + name + ':')
+    else:
+        lines.append(pad + 'if ' + column + ' == ' + repr(split_crit.value) +
+                     ':')
+    _cart_lines(node.true_branch, depth + 1, lines, tables)
+    _cart_lines(node.false_branch, depth, lines, tables)
+
+def _module_source(kind, constants, body, arg):
+    """
+    Put the generated predict body into a full module
+    """
+    lines = ['"""',
+             'Generated ' + kind.upper() + ' predictor. Do not edit by hand.',
+             '"""',
+             'KIND = ' + repr(kind)]
+
+    for name, value in constants:
+        lines.append(name + ' = ' + repr(value))
+
+    lines.append('')
+    lines.append('def predict(' + arg + '):')
+    lines.extend(body)
+    lines.append('')
+    lines.append('def predict_batch(rows):')
+    lines.append(INDENT + 'return list(map(predict, rows))')
+
+    return '\n'.join(lines) + '\n'
+
+def id3_source(root):
+    """
+    PURPOSE
+    Generate predictor source for an ID3 tree.
+
+    INPUT
+    root: root Node of the tree, as built by id3.id3_tree
+
+    OUTPUT
+    source: string of Python source. predict(movie) takes a movie dict and
+            returns the class label, or None if no rule covers the movie
+    """
+    body = []
+    tables = []
+    _id3_lines(root, 0, body, tables)
+
+    return _module_source('id3', tables, body, 'movie')
+
+def cart_source(tree, header):
+    """
+    PURPOSE
+    Generate predictor source for a CART tree.
+
+    INPUT
+    tree: root of the tree, as built by cart._build_tree
+    header: list of column names of the rows the tree was trained on
+
+    OUTPUT
+    source: string of Python source. predict(row) takes a row list and
+            returns the predicted class label
+    """
+    body = []
+    tables = []
+    _cart_lines(tree, 0, body, tables)
+
+    return _module_source('cart', [('HEADER', list(header))] + tables, body,
+                          'row')
+
+#LOADING AND SAVING-----------------------------------------------------------
+
+def compile_source(source, name='tree_predictor'):
+    """
+    PURPOSE
+    Compile generated source into a module object.
+
+    INPUT
+    source: string of Python source from id3_source or cart_source
+    name: module name
+
+    OUTPUT
+    module: module with predict and predict_batch
+    """
+    module = types.ModuleType(name)
+    exec(compile(source, '<' + name + '>', 'exec'), module.__dict__)
+
+    return module
+
+def compile_id3(root):
+    """
+    Compile an ID3 tree straight into a predictor module
+    """
+    return compile_source(id3_source(root), 'id3_predictor')
+
+def compile_cart(tree, header):
+    """
+    Compile a CART tree straight into a predictor module
+    """
+    return compile_source(cart_source(tree, header), 'cart_predictor')
+
+def save_source(source, path):
+    """
+    PURPOSE
+    Write generated source to disk as a module. The file is written to a
+    temporary name first and then renamed, so readers never see half of
+    a file.
+
+    INPUT
+    source: string of Python source
+    path: where to save it, should end in .py
+
+    OUTPUT
+    None
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+            tmp.write(source)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def load_module(path):
+    """
+    PURPOSE
+    Import a saved predictor module. Python caches the bytecode in
+    __pycache__, so later loads skip compiling.
+
+    INPUT
+    path: path of a module written by save_source
+
+    OUTPUT
+    module: module with predict and predict_batch
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+#USING A LOADED MODEL---------------------------------------------------------
+
+def model_input(model, row, strict=False):
+    """
+    PURPOSE
+    Check one row of raw column values and turn it into what the model's
+    predict takes.
+
+    INPUT
+    model: predictor module
+    row: dict of column name -> string value, as given by csv.DictReader
+         (revenue is not needed)
+    strict: also reject columns the model does not know
+
+    OUTPUT
+    input: movie dict (ID3) or row list (CART)
+
+    Raises ValueError if the row is not a dict, leaves out an attribute
+    the model splits on or has a value that is not a string, or (strict)
+    has a column the model does not know.
+    """
+    from classes.dataset import NOT_ATTRIBUTES, PREFIXES, encode_movie
+
+    if not isinstance(row, dict):
+        raise ValueError('request is not a JSON object')
+
+    if model.KIND == 'id3':
+        attributes = list(PREFIXES)
+    else:
+        attributes = [name for name in model.HEADER
+                      if name not in NOT_ATTRIBUTES]
+
+    for name in row if strict else ():
+        if name not in attributes and name not in NOT_ATTRIBUTES:
+            raise ValueError('unknown field ' + repr(name))
+    for name in attributes:
+        if name not in row:
+            raise ValueError('missing field ' + repr(name))
+        if not isinstance(row[name], str):
+            raise ValueError('field ' + repr(name) + ' is not a string')
+
+    if model.KIND == 'id3':
+        return encode_movie(row)
+
+    return [row.get(name, '') for name in model.HEADER]
+
+def model_inputs(model, rows):
+    """
+    PURPOSE
+    Turn rows of raw column values into what the model's predict takes.
+
+    INPUT
+    model: predictor module
+    rows: list of dicts of column name -> string value, as given by
+          csv.DictReader (revenue is not needed)
+
+    OUTPUT
+    inputs: list of movie dicts (ID3) or row lists (CART)
+    """
+    return [model_input(model, row) for row in rows]
+
+def model_label(model, label):
+    """
+    PURPOSE
+    Turn a predicted class label back into a revenue bracket as written
+    in the cleaned database.
+
+    INPUT
+    model: predictor module
+    label: value returned by the model's predict
+
+    OUTPUT
+    bracket: string revenue bracket, None if the model had no prediction
+    """
+    #ID3 class labels are the bracket with an 'rv' prefix
+    if model.KIND == 'id3' and label is not None:
+        return label[2:]
+
+    return label
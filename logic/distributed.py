@@ -0,0 +1,483 @@
+"""
+PURPOSE
+Run evaluation trials on several worker processes, on this machine or on
+others, over the same newline delimited JSON protocol as serve.py.
+
+A coordinator sends trial specs to workers over TCP:
+
+    {"id": 3, "algorithm": "cart", "data": "data/new_database2.csv",
+     "fingerprint": "<sha256 of the file>", "seed": 3,
+     "train_ratio": 0.5, "params": {"subsets": false}}
+
+and each worker answers one line per spec, in order:
+
+    {"id": 3, "ok": true, "accuracy": 66.2, "build_seconds": 0.21,
+     "predict_seconds": 0.01, "worker": "host:pid"}
+
+or {"id": 3, "ok": false, "error": "..."}. A worker loads each database
+once and keeps it by fingerprint, so the spec's path only matters the
+first time, and a worker whose copy of the file differs refuses the
+trial instead of scoring different data. Trials run one at a time per
+worker, so start one worker per core.
+
+Each worker connection keeps one spec in flight. A spec that fails (an
+error answer, a timeout or a dropped connection) goes back on the queue
+for any worker to retry, up to max_retries times. A worker that can't
+be reached after max_retries attempts in a row is dropped.
+
+Every trial is seeded, and the builders break ties between equally good
+splits in sorted order, so a trial gets the same result whichever worker
+runs it.
+
+AUTHOR
+Warren Lacaba
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from logic import adaptive
+from logic import cart
+from logic.model_cache import fingerprint_file
+
+DEFAULT_PORT = 8766
+
+#WORKER-----------------------------------------------------------------------
+
+class TrialWorker:
+    """
+    PURPOSE
+    Serve trial specs. See above.
+
+    INPUT
+    paths: databases to load up front, others are loaded on first use
+    """
+
+    def __init__(self, paths=()):
+        self.name = '{0}:{1}'.format(socket.gethostname(), os.getpid())
+        self.datasets = {}
+        self.trials = 0
+        self._server = None
+        #One thread, so trials run one at a time but the loop stays free
+        self._executor = ThreadPoolExecutor(1)
+
+        for path in paths:
+            self.load(path)
+
+    def load(self, path):
+        """
+        PURPOSE
+        Load a database, unless one with the same contents is loaded.
+
+        INPUT
+        path: path of a cleaned database
+
+        OUTPUT
+        fingerprint of the file
+        """
+        fingerprint = fingerprint_file(path)
+        if fingerprint not in self.datasets:
+            self.datasets[fingerprint] = cart.load_data(path)
+        return fingerprint
+
+    def run_spec(self, spec):
+        """
+        PURPOSE
+        Run one trial spec.
+
+        INPUT
+        spec: dict as described above
+
+        OUTPUT
+        answer dict
+        """
+        fingerprint = spec['fingerprint']
+        if fingerprint not in self.datasets:
+            if self.load(spec['data']) != fingerprint:
+                raise ValueError('{0} on {1} does not match fingerprint '
+                                 '{2}'.format(spec['data'], self.name,
+                                              fingerprint))
+
+        header, dataset = self.datasets[fingerprint]
+        answer = adaptive.run_trial(header, dataset, spec['algorithm'],
+                                    spec['seed'], spec.get('train_ratio', 0.5),
+                                    spec.get('params'))
+        answer.update({'id': spec['id'], 'ok': True, 'worker': self.name})
+        self.trials += 1
+
+        return answer
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """
+        PURPOSE
+        Start listening.
+
+        INPUT
+        host, port: where to listen, port 0 picks a free port
+
+        OUTPUT
+        the port listened on
+        """
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self._executor.shutdown()
+
+    async def _handle(self, reader, writer):
+        """
+        Serve one coordinator connection, one answer per spec line
+        """
+        loop = asyncio.get_running_loop()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+
+                spec = None
+                try:
+                    spec = json.loads(line)
+                    answer = await loop.run_in_executor(self._executor,
+                                                        self.run_spec, spec)
+                except Exception as error:
+                    answer = {'id': spec.get('id') if isinstance(spec, dict)
+                              else None,
+                              'ok': False, 'error': str(error)}
+
+                writer.write((json.dumps(answer) + '\n').encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+def run_worker(host='127.0.0.1', port=DEFAULT_PORT, paths=()):
+    """
+    PURPOSE
+    Run a worker until interrupted. Prints the port it listens on first,
+    so a parent process can read it when port is 0.
+
+    INPUT
+    host, port: where to listen
+    paths: databases to load up front
+
+    OUTPUT
+    None
+    """
+    async def run():
+        worker = TrialWorker(paths)
+        bound = await worker.start(host, port)
+        print('Worker listening on {0}:{1}'.format(host, bound), flush=True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await worker.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+def start_local_workers(count, paths=(), host='127.0.0.1'):
+    """
+    PURPOSE
+    Start worker processes on this machine, each on a free port.
+
+    INPUT
+    count: number of workers
+    paths: databases each worker loads up front
+    host: interface they listen on
+
+    OUTPUT
+    processes: list of subprocess.Popen, terminate them when done
+    addresses: list of (host, port) of the workers
+    """
+    main_path = os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'main.py')
+    command = [sys.executable, main_path, 'worker', '--host', host,
+               '--port', '0']
+    if paths:
+        command += ['--data'] + list(paths)
+
+    processes = [subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+                 for i in range(count)]
+    addresses = []
+
+    for process in processes:
+        line = process.stdout.readline()
+        if not line:
+            for started in processes:
+                started.terminate()
+            raise RuntimeError('a local worker failed to start')
+        addresses.append((host, int(line.rsplit(':', 1)[1])))
+
+    return processes, addresses
+
+#COORDINATOR------------------------------------------------------------------
+
+def parse_address(text):
+    """
+    PURPOSE
+    Read a worker address.
+
+    INPUT
+    text: 'host:port', or just 'port' for localhost
+
+    OUTPUT
+    (host, port)
+    """
+    host, separator, port = text.rpartition(':')
+    return (host if separator else '127.0.0.1'), int(port)
+
+def make_specs(database_name, algorithms, num_trials, seed=0,
+               train_ratio=0.5, params=None):
+    """
+    PURPOSE
+    One spec per trial and algorithm. Trial i of every algorithm uses
+    seed + i, so the algorithms are scored on the same splits.
+
+    INPUT
+    database_name: path of the database, as the workers see it
+    algorithms: list of 'id3' and/or 'cart'
+    num_trials: trials per algorithm
+    seed: seed of the first trial
+    train_ratio: portion of rows used for training
+    params: dict of options passed to adaptive.run_trial
+
+    OUTPUT
+    list of spec dicts
+    """
+    fingerprint = fingerprint_file(database_name)
+    specs = []
+
+    for i in range(num_trials):
+        for algorithm in algorithms:
+            specs.append({'id': len(specs), 'algorithm': algorithm,
+                          'data': database_name,
+                          'fingerprint': fingerprint, 'seed': seed + i,
+                          'train_ratio': train_ratio,
+                          'params': params or {}})
+
+    return specs
+
+class Coordinator:
+    """
+    PURPOSE
+    Hand trial specs out to workers and collect the answers. See above.
+
+    INPUT
+    addresses: list of (host, port) of the workers
+    max_retries: times a failed spec is retried, and failed attempts in a
+                 row before a worker is dropped
+    timeout: seconds to wait for one answer, None to wait forever
+    retry_wait: seconds to wait before reconnecting to a worker
+    """
+
+    def __init__(self, addresses, max_retries=2, timeout=None,
+                 retry_wait=0.5):
+        self.addresses = list(addresses)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.retry_wait = retry_wait
+
+    async def run(self, specs, on_result=None):
+        """
+        PURPOSE
+        Run every spec on the workers.
+
+        INPUT
+        specs: list of spec dicts, eg. from make_specs
+        on_result: called with each answer as it arrives, or None
+
+        OUTPUT
+        results: list of answers, in the order of specs
+        failures: list of (spec, last error) of specs that ran out of
+                  retries
+        """
+        queue = asyncio.Queue()
+        for spec in specs:
+            queue.put_nowait(dict(spec, attempts=0))
+
+        self._results = {}
+        self._failures = []
+        self._remaining = len(specs)
+        self._done = asyncio.Event()
+        self._on_result = on_result
+        if not specs:
+            self._done.set()
+
+        drivers = [asyncio.ensure_future(self._drive(address, queue))
+                   for address in self.addresses]
+        done_waiter = asyncio.ensure_future(self._done.wait())
+
+        try:
+            while not self._done.is_set():
+                await asyncio.wait(drivers + [done_waiter],
+                                   return_when=asyncio.FIRST_COMPLETED)
+                drivers = [driver for driver in drivers if not driver.done()]
+                if not drivers and not self._done.is_set():
+                    raise RuntimeError('every worker failed with {0} trials '
+                                       'left'.format(self._remaining))
+        finally:
+            for task in drivers + [done_waiter]:
+                task.cancel()
+            await asyncio.gather(*drivers, done_waiter,
+                                 return_exceptions=True)
+
+        results = [self._results[spec['id']] for spec in specs
+                   if spec['id'] in self._results]
+
+        return results, self._failures
+
+    def _finish(self):
+        self._remaining -= 1
+        if self._remaining == 0:
+            self._done.set()
+
+    def _retry(self, spec, error, queue):
+        """
+        Put a failed spec back on the queue, or give up on it
+        """
+        spec['attempts'] += 1
+        if spec['attempts'] > self.max_retries:
+            self._failures.append((spec, error))
+            self._finish()
+        else:
+            queue.put_nowait(spec)
+
+    async def _drive(self, address, queue):
+        """
+        Feed specs to one worker until the queue is done or the worker
+        fails max_retries + 1 times in a row
+        """
+        host, port = address
+        reader = writer = None
+        failures = 0
+
+        try:
+            while True:
+                spec = await queue.get()
+
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(host,
+                                                                       port)
+                    writer.write((json.dumps(spec) + '\n').encode())
+                    await writer.drain()
+                    line = await asyncio.wait_for(reader.readline(),
+                                                  self.timeout)
+                    if not line:
+                        raise ConnectionError('worker closed the connection')
+                    answer = json.loads(line)
+                except (OSError, asyncio.TimeoutError, ValueError) as error:
+                    if writer is not None:
+                        writer.close()
+                    reader = writer = None
+                    self._retry(spec, '{0}:{1}: {2!r}'.format(host, port,
+                                                              error), queue)
+                    failures += 1
+                    if failures > self.max_retries:
+                        return
+                    await asyncio.sleep(self.retry_wait)
+                    continue
+
+                failures = 0
+                if not answer.get('ok'):
+                    self._retry(spec, answer.get('error'), queue)
+                    continue
+
+                answer['algorithm'] = spec['algorithm']
+                answer['seed'] = spec['seed']
+                self._results[spec['id']] = answer
+                if self._on_result is not None:
+                    self._on_result(answer)
+                self._finish()
+        finally:
+            if writer is not None:
+                writer.close()
+
+def aggregate(results):
+    """
+    PURPOSE
+    Summarize the answers of a run.
+
+    INPUT
+    results: list of answers from Coordinator.run
+
+    OUTPUT
+    dict of algorithm -> trials, mean accuracy, mean build and predict
+    seconds, and 'workers': dict of worker name -> trials run
+    """
+    summary = {}
+    workers = {}
+
+    for answer in results:
+        stats = summary.setdefault(answer['algorithm'],
+                                   {'trials': 0, 'accuracy': 0.0,
+                                    'build_seconds': 0.0,
+                                    'predict_seconds': 0.0})
+        stats['trials'] += 1
+        for key in ('accuracy', 'build_seconds', 'predict_seconds'):
+            stats[key] += answer[key]
+        workers[answer['worker']] = workers.get(answer['worker'], 0) + 1
+
+    for stats in summary.values():
+        for key in ('accuracy', 'build_seconds', 'predict_seconds'):
+            stats[key] /= stats['trials']
+
+    summary['workers'] = workers
+    return summary
+
+#MAIN-------------------------------------------------------------------------
+
+def run_distributed(database_name, algorithms, num_trials, addresses,
+                    seed=0, train_ratio=0.5, params=None, max_retries=2,
+                    timeout=None, report=False):
+    """
+    PURPOSE
+    Run num_trials trials of each algorithm on the given workers.
+
+    INPUT
+    database_name: path of the database, as the workers see it
+    algorithms: list of 'id3' and/or 'cart'
+    num_trials: trials per algorithm
+    addresses: list of (host, port) of the workers
+    seed: trial i splits the data with seed + i
+    train_ratio: portion of rows used for training
+    params: dict of options passed to adaptive.run_trial
+    max_retries, timeout: see Coordinator
+    report: print each answer as it arrives
+
+    OUTPUT
+    summary: dict from aggregate, plus the wall clock 'seconds' and the
+             'failures' that ran out of retries
+    """
+    specs = make_specs(database_name, algorithms, num_trials, seed,
+                       train_ratio, params)
+    coordinator = Coordinator(addresses, max_retries, timeout)
+
+    def show(answer):
+        print('{0} seed {1} on {2}: {3:.3f}%'.format(
+            answer['algorithm'], answer['seed'], answer['worker'],
+            answer['accuracy']))
+
+    start = time.perf_counter()
+    results, failures = asyncio.run(coordinator.run(
+        specs, show if report else None))
+
+    summary = aggregate(results)
+    summary['seconds'] = time.perf_counter() - start
+    summary['failures'] = failures
+
+    return summary
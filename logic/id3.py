@@ -5,40 +5,73 @@ Build the ID3 decision tree here.
 AUTHOR
 Warren Lacaba
 """
-import os
-import sys
 import math
+import random
 from operator import itemgetter
 from itertools import groupby
 from collections import Counter
 
-#Gotta add the name of your current directory's parent directory to path
-#Imports weren't working before I added this
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from classes.dataset import Dataset
+from classes.dataset import Dataset, NOT_ATTRIBUTES, WEIGHT, compress_movies
 from classes.node import Node
-from classes.tree import Tree
+from classes.compact_tree import CompactTree
+from logic.memory import phase
+from logic.model_cache import cache_key, fingerprint_file
+from logic.probability import distribution
 
 TARGET = 'revenue'
+#Gains closer than this are ties. The builders add up the entropy terms
+#in different orders, so equal gains can differ in the last bits
+GAIN_TOLERANCE = 1e-12
 #HELPERS----------------------------------------------------------------------
 
-def init_dataset(database_name):
+def init_dataset(database_name, rng=random):
     """
     PURPOSE
     Read in dataset. Set up the test and learn sets. 
 
     INPUT
     database_name: name (and path) of database
+    rng: where the learn/test coin tosses come from
 
     OUTPUT
     newdata: dataset object
     """
     newdata = Dataset()
-    newdata.get_data(database_name)
+    newdata.get_data(database_name, rng)
 
     return newdata
 
+def class_counts(learn_set, target_attribute):
+    """
+    PURPOSE
+    Count the classes of a learn set. Movies of a compressed learn set
+    (see classes.dataset.compress_movies) count as their WEIGHT.
+
+    INPUT
+    learn_set: list of movies
+    target_attribute: attribute we want to classify on, revenue
+
+    OUTPUT
+    counter: Counter of class -> count, in first seen order
+    """
+    if learn_set and WEIGHT in learn_set[0]:
+        counter = Counter()
+        for movie in learn_set:
+            counter[movie[target_attribute]] += movie[WEIGHT]
+        return counter
+
+    return Counter([movie[target_attribute] for movie in learn_set])
+
+def total_weight(learn_set):
+    """
+    Number of movies in a learn set, counting compressed movies as their
+    WEIGHT
+    """
+    if learn_set and WEIGHT in learn_set[0]:
+        return sum(movie[WEIGHT] for movie in learn_set)
+
+    return len(learn_set)
+
 #MAIN-------------------------------------------------------------------------
 
 def id3_tree(learn_set, attribute_set):
@@ -65,11 +98,9 @@ def id3_tree(learn_set, attribute_set):
     #with the first one. If all the same, algorithm terminates.
     revenue_class = learn_set[0][TARGET]
     revenue_all_same = True
-    list_revenues = []
     
     for movie in learn_set:
         curr_revenue = movie[TARGET]
-        list_revenues.append(curr_revenue)
 
         if revenue_class != curr_revenue:
             revenue_all_same = False
@@ -79,7 +110,7 @@ def id3_tree(learn_set, attribute_set):
         curr_node.update_node_label(revenue_class)
     elif attribute_set_length == 0:
         #Majority vote on the class, label node with that class
-        revenue_counter = Counter(list_revenues)
+        revenue_counter = class_counts(learn_set, TARGET)
         revenue_majority = revenue_counter.most_common(1)
         curr_node.update_node_label(revenue_majority[0][0])
     else:
@@ -103,7 +134,7 @@ def id3_tree(learn_set, attribute_set):
 
             if partition_size == 0:
                 #Attach a leaf labeled with majority class in D to curr_node
-                majority_counter = Counter(list_revenues)
+                majority_counter = class_counts(learn_set, TARGET)
                 common_rev = majority_counter.most_common(1)
                 curr_node.update_node_label(common_rev[0][0])
             else:
@@ -131,11 +162,13 @@ def find_information_gain(learn_set, attribute_set):
     best_attribute = ''
     info_of_class = calculate_entropy(learn_set, TARGET)
 
-    for attribute in attribute_set:
+    #Sorted, so ties go to the same attribute whatever order the set is
+    #in: the last one of the tied attributes
+    for attribute in sorted(attribute_set):
         info_of_attribute = calculate_info(learn_set, attribute, TARGET)
         new_info_gain = info_of_class - info_of_attribute
         
-        if new_info_gain >= info_gain:
+        if new_info_gain >= info_gain - GAIN_TOLERANCE:
             info_gain = new_info_gain
             best_attribute = attribute
 
@@ -160,14 +193,11 @@ def calculate_entropy(learn_set, target_attribute):
     Let D be the total size of learn set.
 
     -Sum((C/D) * log2(C/D))
-    """
-    total_size = len(learn_set)
-    list_target = []
 
-    for movie in learn_set:
-        list_target.append(movie[target_attribute])
-
-    counter = Counter(list_target)
+    Compressed movies count as their weight in C and D.
+    """
+    counter = class_counts(learn_set, target_attribute)
+    total_size = sum(counter.values())
     common = counter.most_common()
     entropy = 0
 
@@ -196,11 +226,13 @@ def calculate_info(learn_set, attribute, target_attribute):
     Given by formula:
 
     Sum((count of attribute's value/total size) * entropy(partition of just that attribute value))
+
+    Compressed movies count as their weight.
     """
     info = 0
     keys = []
     groups = []
-    total_size = len(learn_set)
+    total_size = total_weight(learn_set)
 
     #Sort so we can use groupby to find partitions on attribute
     learn_set = sorted(learn_set, key=itemgetter(attribute))
@@ -210,47 +242,352 @@ def calculate_info(learn_set, attribute, target_attribute):
         groups.append(list(group[1]))
 
     for g in groups:
-        count = len(g)
+        count = total_weight(g)
         portion = count/total_size
         info += portion * calculate_entropy(g, target_attribute)
 
     return info
 
-def run_id3(database_name, num_trials):
+class ID3Classifier:
+    """
+    PURPOSE
+    An ID3 tree as an estimator with fit / predict / predict_batch. All
+    state lives on the instance, so several can be trained and used at
+    once, eg. one per thread.
+
+    INPUT
+    attribute_set: set of attributes to judge by, None to use every key
+                   of the training movies that isn't in NOT_ATTRIBUTES
+    dedup: train on the learn set compressed by compress_movies
+
+    predict and predict_batch score with the fitted tree packed into a
+    classes.compact_tree.CompactTree. predict_proba gives the class
+    distribution of the training movies at the node each movie ends up
+    in, in the order of self.classes.
+    """
+
+    def __init__(self, attribute_set=None, dedup=False):
+        self.attribute_set = attribute_set
+        self.dedup = dedup
+        self.root = None
+        #The fitted tree packed into arrays, what predict scores with
+        self.compact = None
+        self.classes = []
+        #id(node) -> class counts of the training movies reaching it
+        self.node_counts = {}
+        self._tables = {}
+
+    def _prepare(self, learn_set):
+        """
+        The learn set to train on and the attributes to judge by
+        """
+        if self.dedup:
+            learn_set = compress_movies(learn_set)
+
+        attributes = self.attribute_set
+        if attributes is None:
+            attributes = set(learn_set[0])
+            attributes.difference_update(NOT_ATTRIBUTES)
+
+        return learn_set, attributes
+
+    def fit(self, learn_set):
+        """
+        PURPOSE
+        Build the tree.
+
+        INPUT
+        learn_set: list of movie dicts, as made by encode_movie
+
+        OUTPUT
+        self
+        """
+        learn_set, attributes = self._prepare(learn_set)
+        self.root = id3_tree(learn_set, attributes)
+        self.compact = CompactTree.from_node(self.root)
+        self._count_nodes(learn_set)
+        return self
+
+    def _count_nodes(self, learn_set):
+        """
+        Count the classes of the training movies at every node, routing
+        them down the tree in one batch (they all reach a leaf)
+        """
+        self.classes = sorted(class_counts(learn_set, TARGET))
+        self.node_counts = {}
+        self._tables = {}
+        reached = []
+
+        self._route_batch(learn_set, reached)
+        for node, indices in reached:
+            counts = self.node_counts.setdefault(id(node), Counter())
+            counts.update(class_counts([learn_set[i] for i in indices],
+                                       TARGET))
+
+    def _reach(self, node):
+        """
+        Called on each node a batch of movies reaches, before its
+        branches are read
+        """
+
+    def _route_batch(self, movies, reached=None):
+        """
+        Send movies down the tree together. Returns (node, movie numbers)
+        pairs of where they stop: a leaf, or a node with no branch for
+        the movie's value. With reached, every (node, movie numbers)
+        pair the batch goes through is added to it, stops included.
+        """
+        stopped = []
+        stack = [(self.root, list(range(len(movies))))]
+
+        while stack:
+            node, indices = stack.pop()
+            self._reach(node)
+            if reached is not None:
+                reached.append((node, indices))
+            if not node.branches:
+                stopped.append((node, indices))
+                continue
+
+            by_value = {}
+            for i in indices:
+                by_value.setdefault(movies[i][node.label], []).append(i)
+
+            missing = []
+            for value, value_indices in by_value.items():
+                if value in node.branches:
+                    child = node.children[node.branches.index(value)]
+                    stack.append((child, value_indices))
+                else:
+                    missing.extend(value_indices)
+            if missing:
+                stopped.append((node, missing))
+
+        return stopped
+
+    def predict_proba(self, movies, smoothing=0.0):
+        """
+        PURPOSE
+        Class probabilities of a batch of movies. The movies are routed
+        down the tree together and each gets the distribution of the
+        node it stops at: its leaf, or the last node it could follow
+        if the tree has no branch for one of its values.
+
+        INPUT
+        movies: list of movie dicts, revenue not needed
+        smoothing: extra count given to every class at every node
+
+        OUTPUT
+        list of tuples of probabilities, in the order of self.classes.
+        Movies stopping at the same node share one tuple.
+        """
+        table = self._tables.setdefault(smoothing, {})
+        probabilities = [None] * len(movies)
+
+        for node, indices in self._route_batch(movies):
+            node_probabilities = table.get(id(node))
+            if node_probabilities is None:
+                node_probabilities = distribution(self.node_counts[id(node)],
+                                                  self.classes, smoothing)
+                table[id(node)] = node_probabilities
+            for i in indices:
+                probabilities[i] = node_probabilities
+
+        return probabilities
+
+    def predict(self, movie):
+        """
+        PURPOSE
+        Classify one movie by following its values down the tree.
+
+        INPUT
+        movie: movie dict, revenue not needed
+
+        OUTPUT
+        revenue class, or None if the tree has no branch for one of the
+        movie's values (no rule covers it)
+        """
+        return self.compact.classify(movie)
+
+    def predict_batch(self, movies):
+        return list(map(self.compact.classify, movies))
+
+class LazyID3Classifier(ID3Classifier):
+    """
+    PURPOSE
+    ID3 tree that is only built where queries go. fit just keeps the
+    learn set, and predict expands the nodes on the path the movie
+    follows, one node at a time, splitting exactly like id3_tree. Nodes
+    stay expanded, so later queries down the same paths reuse them.
+    Predictions are the same as ID3Classifier on the same learn set.
+
+    Expanding changes the tree, so don't share one between threads.
+
+    INPUT
+    attribute_set: set of attributes to judge by, None to use every key
+                   of the training movies that isn't in NOT_ATTRIBUTES
+    dedup: train on the learn set compressed by compress_movies
+    """
+
+    def __init__(self, attribute_set=None, dedup=False):
+        ID3Classifier.__init__(self, attribute_set, dedup)
+        #id(node) -> (learn set, attributes) for nodes not expanded yet
+        self.pending = {}
+        self.expanded = 0
+
+    def fit(self, learn_set):
+        """
+        PURPOSE
+        Keep the learn set for later expansion. Nothing is built yet.
+
+        INPUT
+        learn_set: list of movie dicts, as made by encode_movie
+
+        OUTPUT
+        self
+        """
+        learn_set, attributes = self._prepare(learn_set)
+        self.root = Node('Empty')
+        self.pending = {id(self.root): (learn_set, attributes)}
+        self.expanded = 0
+        self.classes = sorted(class_counts(learn_set, TARGET))
+        self.node_counts = {}
+        self._tables = {}
+        return self
+
+    def _expand(self, curr_node):
+        """
+        Label one pending node and give it pending children, the same
+        steps id3_tree takes for a node before recursing
+        """
+        learn_set, attribute_set = self.pending.pop(id(curr_node))
+        attributes = attribute_set.copy()
+        self.expanded += 1
+
+        revenue_counter = class_counts(learn_set, TARGET)
+        self.node_counts[id(curr_node)] = revenue_counter
+
+        if len(revenue_counter) == 1:
+            curr_node.update_node_label(learn_set[0][TARGET])
+        elif len(attributes) == 0:
+            curr_node.update_node_label(revenue_counter.most_common(1)[0][0])
+        else:
+            attribute_name = find_information_gain(learn_set, attributes)
+            attributes.discard(attribute_name)
+            curr_node.update_node_label(attribute_name)
+
+            learn_set = sorted(learn_set, key=itemgetter(attribute_name))
+            for key, group in groupby(learn_set, itemgetter(attribute_name)):
+                child = Node('Empty')
+                curr_node.new_branch(key)
+                curr_node.new_child(child)
+                self.pending[id(child)] = (list(group), attributes)
+
+    def _reach(self, node):
+        #predict_proba expands the nodes its batch goes through
+        if id(node) in self.pending:
+            self._expand(node)
+
+    def predict(self, movie):
+        node = self.root
+
+        while True:
+            if id(node) in self.pending:
+                self._expand(node)
+            if not node.branches:
+                return node.label
+            value = movie[node.label]
+            if value not in node.branches:
+                return None
+            node = node.children[node.branches.index(value)]
+
+    def predict_batch(self, movies):
+        #The tree grows as movies are scored, so it is never packed
+        return [self.predict(movie) for movie in movies]
+
+    def expand_all(self):
+        """
+        PURPOSE
+        Expand every pending node, giving the full id3_tree.
+
+        INPUT
+        None
+
+        OUTPUT
+        root: root node of the decision tree
+        """
+        nodes = [self.root]
+
+        while nodes:
+            node = nodes.pop()
+            if id(node) in self.pending:
+                self._expand(node)
+            nodes.extend(node.children)
+
+        return self.root
+
+def run_id3(database_name, num_trials, report=None, seed=None, cache=None,
+            engine='rows', dedup=False):
     """
     Loop num_trials times, building a new tree and testing it against the
     test set of movies.
+
+    Pass a logic.memory.MemoryReport as report to get the memory used by
+    each phase printed with the summary. With a seed, trial x splits the
+    data with random.Random(seed + x), and with a
+    logic.model_cache.ModelCache as cache (needs a seed), trees already
+    trained on the same file and split are loaded instead of rebuilt.
+    engine 'bitset' builds the same trees with logic.bitset, and dedup
+    trains on the learn set compressed by
+    classes.dataset.compress_movies.
     """
+    if dedup and engine == 'bitset':
+        raise ValueError('Compressed movies need the rows engine')
+    if cache is not None and seed is None:
+        #A random seed would key entries no later run can hit
+        raise ValueError('The model cache needs a seed')
+
     total = 0
 
+    if cache is not None:
+        data_fingerprint = fingerprint_file(database_name)
+
     for x in range(0, num_trials):
-        mydata = init_dataset(database_name)
-        decision_tree = Tree(id3_tree(mydata.learn_set, mydata.attribute_set))
-        decision_tree.insert_rules()
-
-        num_correct = 0
-
-        for movie in mydata.test_set:
-            for rule in decision_tree.rules:
-
-                conditions_met = True
-                key = ''
-                value = ''
-                for i in range(0, len(rule) - 1, 2):
-                    #Even index = attribute, odd index = class label
-                    key = rule[i]
-                    value = rule[i + 1]
-
-                    #Check if value is correct
-                    if movie[key] != value:
-                        conditions_met = False
-                        break;
-                
-                if conditions_met:
-                    if rule[-1] == movie[TARGET]:
-                        num_correct += 1
-                        #End for if we find a rule that correctly classifies movie
-                        break;
+        with phase(report, 'load'):
+            rng = random if seed is None else random.Random(seed + x)
+            mydata = init_dataset(database_name, rng)
+
+        with phase(report, 'build'):
+            def build():
+                if engine == 'bitset':
+                    from logic import bitset
+                    return bitset.build_bitset_id3(mydata.learn_set,
+                                                   mydata.attribute_set)
+                learn_set = mydata.learn_set
+                if dedup:
+                    learn_set = compress_movies(learn_set)
+                return id3_tree(learn_set, mydata.attribute_set)
+
+            if cache is None:
+                root = build()
+            else:
+                params = {'attributes': sorted(mydata.attribute_set)}
+                if dedup:
+                    params['dedup'] = True
+                key = cache_key('id3', [data_fingerprint, seed + x], params)
+                root = cache.get_or_build(key, build)
+
+            #Scored from the packed arrays. A movie is classified by the
+            #one rule whose conditions it meets, if any, so following
+            #its branches gives the same answer as checking every rule
+            decision_tree = CompactTree.from_node(root)
+
+        with phase(report, 'evaluate'):
+            num_correct = 0
+
+            for movie in mydata.test_set:
+                if decision_tree.classify(movie) == movie[TARGET]:
+                    num_correct += 1
 
         total += (num_correct/len(mydata.test_set)) * 100
         
@@ -259,3 +596,10 @@ def run_id3(database_name, num_trials):
 
     total /= num_trials
     print("Average over " + str(num_trials) + " trials: " + str(total) + "%")
+
+    if report is not None:
+        report.stop()
+        print(report.summary())
+
+    if cache is not None:
+        print(cache.summary())
@@ -0,0 +1,106 @@
+"""
+PURPOSE
+Index-based CART training on the memory mapped columnar database. Rows
+are never turned into Python objects: each node only holds an array of
+4 byte row numbers, and the split counts are read straight from the
+column codes. The tree built is a regular CART tree (_SplittingNode and
+_Leaf with decoded values), so cart.classify works on it as usual.
+
+AUTHOR
+Min Gyu Park
+"""
+from array import array
+from collections import Counter
+
+from classes.dataset import NOT_ATTRIBUTES
+from logic import cart
+from logic import stream
+
+TARGET = 'revenue'
+
+def _node_counts(columnar, indices, columns, target):
+    """
+    Class counts and attribute value x class counts of the rows in a
+    node, keyed by decoded values like the streaming frontier tables
+    """
+    target_codes = columnar.columns[target]
+    target_values = columnar.values[target]
+    classes = Counter()
+    code_counts = {col_num: {} for col_num in columns}
+
+    for i in indices:
+        classes[target_codes[i]] += 1
+
+    for col_num, name in columns.items():
+        codes = columnar.columns[name]
+        value_counts = code_counts[col_num]
+        for i in indices:
+            code = codes[i]
+            if code not in value_counts:
+                value_counts[code] = Counter()
+            value_counts[code][target_codes[i]] += 1
+
+    def decode(counts):
+        return Counter({target_values[code]: count
+                        for code, count in counts.items()})
+
+    return {'size': len(indices),
+            'classes': decode(classes),
+            'values': {col_num: {columnar.values[columns[col_num]][code]:
+                                 decode(counts)
+                                 for code, counts in value_counts.items()}
+                       for col_num, value_counts in code_counts.items()}}
+
+def build_indexed_cart(columnar, indices):
+    """
+    PURPOSE
+    Build a CART tree from rows of a columnar database, choosing splits
+    the same way as cart._build_tree on the decoded rows (row_at), ties
+    included.
+
+    INPUT
+    columnar: ColumnarDataset
+    indices: array of the row numbers to train on
+
+    OUTPUT
+    root of the tree (_SplittingNode or _Leaf)
+    """
+    header = columnar.names
+    columns = {col_num: header[col_num] for col_num in range(len(header))
+               if header[col_num] not in NOT_ATTRIBUTES}
+    value_codes = {name: {value: code for code, value in
+                          enumerate(columnar.values[name])}
+                   for name in header}
+
+    def build(indices):
+        frontier = _node_counts(columnar, indices, columns, TARGET)
+        gain, split_crit = stream._best_cart_split(frontier, header)
+
+        if gain == 0:
+            return cart._Leaf.from_counts(frontier['classes'])
+
+        name = header[split_crit.attr_col_num]
+        code = value_codes[name][split_crit.value]
+        codes = columnar.columns[name]
+        true_indices = array('I', [i for i in indices if codes[i] == code])
+        false_indices = array('I', [i for i in indices if codes[i] != code])
+
+        return cart._SplittingNode(split_crit, build(true_indices),
+                                   build(false_indices))
+
+    return build(indices)
+
+def row_at(columnar, i):
+    """
+    PURPOSE
+    Decode one row of a columnar database into a row list.
+
+    INPUT
+    columnar: ColumnarDataset
+    i: row number
+
+    OUTPUT
+    list of string values in columnar.names order
+    """
+    return [columnar.values[name][columnar.columns[name][i]]
+            for name in columnar.names]
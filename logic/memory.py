@@ -0,0 +1,307 @@
+"""
+PURPOSE
+Memory accounting for training runs, and a memory budget mode.
+
+MemoryReport uses tracemalloc to record the current and peak traced
+memory of each phase of a run (load, split, build, evaluate, write
+results), to be printed with the run summary.
+
+run_cart_budgeted estimates the footprint of each training strategy
+before loading anything and picks the first one that fits the budget:
+
+    memory  the regular in-memory lists of run_cart
+    index   rows stay in the memory mapped columnar file, nodes only
+            hold arrays of row numbers (needs a .bin database)
+    stream  level-wise streaming passes, see logic/stream.py
+
+AUTHOR
+Warren Lacaba
+"""
+import csv
+import os
+import random
+import sys
+import tracemalloc
+from array import array
+from contextlib import contextmanager, nullcontext
+
+from classes.columnar import ColumnarDataset, is_columnar
+
+STRATEGIES = ('memory', 'index', 'stream')
+SAMPLE_ROWS = 200      #Rows read to estimate the size of a parsed row
+POINTER_SIZE = 8       #Bytes per list slot
+INDEX_SIZE = 4         #Bytes per row number in an index array
+PARTITION_COPIES = 3   #Row references alive at once while building: the
+                       #train list plus the partition lists down one path
+
+#ACCOUNTING-------------------------------------------------------------------
+
+class MemoryReport:
+    """
+    PURPOSE
+    Current and peak traced memory per phase. Tracing starts with the
+    first phase and stops with stop(). Phases should not be nested,
+    since each one resets the peak.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._started = False
+
+    @contextmanager
+    def phase(self, name):
+        """
+        PURPOSE
+        Measure the code run inside a with block as one phase. A phase
+        entered several times (eg. once per trial) keeps its largest peak.
+
+        INPUT
+        name: name of the phase
+
+        OUTPUT
+        context manager
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            record = self.phases.setdefault(name, {'calls': 0,
+                                                   'current': 0,
+                                                   'peak': 0})
+            record['calls'] += 1
+            record['current'] = current
+            record['peak'] = max(record['peak'], peak)
+
+    def stop(self):
+        """
+        PURPOSE
+        Stop tracing if this report started it.
+
+        INPUT
+        None
+
+        OUTPUT
+        None
+        """
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def peak(self):
+        """
+        Largest peak over all phases, in bytes
+        """
+        return max([record['peak'] for record in self.phases.values()] or [0])
+
+    def summary(self):
+        """
+        PURPOSE
+        Readable table of the phases, in the order they first ran.
+
+        INPUT
+        None
+
+        OUTPUT
+        string, one line per phase
+        """
+        lines = ['Memory by phase (MiB):']
+        for name, record in self.phases.items():
+            lines.append('  {0:<14} peak {1:8.2f}  current {2:8.2f}  '
+                         '({3} runs)'.format(name, record['peak'] / 2**20,
+                                             record['current'] / 2**20,
+                                             record['calls']))
+        return '\n'.join(lines)
+
+def phase(report, name):
+    """
+    PURPOSE
+    report.phase(name), or a do nothing context when there is no report.
+
+    INPUT
+    report: MemoryReport or None
+    name: name of the phase
+
+    OUTPUT
+    context manager
+    """
+    if report is None:
+        return nullcontext()
+    return report.phase(name)
+
+#ESTIMATES--------------------------------------------------------------------
+
+def _row_size(row):
+    """
+    Bytes used by one parsed row list and its strings
+    """
+    return sys.getsizeof(row) + sum(sys.getsizeof(cell) for cell in row)
+
+def estimate_footprint(filename):
+    """
+    PURPOSE
+    Estimate the training footprint of each strategy without loading
+    the database. A CSV is sampled for its average line length and
+    parsed row size. The index strategy is only possible on .bin files.
+
+    INPUT
+    filename: name (and path) of database
+
+    OUTPUT
+    dict of strategy -> estimated bytes (index missing if not possible)
+    """
+    if is_columnar(filename):
+        with ColumnarDataset(filename) as columnar:
+            num_rows = len(columnar)
+            sample = []
+            for row in columnar.rows():
+                sample.append([row[name] for name in columnar.names])
+                if len(sample) == SAMPLE_ROWS:
+                    break
+    else:
+        with open(filename, 'r', encoding='utf-8') as read:
+            reader = csv.reader(read)
+            next(reader)
+            sample = []
+            sample_chars = 0
+            for row in reader:
+                sample.append(row)
+                sample_chars += sum(len(cell) + 1 for cell in row)
+                if len(sample) == SAMPLE_ROWS:
+                    break
+        if not sample:
+            num_rows = 0
+        else:
+            num_rows = int(os.path.getsize(filename) /
+                           (sample_chars / float(len(sample))))
+
+    row_size = (sum(_row_size(row) for row in sample) / float(len(sample))
+                if sample else 0)
+
+    footprint = {'memory': int(num_rows * (row_size +
+                                           PARTITION_COPIES * POINTER_SIZE)),
+                 'stream': 0}
+    if is_columnar(filename):
+        footprint['index'] = num_rows * PARTITION_COPIES * INDEX_SIZE
+
+    return footprint
+
+def choose_strategy(filename, budget):
+    """
+    PURPOSE
+    Pick the first strategy whose estimated footprint fits the budget.
+
+    INPUT
+    filename: name (and path) of database
+    budget: bytes allowed, None for no limit
+
+    OUTPUT
+    strategy name, one of STRATEGIES
+    """
+    if budget is None:
+        return 'memory'
+
+    footprint = estimate_footprint(filename)
+    for strategy in STRATEGIES:
+        if strategy in footprint and footprint[strategy] <= budget:
+            return strategy
+
+    return 'stream'
+
+#MAIN-------------------------------------------------------------------------
+
+def run_cart_budgeted(filename, n, budget=None, report=None, train_ratio=0.5):
+    """
+    PURPOSE
+    CART trials like cart.run_cart, using the strategy that fits the
+    memory budget, with per phase memory accounting. The memory strategy
+    is cart.run_cart itself.
+
+    INPUT
+    filename: name (and path) of database
+    n: number of trials
+    budget: bytes allowed for training, None for no limit
+    report: MemoryReport to fill in, a new one if None
+    train_ratio: portion of rows used for training
+
+    OUTPUT
+    report: the MemoryReport, also printed with the summary
+    """
+    from logic import cart
+    from logic import indexed
+    from logic import stream
+
+    if report is None:
+        report = MemoryReport()
+
+    strategy = choose_strategy(filename, budget)
+    if strategy == 'memory':
+        cart.run_cart(filename, n, report=report)
+        return report
+
+    print('\nBuilding decision tree using CART algorithm ({0} strategy)....\n'
+          .format(strategy))
+
+    av_accuracy = 0
+    columnar = None
+
+    with phase(report, 'load'):
+        if strategy == 'index':
+            columnar = ColumnarDataset(filename)
+            revenue_pos = columnar.names.index('revenue')
+        else:
+            header = stream.read_header(filename)
+            revenue_pos = header.index('revenue')
+
+    for i in range(n):
+        with phase(report, 'split'):
+            if strategy == 'index':
+                order = array('I', range(len(columnar)))
+                random.shuffle(order)
+                cut = int(train_ratio * len(order))
+                train, test = order[:cut], order[cut:]
+            else:
+                seed = random.randrange(2**32)
+
+                def source():
+                    return stream.cart_rows(filename)
+
+                train = stream.split_source(source, seed, train_ratio, True)
+                test = stream.split_source(source, seed, train_ratio, False)
+
+        with phase(report, 'build'):
+            if strategy == 'index':
+                tree = indexed.build_indexed_cart(columnar, train)
+            else:
+                tree = stream.stream_cart(train, header)
+
+        with phase(report, 'evaluate'):
+            if strategy == 'index':
+                test_rows = (indexed.row_at(columnar, j) for j in test)
+            else:
+                test_rows = test()
+
+            correct = 0
+            size = 0
+            for row in test_rows:
+                size += 1
+                if cart.predict(cart.classify(row, tree)) == row[revenue_pos]:
+                    correct += 1
+
+        accuracy = correct / float(size) * 100
+        print('Test #{0}, accuracy = {1}'.format(i, accuracy))
+        av_accuracy += accuracy
+
+    print('Average over {0} trials: {1}%'.format(n, av_accuracy / n))
+
+    if columnar is not None:
+        columnar.close()
+
+    report.stop()
+    print(report.summary())
+
+    return report
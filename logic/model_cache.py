@@ -0,0 +1,230 @@
+"""
+PURPOSE
+On-disk cache of trained trees, so reruns of the same experiment reuse
+trees instead of retraining them.
+
+A tree is keyed by a fingerprint of what it was trained on (the hash of
+the database file plus the split seed, or a hash of the training rows
+themselves) together with the algorithm and its parameters. Entries are
+pickled to one file each and written atomically (temporary file, then
+rename), so a crashed or concurrent run never leaves half an entry.
+When the cache grows past its size limit, the least recently used
+entries are evicted; a hit refreshes the entry's modification time.
+
+AUTHOR
+Warren Lacaba
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+DEFAULT_DIRECTORY = '.model_cache'
+DEFAULT_MAX_BYTES = 256 * 2**20
+SUFFIX = '.pickle'
+CHUNK_SIZE = 2**20
+
+#FINGERPRINTS-----------------------------------------------------------------
+
+def fingerprint_file(path):
+    """
+    PURPOSE
+    Hash the contents of a file.
+
+    INPUT
+    path: path of the file, eg. the cleaned database
+
+    OUTPUT
+    hex digest
+    """
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as read:
+        for chunk in iter(lambda: read.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def fingerprint_rows(rows):
+    """
+    PURPOSE
+    Hash training rows, for trees trained on rows that don't come
+    straight from a file and seed. Order matters, like it does for
+    tie breaking in the builders.
+
+    INPUT
+    rows: list of row lists or movie dicts
+
+    OUTPUT
+    hex digest
+    """
+    digest = hashlib.sha256()
+
+    for row in rows:
+        if isinstance(row, dict):
+            row = sorted(row.items())
+        digest.update(repr(row).encode('utf-8'))
+        digest.update(b'\n')
+
+    return digest.hexdigest()
+
+def cache_key(algorithm, data_fingerprint, params):
+    """
+    PURPOSE
+    Build the cache key of one trained tree.
+
+    INPUT
+    algorithm: eg. 'id3' or 'cart'
+    data_fingerprint: from fingerprint_file plus a seed, or fingerprint_rows
+    params: dict of anything else the tree depends on, JSON serializable
+
+    OUTPUT
+    hex digest
+    """
+    description = json.dumps({'algorithm': algorithm,
+                              'data': data_fingerprint,
+                              'params': params}, sort_keys=True)
+
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+#CACHE------------------------------------------------------------------------
+
+class ModelCache:
+    """
+    PURPOSE
+    See above.
+
+    INPUT
+    directory: where the entries are kept, created if missing
+    max_bytes: total size of entries to keep
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key):
+        """
+        PURPOSE
+        Look up a tree.
+
+        INPUT
+        key: from cache_key
+
+        OUTPUT
+        the cached tree, or None if it isn't cached
+        """
+        path = self._path(key)
+
+        try:
+            with open(path, 'rb') as read:
+                tree = pickle.load(read)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+
+        #Mark as recently used, eviction goes by modification time
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return tree
+
+    def put(self, key, tree):
+        """
+        PURPOSE
+        Store a tree, then evict old entries if over the size limit.
+
+        INPUT
+        key: from cache_key
+        tree: anything picklable
+
+        OUTPUT
+        None
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as write:
+                pickle.dump(tree, write, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self.evict()
+
+    def get_or_build(self, key, build):
+        """
+        PURPOSE
+        Return the cached tree, or build, store and return it.
+
+        INPUT
+        key: from cache_key
+        build: zero argument callable that trains the tree
+
+        OUTPUT
+        the tree
+        """
+        tree = self.get(key)
+
+        if tree is None:
+            tree = build()
+            self.put(key, tree)
+
+        return tree
+
+    def evict(self):
+        """
+        PURPOSE
+        Delete least recently used entries until the cache fits
+        max_bytes.
+
+        INPUT
+        None
+
+        OUTPUT
+        number of entries deleted
+        """
+        entries = []
+        total = 0
+
+        for name in os.listdir(self.directory):
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        deleted = 0
+
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            deleted += 1
+
+        return deleted
+
+    def summary(self):
+        return 'Model cache: {0} hits, {1} misses'.format(self.hits,
+                                                          self.misses)
@@ -0,0 +1,60 @@
+"""
+PURPOSE
+Class probabilities from tree leaves.
+
+A leaf's class counts become a dense tuple with one probability per
+class, in the classifier's class order, so every row that ends in the
+same leaf gets the same tuple and a batch is scored by routing rows to
+leaves and handing out the leaf tuples. With smoothing alpha, each
+class gets alpha extra counts (Laplace smoothing for alpha = 1), so
+classes a small leaf never saw don't get probability 0.
+
+AUTHOR
+Warren Lacaba
+"""
+
+def distribution(counts, classes, smoothing=0.0):
+    """
+    PURPOSE
+    Turn class counts into probabilities.
+
+    INPUT
+    counts: dict of class label -> count (or weight)
+    classes: list of every class label, the order of the output
+    smoothing: extra count given to every class
+
+    OUTPUT
+    tuple of probabilities, one per class in classes
+    """
+    total = sum(counts.values()) + smoothing * len(classes)
+    if total == 0:
+        return tuple(1.0 / len(classes) for label in classes)
+
+    return tuple((counts.get(label, 0) + smoothing) / total
+                 for label in classes)
+
+def expected_values(probabilities, values):
+    """
+    PURPOSE
+    Expected value of every row, eg. its expected revenue bracket, to
+    rank rows by.
+
+    INPUT
+    probabilities: list of tuples from predict_proba
+    values: number of each class, in the classifier's class order
+
+    OUTPUT
+    list of expected values, one per row
+    """
+    expected = {}
+    result = []
+
+    #Rows of the same leaf share their tuple, so work each one out once
+    for row_probabilities in probabilities:
+        key = id(row_probabilities)
+        if key not in expected:
+            expected[key] = sum(p * value for p, value in
+                                zip(row_probabilities, values))
+        result.append(expected[key])
+
+    return result
@@ -0,0 +1,383 @@
+"""
+PURPOSE
+Local prediction server. A saved model (see main.py train) is loaded once
+and served over a line protocol on TCP:
+
+    request:  one JSON object of column name -> value per line, eg.
+              {"genre": "Action", "company": "Other", "release": "12",
+               "prod_budget": "3"}
+    response: one JSON object per line, in the same order, eg.
+              {"prediction": "5"}
+
+The line STATS gets back the latency and throughput numbers instead.
+
+Requests from all connections are collected into micro-batches: a batch
+is scored as soon as it has max_batch_size rows or the oldest row in it
+has waited max_wait seconds, with one predict_batch call per batch.
+Rows are checked one by one first: a request that leaves out an
+attribute or has a column the model does not know gets {"error": ...}
+back without failing the rest of its batch. A line longer than the
+stream reader's limit (64 KiB) gets an error back and the connection is
+closed.
+
+AUTHOR
+Warren Lacaba
+"""
+import asyncio
+import json
+import time
+from collections import deque
+
+from logic.compiler import model_input, model_label
+
+MAX_LATENCIES = 100000   #Latency samples kept for the percentiles
+
+#HELPERS----------------------------------------------------------------------
+
+def percentile(samples, portion):
+    """
+    PURPOSE
+    Nearest rank percentile.
+
+    INPUT
+    samples: list of numbers
+    portion: 0 to 1, eg. 0.99 for p99
+
+    OUTPUT
+    value at that percentile, 0 if there are no samples
+    """
+    if not samples:
+        return 0
+
+    ordered = sorted(samples)
+    rank = int(round(portion * (len(ordered) - 1)))
+
+    return ordered[rank]
+
+class LatencyStats:
+    """
+    PURPOSE
+    Keep request latencies and counts to report p50/p99 and throughput.
+    """
+
+    def __init__(self):
+        self.latencies = deque(maxlen=MAX_LATENCIES)
+        self.requests = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+
+    def record_batch(self, latencies):
+        self.latencies.extend(latencies)
+        self.requests += len(latencies)
+        self.batches += 1
+
+    def summary(self):
+        """
+        PURPOSE
+        Numbers so far, latencies in milliseconds.
+
+        INPUT
+        None
+
+        OUTPUT
+        dict with requests, batches, mean batch size, p50, p99 and
+        throughput (requests per second)
+        """
+        elapsed = time.perf_counter() - self.started
+        samples = list(self.latencies)
+
+        return {'requests': self.requests,
+                'batches': self.batches,
+                'mean_batch_size': (self.requests / self.batches
+                                    if self.batches else 0),
+                'p50_ms': percentile(samples, 0.5) * 1000,
+                'p99_ms': percentile(samples, 0.99) * 1000,
+                'throughput': self.requests / elapsed if elapsed else 0}
+
+#SERVER-----------------------------------------------------------------------
+
+class PredictionServer:
+    """
+    PURPOSE
+    See above.
+
+    INPUT
+    model: predictor module, as given by compiler.load_module
+    max_batch_size: most rows scored in one call
+    max_wait: longest a request waits for its batch to fill, in seconds
+    """
+
+    def __init__(self, model, max_batch_size=64, max_wait=0.002):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = LatencyStats()
+        self._queue = None
+        self._server = None
+        self._batcher = None
+        self._handlers = set()
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """
+        PURPOSE
+        Start listening and start the batching task.
+
+        INPUT
+        host: address to bind, localhost by default
+        port: port to bind, 0 picks a free one
+
+        OUTPUT
+        port: port the server is listening on
+        """
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.get_running_loop().create_task(
+            self._batch_loop())
+        self._server = await asyncio.start_server(self._handle, host, port)
+
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """
+        PURPOSE
+        Stop listening, then cancel the connection handlers and the
+        batching task and wait for them to finish.
+
+        INPUT
+        None
+
+        OUTPUT
+        None
+        """
+        self._server.close()
+        tasks = list(self._handlers) + [self._batcher]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def predict(self, row):
+        """
+        PURPOSE
+        Queue one row and wait for its batch to be scored.
+
+        INPUT
+        row: dict of column name -> value
+
+        OUTPUT
+        predicted revenue bracket
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future, time.perf_counter()))
+
+        return await future
+
+    async def _batch_loop(self):
+        """
+        Take rows off the queue in micro-batches and score the valid
+        rows of each batch with one predict_batch call
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(),
+                                                        timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            #Rows are checked one at a time, so a bad request only
+            #fails its own future and the rest are still scored
+            good = []
+            inputs = []
+            for item in batch:
+                try:
+                    inputs.append(model_input(self.model, item[0], True))
+                except Exception as error:
+                    if not item[1].done():
+                        item[1].set_exception(error)
+                    continue
+                good.append(item)
+
+            if not good:
+                continue
+
+            try:
+                labels = self.model.predict_batch(inputs)
+            except Exception as error:
+                for item in good:
+                    if not item[1].done():
+                        item[1].set_exception(error)
+                continue
+
+            now = time.perf_counter()
+            for i in range(len(good)):
+                if not good[i][1].done():
+                    good[i][1].set_result(model_label(self.model, labels[i]))
+            self.stats.record_batch([now - item[2] for item in good])
+
+    async def _handle(self, reader, writer):
+        """
+        Serve one connection. Requests can be pipelined: each line is
+        queued as soon as it is read, and responses are written back in
+        the order the requests came in.
+        """
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        pending = asyncio.Queue()
+
+        async def respond():
+            while True:
+                task = await pending.get()
+                if task is None:
+                    break
+                writer.write((json.dumps(await task) + '\n').encode())
+                await writer.drain()
+
+        loop = asyncio.get_running_loop()
+        responder = loop.create_task(respond())
+
+        try:
+            try:
+                while True:
+                    try:
+                        line = await reader.readline()
+                    except ValueError:
+                        #Longer than the reader's limit. The rest of the
+                        #line is still unread, so answer and hang up
+                        too_long = loop.create_future()
+                        too_long.set_result({'error': 'request line is too '
+                                                      'long'})
+                        pending.put_nowait(too_long)
+                        break
+                    except ConnectionError:
+                        break
+                    if not line:
+                        break
+                    line = line.strip()
+                    if not line:
+                        continue
+                    pending.put_nowait(asyncio.ensure_future(
+                        self._answer(line)))
+            finally:
+                #Whatever ended the reading, let the responder finish
+                pending.put_nowait(None)
+            await asyncio.gather(responder, return_exceptions=True)
+        except asyncio.CancelledError:
+            #Stopped by the server
+            responder.cancel()
+            await asyncio.gather(responder, return_exceptions=True)
+        finally:
+            #Drop the requests still waiting, if the server stopped or
+            #the client went away before they were answered
+            while not pending.empty():
+                task = pending.get_nowait()
+                if task is not None:
+                    task.cancel()
+            self._handlers.discard(handler)
+            writer.close()
+
+    async def _answer(self, line):
+        """
+        Work out the response for one request line
+        """
+        if line == b'STATS':
+            return self.stats.summary()
+
+        try:
+            row = json.loads(line)
+        except ValueError:
+            return {'error': 'request is not valid JSON'}
+
+        try:
+            return {'prediction': await self.predict(row)}
+        except Exception as error:
+            return {'error': str(error)}
+
+def serve(model_path, host='127.0.0.1', port=8765, max_batch_size=64,
+          max_wait=0.002):
+    """
+    PURPOSE
+    Load a saved model and serve it until interrupted.
+
+    INPUT
+    model_path: path of a model saved by main.py train
+    host, port: where to listen
+    max_batch_size, max_wait: micro-batching settings
+
+    OUTPUT
+    None
+    """
+    from logic.compiler import load_module
+
+    async def run():
+        server = PredictionServer(load_module(model_path), max_batch_size,
+                                  max_wait)
+        bound = await server.start(host, port)
+        print('Serving {0} on {1}:{2}'.format(model_path, host, bound))
+        try:
+            await asyncio.Event().wait()
+        finally:
+            print(json.dumps(server.stats.summary()))
+            await server.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+#LOAD TESTING-----------------------------------------------------------------
+
+async def load_test(rows, host='127.0.0.1', port=8765, connections=16,
+                    requests=10000):
+    """
+    PURPOSE
+    Send requests from several connections at once and measure the
+    latency each client sees.
+
+    INPUT
+    rows: list of dicts of column name -> value to send, reused in a loop
+    host, port: where the server is
+    connections: number of concurrent connections
+    requests: total number of requests over all connections
+
+    OUTPUT
+    dict with client side p50/p99 (ms), throughput and the server's own
+    STATS
+    """
+    latencies = []
+
+    async def client(offset, count):
+        reader, writer = await asyncio.open_connection(host, port)
+        for i in range(count):
+            row = rows[(offset + i) % len(rows)]
+            start = time.perf_counter()
+            writer.write((json.dumps(row) + '\n').encode())
+            await writer.drain()
+            await reader.readline()
+            latencies.append(time.perf_counter() - start)
+        writer.close()
+
+    per_client = requests // connections
+    start = time.perf_counter()
+    await asyncio.gather(*[client(i * per_client, per_client)
+                           for i in range(connections)])
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'STATS\n')
+    await writer.drain()
+    server_stats = json.loads(await reader.readline())
+    writer.close()
+
+    return {'requests': len(latencies),
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'throughput': len(latencies) / elapsed,
+            'server': server_stats}
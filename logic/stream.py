@@ -0,0 +1,437 @@
+"""
+PURPOSE
+Out-of-core training. Instead of loading the whole database into lists,
+the tree is grown one level at a time. Each level is a single streaming
+pass over the cleaned database: every learn row is routed down the
+partially built tree to its frontier node, and attribute x class counts
+are accumulated there. Memory depends on the number of frontier nodes,
+not on the number of rows.
+
+Both ID3 and CART trees can be grown this way, and the trees produced are
+the same node types the in-memory builders return.
+
+AUTHOR
+Warren Lacaba
+"""
+import csv
+import math
+import random
+from collections import Counter
+
+from classes.columnar import ColumnarDataset, is_columnar
+from classes.dataset import NOT_ATTRIBUTES, encode_movie
+from classes.node import Node
+from logic import cart
+from logic import id3
+
+TARGET = 'revenue'
+SKIP_COLUMNS = NOT_ATTRIBUTES
+
+#ROW SOURCES------------------------------------------------------------------
+
+def id3_rows(database_name):
+    """
+    PURPOSE
+    Stream the cleaned database as movie dicts, one row at a time.
+
+    INPUT
+    database_name: name (and path) of database, CSV or .bin columnar
+
+    OUTPUT
+    generator of movie dicts, same encoding as Dataset.get_data
+    """
+    if is_columnar(database_name):
+        with ColumnarDataset(database_name) as columnar:
+            for row in columnar.rows():
+                yield encode_movie(row)
+        return
+
+    with open(database_name, 'r', encoding='utf-8') as read:
+        for row in csv.DictReader(read):
+            yield encode_movie(row)
+
+def cart_rows(database_name):
+    """
+    PURPOSE
+    Stream the cleaned database as lists of column values, without the
+    header row.
+
+    INPUT
+    database_name: name (and path) of database, CSV or .bin columnar
+
+    OUTPUT
+    generator of row lists, same layout as run_cart's dataset
+    """
+    if is_columnar(database_name):
+        with ColumnarDataset(database_name) as columnar:
+            for row in columnar.rows():
+                yield [row[name] for name in columnar.names]
+        return
+
+    with open(database_name, 'r', encoding='utf-8') as read:
+        reader = csv.reader(read)
+        next(reader)
+        for row in reader:
+            yield row
+
+def read_header(database_name):
+    """
+    PURPOSE
+    Read only the column names of the database.
+
+    INPUT
+    database_name: name (and path) of database, CSV or .bin columnar
+
+    OUTPUT
+    header: list of column names
+    """
+    if is_columnar(database_name):
+        with ColumnarDataset(database_name) as columnar:
+            return list(columnar.names)
+
+    with open(database_name, 'r', encoding='utf-8') as read:
+        return next(csv.reader(read))
+
+def split_source(source, seed, train_ratio, learn):
+    """
+    PURPOSE
+    Wrap a row source so it only yields the learn rows or only the test
+    rows of a random split. The coin tosses are replayed from the seed on
+    every pass, so each pass sees exactly the same split.
+
+    INPUT
+    source: zero argument callable returning a fresh iterable of rows
+    seed: seed of the split
+    train_ratio: chance of a row being put in the learn set
+    learn: True for the learn rows, False for the test rows
+
+    OUTPUT
+    split: zero argument callable returning a fresh iterable of rows
+    """
+    def split():
+        coin = random.Random(seed)
+        for row in source():
+            if (coin.random() < train_ratio) == learn:
+                yield row
+
+    return split
+
+#HELPERS----------------------------------------------------------------------
+
+def _entropy(class_counts, total_size):
+    """
+    Entropy of a class count table, same formula as id3.calculate_entropy
+    """
+    entropy = 0
+
+    for count in class_counts.values():
+        portion = count/total_size
+        entropy -= portion * math.log2(portion)
+
+    return entropy
+
+def _gini(class_counts, total_size):
+    """
+    Gini impurity of a class count table, same formula as cart._gini
+    """
+    gini_impurity = 1
+
+    for count in class_counts.values():
+        gini_impurity -= (count / float(total_size)) ** 2
+
+    return gini_impurity
+
+def _best_id3_attribute(frontier, attributes):
+    """
+    Pick the attribute with the highest information gain using only
+    the counts accumulated at a frontier node.
+    """
+    total_size = frontier['size']
+    info_of_class = _entropy(frontier['classes'], total_size)
+    info_gain = 0
+    best_attribute = ''
+
+    #Same order and tie breaking as id3.find_information_gain
+    for attribute in sorted(attributes):
+        info_of_attribute = 0
+        for class_counts in frontier['values'][attribute].values():
+            value_size = sum(class_counts.values())
+            info_of_attribute += ((value_size/total_size) *
+                                  _entropy(class_counts, value_size))
+
+        new_info_gain = info_of_class - info_of_attribute
+        if new_info_gain >= info_gain - id3.GAIN_TOLERANCE:
+            info_gain = new_info_gain
+            best_attribute = attribute
+
+    return best_attribute
+
+def _best_cart_split(frontier, header):
+    """
+    Pick the one-vs-rest split with the highest gini gain using only the
+    counts accumulated at a frontier node.
+    """
+    best_gain = 0
+    best_split_crit = None
+    total_size = frontier['size']
+    class_counts = frontier['classes']
+    current_uncertainty = _gini(class_counts, total_size)
+
+    for col_num in range(len(header)):
+        if header[col_num] in SKIP_COLUMNS:
+            continue
+
+        #Sorted like cart._candidate_splits, so ties go the same way
+        value_counts = frontier['values'][col_num]
+        for val in sorted(value_counts):
+            true_counts = value_counts[val]
+            true_size = sum(true_counts.values())
+            false_size = total_size - true_size
+
+            if true_size == 0 or false_size == 0:
+                continue
+
+            false_counts = class_counts - true_counts
+            prob = float(true_size) / total_size
+            gain = (current_uncertainty
+                    - prob * _gini(true_counts, true_size)
+                    - (1 - prob) * _gini(false_counts, false_size))
+
+            if cart._beats(gain, best_gain):
+                best_gain = gain
+                best_split_crit = cart._SplittingCriterion(col_num, val,
+                                                           header[col_num])
+
+    return best_gain, best_split_crit
+
+def _new_frontier(keys):
+    """
+    Empty count tables for a frontier node
+    """
+    return {'size': 0,
+            'classes': Counter(),
+            'values': {key: {} for key in keys}}
+
+def _accumulate(frontier, row, keys, class_label):
+    """
+    Add one row to the count tables of a frontier node
+    """
+    frontier['size'] += 1
+    frontier['classes'][class_label] += 1
+
+    for key in keys:
+        value_counts = frontier['values'][key]
+        value = row[key]
+        if value not in value_counts:
+            value_counts[value] = Counter()
+        value_counts[value][class_label] += 1
+
+#MAIN-------------------------------------------------------------------------
+
+def stream_id3(source, attribute_set):
+    """
+    PURPOSE
+    Build the ID3 decision tree level by level, one pass over source per
+    level. Gives the same tree as id3.id3_tree on the same rows.
+
+    INPUT
+    source: zero argument callable returning a fresh iterable of movie
+            dicts (the learn set)
+    attribute_set: set of all possible attributes to judge by
+
+    OUTPUT
+    root: root node of the decision tree
+    """
+    root = Node('Empty')
+    #id(node) -> {value: child} for every node that has been split
+    routes = {}
+    #id(node) -> (node, remaining attributes) for nodes still undecided
+    pending = {id(root): (root, attribute_set.copy())}
+
+    while pending:
+        counts = {key: _new_frontier(attributes)
+                  for key, (node, attributes) in pending.items()}
+
+        for movie in source():
+            node = root
+            while id(node) in routes:
+                node = routes[id(node)][movie[node.label]]
+
+            key = id(node)
+            if key in counts:
+                _accumulate(counts[key], movie, pending[key][1],
+                            movie[TARGET])
+
+        next_pending = {}
+        for key, (node, attributes) in pending.items():
+            frontier = counts[key]
+
+            if frontier['size'] == 0:
+                raise ValueError('No rows in learn set')
+
+            common = frontier['classes'].most_common(1)
+            if len(frontier['classes']) == 1 or len(attributes) == 0:
+                node.update_node_label(common[0][0])
+                continue
+
+            attribute_name = _best_id3_attribute(frontier, attributes)
+            node.update_node_label(attribute_name)
+            remaining = attributes.copy()
+            remaining.discard(attribute_name)
+
+            routes[key] = {}
+            for value in sorted(frontier['values'][attribute_name]):
+                child = Node('Empty')
+                node.new_branch(value)
+                node.new_child(child)
+                routes[key][value] = child
+                next_pending[id(child)] = (child, remaining)
+
+        pending = next_pending
+
+    return root
+
+def stream_cart(source, header):
+    """
+    PURPOSE
+    Build the CART tree level by level, one pass over source per level.
+    Gives the same splits as cart._build_tree on the same rows.
+
+    INPUT
+    source: zero argument callable returning a fresh iterable of row
+            lists (the training rows)
+    header: list of column names
+
+    OUTPUT
+    root: root node of the tree (_SplittingNode or _Leaf)
+    """
+    revenue_pos = header.index(TARGET)
+    columns = [col_num for col_num in range(len(header))
+               if header[col_num] not in SKIP_COLUMNS]
+
+    #Nodes are filled in once their level has been counted. A pending
+    #slot is a (parent, is_true_branch) pair, with None for the root.
+    tree = {'root': None}
+    routes = {}
+    pending = {0: (None, None)}
+    next_key = 1
+
+    while pending:
+        counts = {key: _new_frontier(columns) for key in pending}
+
+        for row in source():
+            node = tree['root']
+            key = 0
+            while node is not None:
+                key, node = routes[id(node)][node.split_crit.match(row)]
+                if isinstance(node, cart._Leaf):
+                    break
+
+            if key in counts:
+                _accumulate(counts[key], row, columns, row[revenue_pos])
+
+        next_pending = {}
+        for key, (parent, side) in pending.items():
+            frontier = counts[key]
+
+            if frontier['size'] == 0:
+                raise ValueError('No rows in training data')
+
+            gain, split_crit = _best_cart_split(frontier, header)
+
+            if gain == 0:
+                new_node = cart._Leaf.from_counts(frontier['classes'])
+            else:
+                new_node = cart._SplittingNode(split_crit, None, None)
+                routes[id(new_node)] = {True: (next_key, None),
+                                        False: (next_key + 1, None)}
+                next_pending[next_key] = (new_node, True)
+                next_pending[next_key + 1] = (new_node, False)
+                next_key += 2
+
+            if parent is None:
+                tree['root'] = new_node
+            else:
+                if side:
+                    parent.true_branch = new_node
+                else:
+                    parent.false_branch = new_node
+                parent_routes = routes[id(parent)]
+                parent_routes[side] = (parent_routes[side][0], new_node)
+
+        pending = next_pending
+
+    return tree['root']
+
+def run_stream_id3(database_name, num_trials, train_ratio=0.5, seed=None):
+    """
+    Out-of-core version of id3.run_id3. Each trial grows a tree from a
+    fresh random split without ever holding the database in memory.
+    With a seed, trial x splits the data with seed + x.
+    """
+    total = 0
+    attribute_set = set(read_header(database_name))
+    attribute_set.difference_update(NOT_ATTRIBUTES)
+
+    def source():
+        return id3_rows(database_name)
+
+    for x in range(0, num_trials):
+        split_seed = random.randrange(2**32) if seed is None else seed + x
+        learn = split_source(source, split_seed, train_ratio, True)
+        test = split_source(source, split_seed, train_ratio, False)
+        root = stream_id3(learn, attribute_set)
+
+        num_correct = 0
+        test_size = 0
+        for movie in test():
+            test_size += 1
+            node = root
+            while node.branches and movie[node.label] in node.branches:
+                node = node.children[node.branches.index(movie[node.label])]
+            if not node.branches and node.label == movie[TARGET]:
+                num_correct += 1
+
+        accuracy = num_correct/test_size * 100
+        total += accuracy
+
+        print("Test #" + str(x) + ", accuracy = " + str(accuracy))
+
+    total /= num_trials
+    print("Average over " + str(num_trials) + " trials: " + str(total) + "%")
+
+def run_stream_cart(filename, n, train_ratio=0.5, seed=None):
+    """
+    Out-of-core version of cart.run_cart. Each trial grows a tree from a
+    fresh random split without ever holding the database in memory.
+    With a seed, trial i splits the data with seed + i.
+    """
+    header = read_header(filename)
+    revenue_pos = header.index(TARGET)
+    av_accuracy = 0
+
+    def source():
+        return cart_rows(filename)
+
+    print('\nBuilding decision tree using CART algorithm (streaming)....\n')
+
+    for i in range(n):
+        split_seed = random.randrange(2**32) if seed is None else seed + i
+        train = split_source(source, split_seed, train_ratio, True)
+        test = split_source(source, split_seed, train_ratio, False)
+        tree = stream_cart(train, header)
+
+        correct = 0.0
+        size = 0
+        for row in test():
+            size += 1
+            if cart.predict(cart.classify(row, tree)) == row[revenue_pos]:
+                correct += 1
+
+        accuracy = correct / size * 100
+        print('Test #{0}, accuracy = {1}'.format(i, accuracy))
+        av_accuracy += accuracy
+
+    av_accuracy /= n
+
+    print('Average over {0} trials: {1}%'.format(n, av_accuracy))
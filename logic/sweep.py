@@ -0,0 +1,384 @@
+"""
+PURPOSE
+Hyperparameter sweeps without retraining. For each train split, one
+maximal tree is grown with the class counts of every node kept. The tree
+for any (max depth, min samples, pruning alpha) setting is a truncated
+and pruned copy of that maximal tree, so it can be derived without
+looking at the training rows again:
+
+    max_depth    nodes at this depth become leaves
+    min_samples  nodes with fewer training rows than this become leaves
+                 (minimum number of rows needed to split a node)
+    alpha        cost-complexity pruning. After truncation, a subtree is
+                 collapsed into a leaf whenever its training error plus
+                 alpha per leaf is not better than the leaf's own.
+                 Errors are fractions of the training set.
+
+All settings are then scored in one pass over the test split: every test
+row is routed down the maximal tree once, and each setting's prediction
+is the first node on that path where the setting stops.
+
+AUTHOR
+Warren Lacaba
+"""
+from collections import Counter
+from itertools import groupby, product
+from operator import itemgetter
+
+from logic import cart
+from logic import id3
+
+INFINITE_DEPTH = float('inf')
+
+class Setting:
+    """
+    PURPOSE
+    One point of a sweep.
+
+    INPUT
+    max_depth: deepest level that can still be split, root is depth 0
+    min_samples: fewest training rows a node needs to be split
+    alpha: cost-complexity pruning strength, 0 for no pruning
+    """
+
+    __slots__ = ('max_depth', 'min_samples', 'alpha')
+
+    def __init__(self, max_depth=INFINITE_DEPTH, min_samples=0, alpha=0.0):
+        self.max_depth = max_depth
+        self.min_samples = min_samples
+        self.alpha = alpha
+
+    def __repr__(self):
+        return 'Setting(max_depth={0}, min_samples={1}, alpha={2})'.format(
+            self.max_depth, self.min_samples, self.alpha)
+
+def grid(max_depths, min_samples, alphas):
+    """
+    PURPOSE
+    Every combination of the given values.
+
+    INPUT
+    max_depths, min_samples, alphas: lists of values to try
+
+    OUTPUT
+    list of Setting
+    """
+    return [Setting(d, m, a) for d, m, a in product(max_depths, min_samples,
+                                                   alphas)]
+
+class MaximalTree:
+    """
+    PURPOSE
+    A fully grown tree stored as flat per-node lists, in preorder.
+
+    counts[i]    class label -> training count at node i
+    size[i]      number of training rows at node i
+    depth[i]     depth of node i, the root is 0
+    children[i]  CART: [true child, false child]
+                 ID3: dict of attribute value -> child
+                 empty for leaves
+    test[i]      CART: _SplittingCriterion, ID3: attribute name
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.counts = []
+        self.size = []
+        self.depth = []
+        self.children = []
+        self.test = []
+
+    def _new_node(self, counts, depth):
+        self.counts.append(counts)
+        self.size.append(sum(counts.values()))
+        self.depth.append(depth)
+        self.children.append([])
+        self.test.append(None)
+        return len(self.counts) - 1
+
+    def __len__(self):
+        return len(self.counts)
+
+    def label(self, i):
+        """
+        Majority class at node i, same tie breaking as the classifiers
+        """
+        counts = self.counts[i]
+        if self.kind == 'cart':
+            return cart.predict(counts)
+        return max(counts.keys(), key=(lambda key: counts[key]))
+
+    def path(self, row):
+        """
+        PURPOSE
+        Route a row down the maximal tree.
+
+        INPUT
+        row: CART row list or ID3 movie dict
+
+        OUTPUT
+        path: list of node indexes from the root
+        complete: False if the row stopped at an internal node because
+                  the tree has no branch for its value (ID3 only)
+        """
+        i = 0
+        path = [0]
+
+        while self.children[i]:
+            if self.kind == 'cart':
+                if self.test[i].match(row):
+                    i = self.children[i][0]
+                else:
+                    i = self.children[i][1]
+            else:
+                i = self.children[i].get(row[self.test[i]])
+                if i is None:
+                    return path, False
+            path.append(i)
+
+        return path, True
+
+#GROWING----------------------------------------------------------------------
+
+def grow_cart(rows, schema):
+    """
+    PURPOSE
+    Grow the maximal CART tree, same splits as cart._build_tree.
+
+    INPUT
+    rows: training rows
+    schema: cart.Schema of the rows
+
+    OUTPUT
+    tree: MaximalTree
+    """
+    tree = MaximalTree('cart')
+
+    def grow(rows, depth):
+        i = tree._new_node(cart._count_class_values(rows, schema.target_pos),
+                           depth)
+        gain, split_crit = cart._get_best_split(rows, schema)
+
+        if gain != 0:
+            true_rows, false_rows = cart._partition(rows, split_crit)
+            tree.test[i] = split_crit
+            true_child = grow(true_rows, depth + 1)
+            false_child = grow(false_rows, depth + 1)
+            tree.children[i] = [true_child, false_child]
+
+        return i
+
+    grow(rows, 0)
+
+    return tree
+
+def grow_id3(learn_set, attribute_set):
+    """
+    PURPOSE
+    Grow the maximal ID3 tree, same splits as id3.id3_tree.
+
+    INPUT
+    learn_set: list of movie dicts
+    attribute_set: set of all possible attributes to judge by
+
+    OUTPUT
+    tree: MaximalTree
+    """
+    tree = MaximalTree('id3')
+
+    def grow(learn_set, attributes, depth):
+        counts = Counter(movie[id3.TARGET] for movie in learn_set)
+        i = tree._new_node(dict(counts), depth)
+
+        if len(counts) > 1 and len(attributes) > 0:
+            attribute_name = id3.find_information_gain(learn_set, attributes)
+            remaining = attributes.copy()
+            remaining.discard(attribute_name)
+            tree.test[i] = attribute_name
+            children = {}
+
+            learn_set = sorted(learn_set, key=itemgetter(attribute_name))
+            for value, group in groupby(learn_set, itemgetter(attribute_name)):
+                children[value] = grow(list(group), remaining, depth + 1)
+
+            tree.children[i] = children
+
+        return i
+
+    grow(learn_set, attribute_set.copy(), 0)
+
+    return tree
+
+#DERIVING SETTINGS------------------------------------------------------------
+
+def _child_list(tree, i):
+    children = tree.children[i]
+    if isinstance(children, dict):
+        return list(children.values())
+    return children
+
+def stop_nodes(tree, setting):
+    """
+    PURPOSE
+    Work out which nodes are leaves of the tree for one setting.
+
+    INPUT
+    tree: MaximalTree
+    setting: Setting
+
+    OUTPUT
+    stop: list of booleans, stop[i] is True if node i is a leaf under
+          this setting. Nodes below a stop node are never reached.
+    """
+    num_nodes = len(tree)
+    total = float(tree.size[0])
+    stop = [False] * num_nodes
+
+    for i in range(num_nodes):
+        if (not tree.children[i] or tree.depth[i] >= setting.max_depth or
+                tree.size[i] < setting.min_samples):
+            stop[i] = True
+
+    if setting.alpha <= 0:
+        return stop
+
+    #Bottom up, preorder reversed visits children before their parent.
+    #best[i] is the lowest error + alpha * leaves of the subtree at i.
+    best = [0.0] * num_nodes
+    for i in range(num_nodes - 1, -1, -1):
+        leaf_cost = ((tree.size[i] - tree.counts[i][tree.label(i)]) / total
+                     + setting.alpha)
+        if stop[i]:
+            best[i] = leaf_cost
+            continue
+
+        subtree_cost = sum(best[child] for child in _child_list(tree, i))
+        if leaf_cost <= subtree_cost:
+            stop[i] = True
+            best[i] = leaf_cost
+        else:
+            best[i] = subtree_cost
+
+    return stop
+
+def num_leaves(tree, stop):
+    """
+    Count the leaves reachable from the root for a stop list
+    """
+    leaves = 0
+    nodes = [0]
+
+    while nodes:
+        i = nodes.pop()
+        if stop[i]:
+            leaves += 1
+        else:
+            nodes.extend(_child_list(tree, i))
+
+    return leaves
+
+def to_cart_tree(tree, stop):
+    """
+    PURPOSE
+    Build the regular CART tree (_SplittingNode and _Leaf) for a setting,
+    eg. to compile or save it.
+
+    INPUT
+    tree: MaximalTree grown by grow_cart
+    stop: stop list from stop_nodes
+
+    OUTPUT
+    root of the tree
+    """
+    def build(i):
+        if stop[i]:
+            return cart._Leaf.from_counts(tree.counts[i])
+        return cart._SplittingNode(tree.test[i], build(tree.children[i][0]),
+                                   build(tree.children[i][1]))
+
+    return build(0)
+
+def score_settings(tree, settings, test_rows, actual):
+    """
+    PURPOSE
+    Score every setting against the test rows in one pass.
+
+    INPUT
+    tree: MaximalTree
+    settings: list of Setting
+    test_rows: CART row lists or ID3 movie dicts
+    actual: list of the true class label of each test row
+
+    OUTPUT
+    accuracies: list of accuracy (percent), one per setting
+    """
+    labels = [tree.label(i) for i in range(len(tree))]
+    stops = [stop_nodes(tree, setting) for setting in settings]
+    correct = [0] * len(settings)
+    paths = [tree.path(row) for row in test_rows]
+
+    for s in range(len(settings)):
+        stop = stops[s]
+        for r in range(len(paths)):
+            path, complete = paths[r]
+            prediction = None
+            for i in path:
+                if stop[i]:
+                    prediction = labels[i]
+                    break
+            #A path that ran out of branches only predicts if the setting
+            #stops somewhere along it
+            if prediction is not None and prediction == actual[r]:
+                correct[s] += 1
+
+    return [num_correct / len(test_rows) * 100 for num_correct in correct]
+
+#MAIN-------------------------------------------------------------------------
+
+def run_sweep(database_name, algorithm, settings, num_trials,
+              train_ratio=0.5):
+    """
+    PURPOSE
+    Average test accuracy of every setting over num_trials random splits,
+    growing one tree per split.
+
+    INPUT
+    database_name: name (and path) of database
+    algorithm: 'id3' or 'cart'
+    settings: list of Setting
+    num_trials: number of random splits
+    train_ratio: portion of rows used for training (CART only, ID3 uses
+                 the coin toss of Dataset)
+
+    OUTPUT
+    results: list of (setting, average accuracy), best first
+    """
+    totals = [0.0] * len(settings)
+
+    if algorithm == 'cart':
+        header, dataset = cart.load_data(database_name)
+        schema = cart.Schema(header)
+
+    for trial in range(num_trials):
+        if algorithm == 'cart':
+            train, test = cart.split_dataset(dataset, train_ratio)
+            tree = grow_cart(train, schema)
+            actual = [row[schema.target_pos] for row in test]
+        else:
+            mydata = id3.init_dataset(database_name)
+            tree = grow_id3(mydata.learn_set, mydata.attribute_set)
+            test = mydata.test_set
+            actual = [movie[id3.TARGET] for movie in test]
+
+        accuracies = score_settings(tree, settings, test, actual)
+        for s in range(len(settings)):
+            totals[s] += accuracies[s]
+
+        print('Trial #{0}, best accuracy = {1}'.format(trial,
+                                                      max(accuracies)))
+
+    results = [(settings[s], totals[s] / num_trials)
+               for s in range(len(settings))]
+    results.sort(key=(lambda result: result[1]), reverse=True)
+
+    return results
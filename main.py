@@ -1,18 +1,734 @@
 """
 This will be the main script.
 
+Run with no arguments to do the full run from the report: clean the data,
+then 50 ID3 trials and 50 CART trials. Otherwise pick a subcommand:
+
+    python main.py clean
+    python main.py columnar
+    python main.py train --algorithm cart --out model.py
+    python main.py evaluate --algorithm id3 --trials 10
+    python main.py adaptive --algorithm compare --width 1
+    python main.py predict --model model.py movies.csv
+    python main.py query movies.csv
+    python main.py rules --out rules.csv
+    python main.py sweep --algorithm cart --trials 5
+    python main.py worker --port 8766
+    python main.py distribute --workers host1:8766 host2:8766 --trials 50
+    python main.py serve --model model.py
+    python main.py loadtest
+    python main.py benchmark
+
+Every subcommand imports only what it needs, so predict with a saved
+model never loads the cleanup or training code.
+
 AUTHOR
 Warren Lacaba
 """
 
-from logic import id3
-from logic import cart
-import data_cleanup
+import argparse
+import sys
+
+DATABASE = 'data/new_database2.csv'
+ENGINES = ('rows', 'bitset')
+ENGINE_HELP = 'how splits are counted: row by row, or with bitsets'
+REGRESSION_TARGET = 'revenue_adjusted'
+
+#SUBCOMMANDS------------------------------------------------------------------
+
+def _reject(args, option, flags):
+    """
+    Stop with a usage error if any of flags was given along with option
+    """
+    for flag in flags:
+        dest = flag[2:].replace('-', '_')
+        if getattr(args, dest) != args.parser.get_default(dest):
+            args.parser.error('{0} can not be used with {1}'.format(flag,
+                                                                   option))
+
+def run_all(args):
+    """
+    The original full run
+    """
+    from logic import id3
+    from logic import cart
+    import data_cleanup
+
+    print("Parsing data and correcting for inflation...")
+    data_cleanup.clean_data()
+
+    print("\nBuilding decision tree using ID3 algorithm...\n")
+    id3.run_id3(DATABASE, 50)
+
+    cart.run_cart(DATABASE, 50)
+
+def run_clean(args):
+    """
+    Parse the original database and write the cleaned one
+    """
+    import data_cleanup
+
+    print("Parsing data and correcting for inflation...")
+    max_common = None if args.all_companies else data_cleanup.MAX_COMMON_MOVIES
+    data_cleanup.clean_data(args.adjusted, max_common)
+
+def run_columnar(args):
+    """
+    Write a binary columnar copy of a cleaned CSV database
+    """
+    from classes.columnar import csv_to_columnar
+
+    num_rows = csv_to_columnar(args.data, args.out)
+    print('Wrote {0} rows to {1}'.format(num_rows, args.out))
+
+def run_evaluate(args):
+    """
+    Run repeated random-split trials and print the average accuracy
+    """
+    #Options only some algorithms read, rejected with the others
+    algorithm = '--algorithm ' + args.algorithm
+    if args.algorithm != 'cart':
+        _reject(args, algorithm, ('--sample-threshold', '--sample-delta',
+                                  '--subset-splits'))
+    elif (args.sample_threshold is None and
+          args.sample_delta != args.parser.get_default('sample_delta')):
+        args.parser.error('--sample-delta needs --sample-threshold')
+    if args.algorithm in ('regression', 'boosting'):
+        _reject(args, algorithm, ('--engine', '--dedup', '--seed'))
+    if args.algorithm != 'boosting':
+        _reject(args, algorithm, ('--rounds', '--learning-rate',
+                                  '--max-depth'))
+
+    if args.stream:
+        if args.algorithm not in ('id3', 'cart'):
+            args.parser.error('--stream needs --algorithm id3 or cart')
+        _reject(args, '--stream', ('--sample-threshold', '--subset-splits',
+                                   '--cache', '--engine', '--dedup',
+                                   '--memory-report', '--memory-budget'))
+
+        from logic import stream
+        if args.algorithm == 'id3':
+            print("\nBuilding decision tree using ID3 algorithm "
+                  "(streaming)...\n")
+            stream.run_stream_id3(args.data, args.trials, seed=args.seed)
+        else:
+            stream.run_stream_cart(args.data, args.trials, seed=args.seed)
+        return
+
+    if args.memory_budget is not None:
+        if args.algorithm != 'cart':
+            args.parser.error('--memory-budget needs --algorithm cart')
+        _reject(args, '--memory-budget', ('--sample-threshold',
+                                          '--subset-splits', '--seed',
+                                          '--cache', '--engine', '--dedup'))
+    if args.memory_report and args.algorithm not in ('id3', 'cart'):
+        args.parser.error('--memory-report needs --algorithm id3 or cart')
+    if args.cache:
+        if args.algorithm not in ('id3', 'cart'):
+            args.parser.error('--cache needs --algorithm id3 or cart')
+        if args.seed is None:
+            args.parser.error('--cache needs --seed, so later runs make '
+                              'the same splits')
+
+    if args.algorithm == 'regression':
+        from classes.columnar import is_columnar
+        from logic import stream
+        if is_columnar(args.data):
+            args.parser.error('--algorithm regression needs the CSV '
+                              'database, the columnar file has no {0} '
+                              'column'.format(REGRESSION_TARGET))
+        if REGRESSION_TARGET not in stream.read_header(args.data):
+            args.parser.error('{0} has no {1} column, run "python main.py '
+                              'clean --adjusted" first'.format(
+                                  args.data, REGRESSION_TARGET))
+
+    report = None
+    if args.memory_report or args.memory_budget is not None:
+        from logic.memory import MemoryReport
+        report = MemoryReport()
+
+    cache = None
+    if args.cache:
+        from logic.model_cache import ModelCache
+        cache = ModelCache(args.cache_dir, int(args.cache_size_mb * 2**20))
+
+    if args.algorithm == 'id3':
+        from logic import id3
+        print("\nBuilding decision tree using ID3 algorithm...\n")
+        id3.run_id3(args.data, args.trials, report, args.seed, cache,
+                    args.engine, args.dedup)
+    elif args.algorithm == 'regression':
+        from logic import cart
+        cart.run_cart_regression(args.data, args.trials, REGRESSION_TARGET)
+    elif args.algorithm == 'boosting':
+        from logic import boosting
+        boosting.run_boosting(args.data, args.trials, args.rounds,
+                              args.learning_rate, args.max_depth)
+    elif args.memory_budget is not None:
+        from logic import memory
+        memory.run_cart_budgeted(args.data, args.trials,
+                                 int(args.memory_budget * 2**20), report)
+    else:
+        from logic import cart
+        sampling = None
+        if args.sample_threshold is not None:
+            sampling = cart.SplitSampling(args.sample_threshold,
+                                          args.sample_delta)
+        cart.run_cart(args.data, args.trials, sampling, report,
+                      args.subset_splits, args.seed, cache, args.engine,
+                      args.dedup)
+
+def run_adaptive(args):
+    """
+    Run trials in batches until the confidence interval on the accuracy,
+    or on the ID3 - CART difference, is narrow enough
+    """
+    if args.batch_size < 1:
+        args.parser.error('--batch-size must be at least 1')
+    if args.max_trials < 2:
+        args.parser.error('--max-trials must be at least 2, an interval '
+                          'needs two trials')
+    if not 0 < args.confidence < 1:
+        args.parser.error('--confidence must be between 0 and 1')
+
+    from logic import adaptive
+
+    result = adaptive.run_adaptive(args.data, args.algorithm, args.width,
+                                   args.confidence, args.batch_size,
+                                   args.min_trials, args.max_trials,
+                                   args.seed)
+    print(adaptive.summary(result))
+
+def _train(algorithm, data, seed, train_ratio, subsets=False, engine='rows',
+           streaming=False):
+    """
+    Build one tree on a random split. Returns the generated predictor
+    source, the compiled predictor and the test rows. With streaming,
+    the tree is grown level by level from passes over the file and only
+    the test rows are held in memory.
+    """
+    import random
+    from classes.dataset import NOT_ATTRIBUTES
+    from logic import compiler
+    from logic import stream
+
+    def id3_source():
+        return stream.id3_rows(data)
+
+    def cart_source():
+        return stream.cart_rows(data)
+
+    if algorithm == 'id3':
+        attribute_set = set(stream.read_header(data))
+        attribute_set.difference_update(NOT_ATTRIBUTES)
+
+    if streaming and algorithm == 'id3':
+        root = stream.stream_id3(stream.split_source(id3_source, seed,
+                                                     train_ratio, True),
+                                 attribute_set)
+        test_set = list(stream.split_source(id3_source, seed, train_ratio,
+                                            False)())
+        predictor_source = compiler.id3_source(root)
+    elif streaming:
+        header = stream.read_header(data)
+        tree = stream.stream_cart(stream.split_source(cart_source, seed,
+                                                      train_ratio, True),
+                                  header)
+        test_set = list(stream.split_source(cart_source, seed, train_ratio,
+                                            False)())
+        predictor_source = compiler.cart_source(tree, header)
+    elif algorithm == 'id3':
+        from logic import id3
+
+        learn_set = list(stream.split_source(id3_source, seed, train_ratio,
+                                             True)())
+        test_set = list(stream.split_source(id3_source, seed, train_ratio,
+                                            False)())
+        if engine == 'bitset':
+            from logic import bitset
+            root = bitset.build_bitset_id3(learn_set, attribute_set)
+        else:
+            root = id3.id3_tree(learn_set, attribute_set)
+        predictor_source = compiler.id3_source(root)
+    else:
+        from logic import cart
+
+        header, dataset = cart.load_data(data)
+        learn_set, test_set = cart.split_dataset(dataset, train_ratio,
+                                                 random.Random(seed))
+        model = cart.CartClassifier(header, subsets=subsets,
+                                    engine=engine).fit(learn_set)
+        predictor_source = compiler.cart_source(model.tree, header)
+
+    return (predictor_source, compiler.compile_source(predictor_source),
+            test_set)
+
+def run_train(args):
+    """
+    Train one tree and save it as a compiled predictor module
+    """
+    from logic import compiler
+
+    if args.stream:
+        _reject(args, '--stream', ('--subset-splits', '--engine'))
+
+    predictor_source, predictor, test_set = _train(args.algorithm, args.data,
+                                                   args.seed, args.train_ratio,
+                                                   args.subset_splits,
+                                                   args.engine, args.stream)
+    compiler.save_source(predictor_source, args.out)
+
+    if test_set:
+        if args.algorithm == 'id3':
+            actual = [movie['revenue'] for movie in test_set]
+        else:
+            revenue_pos = predictor.HEADER.index('revenue')
+            actual = [row[revenue_pos] for row in test_set]
+
+        predictions = predictor.predict_batch(test_set)
+        correct = sum(1 for i in range(len(actual))
+                      if predictions[i] == actual[i])
+        print('Test accuracy = {0}'.format(correct / len(actual) * 100))
+
+    print('Saved {0} model to {1}'.format(args.algorithm, args.out))
+
+def run_predict(args):
+    """
+    Score a CSV of movies with a saved model and write the rows back out
+    with a Prediction column
+    """
+    import csv
+    from logic.compiler import load_module, model_inputs, model_label
+
+    model = load_module(args.model)
+
+    read = open(args.input, 'r', encoding='utf-8') if args.input != '-' \
+        else sys.stdin
+    reader = csv.DictReader(read)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(reader.fieldnames + ['Prediction'])
+
+    for row in reader:
+        label = model.predict(model_inputs(model, [row])[0])
+        writer.writerow([row[name] for name in reader.fieldnames] +
+                        [model_label(model, label)])
+
+    if read is not sys.stdin:
+        read.close()
+
+def run_query(args):
+    """
+    Score a CSV of movies with an ID3 tree that is only built along the
+    paths the movies follow, and write the rows back out with a
+    Prediction column
+    """
+    import csv
+    from classes.dataset import encode_movie
+    from logic import id3
+    from logic import stream
+
+    model = id3.LazyID3Classifier().fit(list(stream.id3_rows(args.data)))
+
+    read = open(args.input, 'r', encoding='utf-8') if args.input != '-' \
+        else sys.stdin
+    reader = csv.DictReader(read)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(reader.fieldnames + ['Prediction'])
+
+    for row in reader:
+        label = model.predict(encode_movie(row))
+        #ID3 class labels are the bracket with an 'rv' prefix
+        if label is not None:
+            label = label[2:]
+        writer.writerow([row[name] for name in reader.fieldnames] + [label])
+
+    if read is not sys.stdin:
+        read.close()
+
+def run_rules(args):
+    """
+    Train an ID3 tree on the whole database, then export its rules to a
+    CSV or JSON file one at a time, or list the rules that fire for a
+    partly known movie
+    """
+    from classes.dataset import PREFIXES, decode_value, encode_movie
+    from classes.rules import RuleTrie, write_rules_csv, write_rules_json
+    from classes.tree import Tree
+    from logic import id3
+    from logic import stream
+
+    model = id3.ID3Classifier().fit(list(stream.id3_rows(args.data)))
+    tree = Tree(model.root)
+
+    def decoded(rules):
+        for conditions, label in rules:
+            yield (tuple((attribute, decode_value(attribute, value))
+                         for attribute, value in conditions),
+                   decode_value('revenue', label))
+
+    if args.match is not None:
+        movie = encode_movie(dict(pair.split('=', 1) for pair in args.match),
+                             partial=True)
+        trie = RuleTrie(tree.rule_tuples())
+        for conditions, label in decoded(trie.matching(movie)):
+            print(', '.join('{0} == {1}'.format(attribute, value)
+                            for attribute, value in conditions) +
+                  ' => revenue ' + label)
+
+    if args.out is not None:
+        with open(args.out, 'w', newline='', encoding='utf-8') as write:
+            if args.out.endswith('.json'):
+                num_rules = write_rules_json(decoded(tree.rule_tuples()),
+                                             write)
+            else:
+                num_rules = write_rules_csv(decoded(tree.rule_tuples()),
+                                            write, list(PREFIXES))
+        print('Wrote {0} rules to {1}'.format(num_rules, args.out),
+              file=sys.stderr)
+
+def run_sweep(args):
+    """
+    Score a grid of depth / min samples / alpha settings, growing one
+    tree per trial instead of one per setting
+    """
+    from logic import sweep
+
+    max_depths = [sweep.INFINITE_DEPTH if depth < 0 else depth
+                  for depth in args.max_depths]
+    settings = sweep.grid(max_depths, args.min_samples, args.alphas)
+    results = sweep.run_sweep(args.data, args.algorithm, settings,
+                              args.trials)
+
+    for setting, accuracy in results:
+        print('{0}: {1}%'.format(setting, accuracy))
+
+def run_worker(args):
+    """
+    Run trials sent by a distribute coordinator
+    """
+    from logic import distributed
+
+    distributed.run_worker(args.host, args.port, args.data)
+
+def run_distribute(args):
+    """
+    Run evaluation trials on worker processes, started here with --local
+    or already running at --workers
+    """
+    from logic import distributed
+
+    addresses = [distributed.parse_address(text) for text in args.workers]
+    processes = []
+    if args.local:
+        processes, local = distributed.start_local_workers(args.local,
+                                                           [args.data])
+        addresses += local
+    if not addresses:
+        sys.exit('Give --workers or --local')
+
+    params = {'subsets': args.subset_splits, 'engine': args.engine,
+              'dedup': args.dedup}
+    try:
+        summary = distributed.run_distributed(
+            args.data, args.algorithm, args.trials, addresses, args.seed,
+            args.train_ratio, params, args.retries, args.timeout,
+            args.report)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    for algorithm in args.algorithm:
+        stats = summary.get(algorithm)
+        if stats is None:
+            continue
+        print('{0}: Average accuracy over {1} trials = {2:.3f}%, build = '
+              '{3:.1f} ms/tree'.format(algorithm, stats['trials'],
+                                       stats['accuracy'],
+                                       stats['build_seconds'] * 1000))
+    for name, trials in sorted(summary['workers'].items()):
+        print('{0}: {1} trials'.format(name, trials))
+    print('{0} workers, {1:.2f} s'.format(len(addresses), summary['seconds']))
+    for spec, error in summary['failures']:
+        print('{0} seed {1} failed: {2}'.format(spec['algorithm'],
+                                                spec['seed'], error),
+              file=sys.stderr)
+
+def run_serve(args):
+    """
+    Serve a saved model over the local line protocol
+    """
+    from logic import serve
+
+    serve.serve(args.model, args.host, args.port, args.max_batch,
+                args.max_wait_ms / 1000)
+
+def run_loadtest(args):
+    """
+    Send requests to a running server and print the latency numbers
+    """
+    import asyncio
+    import csv
+    import json
+    from logic import serve
+
+    with open(args.data, 'r', encoding='utf-8') as read:
+        rows = [{name: row[name] for name in row if name != 'revenue'}
+                for row in csv.DictReader(read)]
+
+    result = asyncio.run(serve.load_test(rows, args.host, args.port,
+                                         args.connections, args.requests))
+    print(json.dumps(result, indent=2))
+
+def run_benchmark(args):
+    """
+    Time tree building and per-row scoring for both algorithms
+    """
+    import time
+
+    for algorithm in ('id3', 'cart'):
+        build_time = 0
+        score_time = 0
+        num_rows = 0
+
+        for trial in range(args.trials):
+            start = time.perf_counter()
+            predictor_source, predictor, test_set = _train(algorithm,
+                                                           args.data,
+                                                           trial, 0.5,
+                                                           engine=args.engine)
+            build_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            predictor.predict_batch(test_set)
+            score_time += time.perf_counter() - start
+            num_rows += len(test_set)
+
+        print('{0}: build = {1:.1f} ms/tree, predict = {2:.2f} us/row'.format(
+            algorithm, build_time / args.trials * 1000,
+            score_time / num_rows * 1000000))
+
+#MAIN-------------------------------------------------------------------------
+
+def make_parser():
+    """
+    Build the argument parser with all the subcommands
+    """
+    parser = argparse.ArgumentParser(
+        description='Predict movie revenue brackets with decision trees.')
+    commands = parser.add_subparsers(dest='command')
+
+    clean = commands.add_parser('clean', help='clean the original database')
+    clean.add_argument('--adjusted', action='store_true',
+                       help='also write inflation adjusted revenue, '
+                            'needed for regression')
+    clean.add_argument('--all-companies', action='store_true',
+                       help='keep every company instead of the top 20')
+    clean.set_defaults(func=run_clean)
+
+    columnar = commands.add_parser('columnar',
+                                   help='write a binary columnar copy of '
+                                        'the cleaned database')
+    columnar.add_argument('--data', default=DATABASE)
+    columnar.add_argument('--out', default='data/new_database2.bin')
+    columnar.set_defaults(func=run_columnar)
+
+    evaluate = commands.add_parser('evaluate',
+                                   help='average accuracy over random splits')
+    evaluate.add_argument('--algorithm', choices=('id3', 'cart',
+                                                  'regression', 'boosting'),
+                          default='id3')
+    evaluate.add_argument('--data', default=DATABASE)
+    evaluate.add_argument('--trials', type=int, default=50)
+    evaluate.add_argument('--sample-threshold', type=int,
+                          help='CART: pick splits of nodes with more rows '
+                               'than this from a sample')
+    evaluate.add_argument('--sample-delta', type=float, default=0.05,
+                          help='CART: allowed chance of a sampled split '
+                               'not being the best one')
+    evaluate.add_argument('--subset-splits', action='store_true',
+                          help='CART: split on subsets of values, found '
+                               'by a class ordering (not exhaustive)')
+    evaluate.add_argument('--rounds', type=int, default=100,
+                          help='boosting: rounds, each adds a tree per class')
+    evaluate.add_argument('--learning-rate', type=float, default=0.1,
+                          help='boosting: shrinkage of each tree')
+    evaluate.add_argument('--max-depth', type=int, default=3,
+                          help='boosting: depth of each tree')
+    evaluate.add_argument('--seed', type=int,
+                          help='trial i splits the data with seed + i')
+    evaluate.add_argument('--cache', action='store_true',
+                          help='reuse trees trained on the same file, '
+                               'seed and parameters (needs --seed)')
+    evaluate.add_argument('--cache-dir', default='.model_cache')
+    evaluate.add_argument('--cache-size-mb', type=float, default=256)
+    evaluate.add_argument('--engine', choices=ENGINES, default='rows',
+                          help=ENGINE_HELP)
+    evaluate.add_argument('--dedup', action='store_true',
+                          help='train on distinct rows weighted by count')
+    evaluate.add_argument('--memory-report', action='store_true',
+                          help='print peak memory of each phase')
+    evaluate.add_argument('--memory-budget', type=float,
+                          help='CART: MiB allowed for training, picks an '
+                               'index or streaming strategy if needed')
+    evaluate.add_argument('--stream', action='store_true',
+                          help='ID3 and CART: grow each tree level by level '
+                               'from passes over the file, never holding '
+                               'the database in memory')
+    evaluate.set_defaults(func=run_evaluate, parser=evaluate)
+
+    adaptive = commands.add_parser('adaptive',
+                                   help='run trials until the accuracy '
+                                        'interval is narrow enough')
+    adaptive.add_argument('--algorithm', choices=('id3', 'cart', 'compare'),
+                          default='compare',
+                          help='compare: interval on ID3 - CART accuracy '
+                               'over paired splits')
+    adaptive.add_argument('--data', default=DATABASE)
+    adaptive.add_argument('--width', type=float, default=1.0,
+                          help='stop once the interval is this wide '
+                               '(accuracy points)')
+    adaptive.add_argument('--confidence', type=float, default=0.95)
+    adaptive.add_argument('--batch-size', type=int, default=5)
+    adaptive.add_argument('--min-trials', type=int, default=10)
+    adaptive.add_argument('--max-trials', type=int, default=500)
+    adaptive.add_argument('--seed', type=int)
+    adaptive.set_defaults(func=run_adaptive, parser=adaptive)
+
+    train = commands.add_parser('train',
+                                help='train a tree and save it as a model')
+    train.add_argument('--algorithm', choices=('id3', 'cart'),
+                       default='cart')
+    train.add_argument('--data', default=DATABASE)
+    train.add_argument('--out', default='model.py',
+                       help='where to save the compiled model (.py)')
+    train.add_argument('--seed', type=int, default=0)
+    train.add_argument('--train-ratio', type=float, default=0.5)
+    train.add_argument('--subset-splits', action='store_true',
+                       help='CART: split on subsets of values, found '
+                            'by a class ordering (not exhaustive)')
+    train.add_argument('--engine', choices=ENGINES, default='rows',
+                       help=ENGINE_HELP)
+    train.add_argument('--stream', action='store_true',
+                       help='grow the tree level by level from passes over '
+                            'the file instead of loading it')
+    train.set_defaults(func=run_train, parser=train)
+
+    predict = commands.add_parser('predict',
+                                  help='score movies with a saved model')
+    predict.add_argument('--model', required=True)
+    predict.add_argument('input', nargs='?', default='-',
+                         help='CSV of movies, - for stdin')
+    predict.set_defaults(func=run_predict)
+
+    query = commands.add_parser('query',
+                                help='score movies with an ID3 tree built '
+                                     'only where they go')
+    query.add_argument('--data', default=DATABASE)
+    query.add_argument('input', nargs='?', default='-',
+                       help='CSV of movies, - for stdin')
+    query.set_defaults(func=run_query)
+
+    rules = commands.add_parser('rules',
+                                help='export the rules of an ID3 tree, or '
+                                     'find the rules that fire for a movie')
+    rules.add_argument('--data', default=DATABASE)
+    rules.add_argument('--out',
+                       help='file to export to, .json or .csv')
+    rules.add_argument('--match', nargs='+', metavar='ATTRIBUTE=VALUE',
+                       help='known attributes of a movie, eg. genre=Action')
+    rules.set_defaults(func=run_rules)
+
+    sweep = commands.add_parser('sweep',
+                                help='score a grid of tree size settings')
+    sweep.add_argument('--algorithm', choices=('id3', 'cart'),
+                       default='cart')
+    sweep.add_argument('--data', default=DATABASE)
+    sweep.add_argument('--trials', type=int, default=5)
+    sweep.add_argument('--max-depths', type=int, nargs='+',
+                       default=[2, 4, 8, -1], help='-1 for no limit')
+    sweep.add_argument('--min-samples', type=int, nargs='+',
+                       default=[0, 10, 50])
+    sweep.add_argument('--alphas', type=float, nargs='+',
+                       default=[0.0, 0.0005, 0.002])
+    sweep.set_defaults(func=run_sweep)
+
+    worker = commands.add_parser('worker',
+                                 help='run trials for a distribute '
+                                      'coordinator')
+    worker.add_argument('--host', default='127.0.0.1',
+                        help='0.0.0.0 to take trials from other machines')
+    worker.add_argument('--port', type=int, default=8766,
+                        help='0 picks a free port')
+    worker.add_argument('--data', nargs='*', default=[],
+                        help='databases to load before taking trials')
+    worker.set_defaults(func=run_worker)
+
+    distribute = commands.add_parser('distribute',
+                                     help='run evaluation trials on '
+                                          'worker processes')
+    distribute.add_argument('--algorithm', choices=('id3', 'cart'),
+                            nargs='+', default=['id3', 'cart'])
+    distribute.add_argument('--data', default=DATABASE,
+                            help='database path, as the workers see it')
+    distribute.add_argument('--trials', type=int, default=50)
+    distribute.add_argument('--workers', nargs='*', default=[],
+                            metavar='HOST:PORT')
+    distribute.add_argument('--local', type=int, default=0,
+                            help='start this many workers on this machine')
+    distribute.add_argument('--seed', type=int, default=0,
+                            help='trial i splits the data with seed + i')
+    distribute.add_argument('--train-ratio', type=float, default=0.5)
+    distribute.add_argument('--subset-splits', action='store_true',
+                            help='CART: split on subsets of values, found '
+                                 'by a class ordering (not exhaustive)')
+    distribute.add_argument('--engine', choices=ENGINES, default='rows',
+                            help='CART: ' + ENGINE_HELP)
+    distribute.add_argument('--dedup', action='store_true',
+                            help='train on distinct rows weighted by count')
+    distribute.add_argument('--retries', type=int, default=2,
+                            help='times a failed trial is retried')
+    distribute.add_argument('--timeout', type=float,
+                            help='seconds to wait for one trial')
+    distribute.add_argument('--report', action='store_true',
+                            help='print each trial as it finishes')
+    distribute.set_defaults(func=run_distribute)
+
+    serve = commands.add_parser('serve',
+                                help='serve a saved model on localhost')
+    serve.add_argument('--model', required=True)
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--max-batch', type=int, default=64)
+    serve.add_argument('--max-wait-ms', type=float, default=2.0)
+    serve.set_defaults(func=run_serve)
+
+    loadtest = commands.add_parser('loadtest',
+                                   help='send requests to a running server')
+    loadtest.add_argument('--data', default=DATABASE)
+    loadtest.add_argument('--host', default='127.0.0.1')
+    loadtest.add_argument('--port', type=int, default=8765)
+    loadtest.add_argument('--connections', type=int, default=16)
+    loadtest.add_argument('--requests', type=int, default=10000)
+    loadtest.set_defaults(func=run_loadtest)
+
+    benchmark = commands.add_parser('benchmark',
+                                    help='time building and scoring')
+    benchmark.add_argument('--data', default=DATABASE)
+    benchmark.add_argument('--trials', type=int, default=5)
+    benchmark.add_argument('--engine', choices=ENGINES, default='rows',
+                           help=ENGINE_HELP)
+    benchmark.set_defaults(func=run_benchmark)
+
+    return parser
 
-print("Parsing data and correcting for inflation...")
-data_cleanup.clean_data()
+def main(argv=None):
+    args = make_parser().parse_args(argv)
 
-print("\nBuilding decision tree using ID3 algorithm...\n")
-id3.run_id3('data/new_database2.csv', 50)
+    if args.command is None:
+        run_all(args)
+    else:
+        args.func(args)
 
-cart.run_cart('data/new_database2.csv', 50)
+if __name__ == '__main__':
+    main()
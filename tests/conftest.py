@@ -0,0 +1,63 @@
+"""
+PURPOSE
+Shared fixtures for the tests. The tests run on the cleaned database,
+with fixed seeds for every random split.
+
+AUTHOR
+Warren Lacaba
+"""
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATABASE = os.path.join(ROOT, 'data', 'new_database2.csv')
+SEED = 4710
+
+@pytest.fixture(scope='session')
+def database():
+    return DATABASE
+
+@pytest.fixture(scope='session')
+def cart_data():
+    """
+    Header and row lists of the cleaned database
+    """
+    from logic import cart
+    return cart.load_data(DATABASE)
+
+@pytest.fixture(scope='session')
+def cart_split(cart_data):
+    """
+    Header, train rows and test rows of one seeded half split
+    """
+    from logic import cart
+    header, dataset = cart_data
+    train, test = cart.split_dataset(dataset, 0.5, random.Random(SEED))
+    return header, train, test
+
+@pytest.fixture(scope='session')
+def movies():
+    """
+    Every movie of the cleaned database as an encoded movie dict
+    """
+    from logic import stream
+    return list(stream.id3_rows(DATABASE))
+
+@pytest.fixture(scope='session')
+def id3_split(movies):
+    """
+    Attribute set, learn movies and test movies of one seeded half split
+    """
+    from classes.dataset import NOT_ATTRIBUTES
+    coin = random.Random(SEED)
+    learn_set, test_set = [], []
+    for movie in movies:
+        (learn_set if coin.random() < 0.5 else test_set).append(movie)
+    attribute_set = set(movies[0])
+    attribute_set.difference_update(NOT_ATTRIBUTES)
+    return attribute_set, learn_set, test_set
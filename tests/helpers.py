@@ -0,0 +1,61 @@
+"""
+PURPOSE
+Tree comparisons used by the equivalence tests.
+
+AUTHOR
+Warren Lacaba
+"""
+
+def id3_differences(a, b, path=()):
+    """
+    PURPOSE
+    Compare two ID3 trees of Node objects.
+
+    INPUT
+    a, b: root Nodes
+    path: branches taken so far, for the report
+
+    OUTPUT
+    list of (path, what differs), empty if the trees are the same
+    """
+    if a.label != b.label or a.branches != b.branches:
+        return [(path, (a.label, a.branches, b.label, b.branches))]
+
+    differences = []
+    for i in range(len(a.branches)):
+        differences.extend(id3_differences(a.children[i], b.children[i],
+                                           path + (a.branches[i],)))
+    return differences
+
+def cart_differences(a, b, path=()):
+    """
+    PURPOSE
+    Compare two CART trees of _SplittingNode and _Leaf objects.
+
+    INPUT
+    a, b: roots of the trees
+    path: branches taken so far, for the report
+
+    OUTPUT
+    list of (path, what differs), empty if the trees are the same
+    """
+    a_leaf = hasattr(a, 'predictions')
+    b_leaf = hasattr(b, 'predictions')
+    if a_leaf or b_leaf:
+        if a_leaf and b_leaf and a.predictions == b.predictions:
+            return []
+        return [(path, (getattr(a, 'predictions', None),
+                        getattr(b, 'predictions', None)))]
+
+    a_split = (a.split_crit.attr_col_num,
+               getattr(a.split_crit, 'value', None),
+               frozenset(getattr(a.split_crit, 'values', ())))
+    b_split = (b.split_crit.attr_col_num,
+               getattr(b.split_crit, 'value', None),
+               frozenset(getattr(b.split_crit, 'values', ())))
+    if a_split != b_split:
+        return [(path, (a_split, b_split))]
+
+    return (cart_differences(a.true_branch, b.true_branch, path + (True,)) +
+            cart_differences(a.false_branch, b.false_branch,
+                             path + (False,)))
@@ -0,0 +1,55 @@
+"""
+PURPOSE
+Adaptive evaluation: t quantiles, intervals, and trials that score like
+the plain builders on the same seeded split.
+
+AUTHOR
+Warren Lacaba
+"""
+import random
+
+import pytest
+
+from logic import adaptive
+from logic import cart
+
+@pytest.mark.parametrize('df, table', [(1, 12.706), (2, 4.303), (3, 3.182),
+                                       (5, 2.571), (10, 2.228), (30, 2.042)])
+def test_t_quantile_matches_the_table(df, table):
+    assert abs(adaptive.t_quantile(0.975, df) - table) < 0.01
+
+def test_confidence_interval():
+    mean, half_width = adaptive.confidence_interval([1.0, 2.0, 3.0])
+
+    assert mean == 2.0
+    assert abs(half_width - 4.303 / 3 ** 0.5) < 0.01
+
+def test_cart_trial_scores_like_build_tree(cart_data):
+    header, dataset = cart_data
+    schema = cart.Schema(header)
+
+    trial = adaptive.run_trial(header, dataset, 'cart', 11)
+
+    train, test = cart.split_dataset(dataset, 0.5, random.Random(11))
+    tree = cart._build_tree(train, schema)
+    correct = sum(cart.predict(cart.classify(row, tree)) ==
+                  row[schema.target_pos] for row in test)
+    assert trial['accuracy'] == correct / len(test) * 100
+
+def test_run_adaptive_uses_seeded_trials(database, cart_data, capsys):
+    header, dataset = cart_data
+
+    result = adaptive.run_adaptive(database, 'cart', width=1000,
+                                   batch_size=2, min_trials=2, seed=11)
+
+    assert result['trials'] == 2
+    assert result['converged']
+    assert result['accuracies']['cart'] == [
+        adaptive.run_trial(header, dataset, 'cart', seed)['accuracy']
+        for seed in (11, 12)]
+
+@pytest.mark.parametrize('options', [{'batch_size': 0}, {'max_trials': 1},
+                                     {'confidence': 1}, {'confidence': 0}])
+def test_run_adaptive_rejects_bad_options(database, options):
+    with pytest.raises(ValueError):
+        adaptive.run_adaptive(database, 'cart', 1.0, **options)
@@ -0,0 +1,47 @@
+"""
+PURPOSE
+The bitset engine grows the same trees as the row builders.
+
+AUTHOR
+Warren Lacaba
+"""
+import pytest
+
+from helpers import cart_differences, id3_differences
+from logic import bitset
+from logic import cart
+from logic import id3
+
+def test_id3_matches_id3_tree(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+
+    expected = id3.id3_tree(learn_set, attribute_set)
+    built = bitset.build_bitset_id3(learn_set, attribute_set)
+
+    assert id3_differences(built, expected) == []
+
+@pytest.mark.parametrize('subsets', [False, True])
+def test_cart_matches_build_tree(cart_split, subsets):
+    header, train, test = cart_split
+    schema = cart.Schema(header)
+
+    expected = cart._build_tree(train, schema, subsets=subsets)
+    built = bitset.build_bitset_cart(train, schema, subsets)
+
+    assert cart_differences(built, expected) == []
+
+def test_class_counts_in_row_order(cart_split):
+    header, train, test = cart_split
+    schema = cart.Schema(header)
+    index = bitset.BitsetIndex(train, schema.attributes, schema.target_pos)
+
+    counts = index.class_counts(index.all_rows)
+
+    assert list(counts.items()) == list(
+        cart._count_class_values(train, schema.target_pos).items())
+
+def test_rejects_weighted_rows(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+
+    with pytest.raises(ValueError):
+        bitset.build_bitset_id3(id3.compress_movies(learn_set), attribute_set)
@@ -0,0 +1,72 @@
+"""
+PURPOSE
+Histogram shortcuts of the boosted trees agree with scanning the rows,
+and the model beats guessing the most common class.
+
+AUTHOR
+Min Gyu Park
+"""
+from collections import Counter
+
+import pytest
+
+from logic import boosting
+from logic import cart
+
+@pytest.fixture(scope='module')
+def encoded(cart_split):
+    header, train, test = cart_split
+    model = boosting.GradientBoosting(header, rounds=0).fit(train)
+    codes = model._encode(train)
+    num_values = [len(value_codes) for value_codes in model.value_codes]
+    target_pos = model.schema.target_pos
+    top = Counter(row[target_pos] for row in train).most_common(1)[0][0]
+    grad = [0.3 - (row[target_pos] == top) for row in train]
+    hess = [0.21] * len(train)
+    return codes, num_values, grad, hess
+
+def test_sibling_subtraction(encoded):
+    codes, num_values, grad, hess = encoded
+    indices = list(range(len(grad)))
+    left = indices[::3]
+    right = [i for i in indices if i % 3]
+
+    parent = boosting._histogram(codes, num_values, grad, hess, indices)
+    left_hist = boosting._histogram(codes, num_values, grad, hess, left)
+    right_hist = boosting._histogram(codes, num_values, grad, hess, right)
+
+    for (grad_sum, hess_sum, count), (sub_grad, sub_hess, sub_count) in zip(
+            right_hist, boosting._subtract(parent, left_hist)):
+        assert count == sub_count
+        assert all(abs(a - b) < 1e-9 for a, b in zip(grad_sum, sub_grad))
+        assert all(abs(a - b) < 1e-9 for a, b in zip(hess_sum, sub_hess))
+
+def test_leaves_score_like_routing(encoded):
+    codes, num_values, grad, hess = encoded
+    indices = list(range(len(grad)))
+
+    tree, leaves = boosting._grow_tree(codes, num_values, grad, hess, indices,
+                                       3, 1.0, 20, 0.1)
+    routed = [0.0] * len(grad)
+    tree.add_scores(codes, routed, indices)
+
+    from_leaves = [None] * len(grad)
+    for value, rows in leaves:
+        for i in rows:
+            from_leaves[i] = value
+    assert len(leaves) > 1
+    assert routed == from_leaves
+
+def test_beats_the_majority_class(cart_split):
+    header, train, test = cart_split
+    target_pos = cart.Schema(header).target_pos
+    actual = [row[target_pos] for row in test]
+    top = Counter(row[target_pos] for row in train).most_common(1)[0][0]
+
+    model = boosting.GradientBoosting(header, rounds=10).fit(train)
+    predictions = model.predict_batch(test)
+
+    assert predictions == boosting.GradientBoosting(
+        header, rounds=10).fit(train).predict_batch(test)
+    assert (sum(p == a for p, a in zip(predictions, actual)) >
+            sum(a == top for a in actual))
@@ -0,0 +1,63 @@
+"""
+PURPOSE
+The columnar copy of the cleaned database reads back the same rows.
+
+AUTHOR
+Warren Lacaba
+"""
+import csv
+import random
+
+import pytest
+
+from classes.columnar import COLUMNS, ColumnarDataset, csv_to_columnar
+from classes.dataset import Dataset
+from logic import stream
+
+@pytest.fixture(scope='module')
+def columnar_path(database, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('columnar') / 'movies.bin')
+    csv_to_columnar(database, path)
+    return path
+
+@pytest.fixture(scope='module')
+def csv_rows(database):
+    with open(database, 'r', encoding='utf-8') as read:
+        return [{name: row[name] for name in COLUMNS}
+                for row in csv.DictReader(read)]
+
+def test_round_trip(columnar_path, csv_rows):
+    with ColumnarDataset(columnar_path) as columnar:
+        assert len(columnar) == len(csv_rows)
+        assert list(columnar.rows()) == csv_rows
+
+def test_codes_index_sorted_values(columnar_path, csv_rows):
+    with ColumnarDataset(columnar_path) as columnar:
+        for name in COLUMNS:
+            values = columnar.values[name]
+            codes = columnar.columns[name]
+            assert values == sorted(set(row[name] for row in csv_rows))
+            assert [values[code] for code in codes] == \
+                [row[name] for row in csv_rows]
+
+def test_same_split_as_csv(database, columnar_path):
+    from_csv = Dataset()
+    from_csv.get_data(database, random.Random(5))
+    from_columnar = Dataset()
+    from_columnar.get_data(columnar_path, random.Random(5))
+
+    assert from_columnar.attribute_set == from_csv.attribute_set
+    assert from_columnar.learn_set == from_csv.learn_set
+    assert from_columnar.test_set == from_csv.test_set
+
+def test_streams_same_movies(database, columnar_path):
+    assert list(stream.id3_rows(columnar_path)) == \
+        list(stream.id3_rows(database))
+
+def test_rejects_other_files(database, tmp_path):
+    path = str(tmp_path / 'not_columnar.bin')
+    with open(path, 'wb') as write:
+        write.write(b'company,release\n' * 4)
+
+    with pytest.raises(ValueError):
+        ColumnarDataset(path)
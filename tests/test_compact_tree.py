@@ -0,0 +1,59 @@
+"""
+PURPOSE
+CompactTree holds the same tree as the Node objects it was packed from.
+
+AUTHOR
+Warren Lacaba
+"""
+import pytest
+
+from classes.compact_tree import CompactTree
+from classes.tree import Tree
+from helpers import id3_differences
+from logic import id3
+
+@pytest.fixture(scope='module')
+def root(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    return id3.id3_tree(learn_set, attribute_set)
+
+def walk(node, movie):
+    """
+    Classify a movie by walking the Node objects
+    """
+    while node.branches:
+        if movie[node.label] not in node.branches:
+            return None
+        node = node.children[node.branches.index(movie[node.label])]
+    return node.label
+
+def test_round_trip(root):
+    compact = CompactTree.from_node(root)
+
+    assert id3_differences(compact.to_node(), root) == []
+
+def test_classify_matches_node_walk(root, id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    compact = CompactTree.from_node(root)
+
+    assert [compact.classify(movie) for movie in test_set] == \
+        [walk(root, movie) for movie in test_set]
+
+def test_rules_match_tree(root):
+    compact = CompactTree.from_node(root)
+
+    assert sorted(compact.iter_rules()) == sorted(Tree(root).iter_rules())
+
+def test_unknown_value_has_no_prediction(root):
+    compact = CompactTree.from_node(root)
+    movie = {'genre': 'none', 'company': 'none', 'release': 'none',
+             'prod_budget': 'none'}
+
+    assert compact.classify(movie) is None
+
+def test_classifier_scores_like_the_nodes(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    model = id3.ID3Classifier(attribute_set).fit(learn_set)
+
+    assert model.predict_batch(test_set) == \
+        [walk(model.root, movie) for movie in test_set]
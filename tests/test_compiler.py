@@ -0,0 +1,69 @@
+"""
+PURPOSE
+Compiled predictors give the same labels as the trees they were
+generated from, before and after a save and load.
+
+AUTHOR
+Warren Lacaba
+"""
+import pytest
+
+from logic import cart
+from logic import compiler
+from logic import id3
+
+@pytest.fixture(scope='module')
+def id3_model(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    return id3.ID3Classifier(attribute_set).fit(learn_set)
+
+@pytest.fixture(scope='module', params=[False, True],
+                ids=['values', 'subsets'])
+def cart_model(request, cart_split):
+    header, train, test = cart_split
+    return cart.CartClassifier(header, subsets=request.param).fit(train)
+
+def test_id3_predictor_matches_tree(id3_model, id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    predictor = compiler.compile_id3(id3_model.root)
+
+    assert predictor.predict_batch(test_set) == \
+        id3_model.predict_batch(test_set)
+
+def test_cart_predictor_matches_tree(cart_model, cart_split):
+    header, train, test = cart_split
+    predictor = compiler.compile_cart(cart_model.tree, header)
+
+    assert predictor.predict_batch(test) == cart_model.predict_batch(test)
+
+def test_saved_id3_predictor_round_trips(id3_model, id3_split, tmp_path):
+    attribute_set, learn_set, test_set = id3_split
+    path = str(tmp_path / 'id3_model.py')
+
+    compiler.save_source(compiler.id3_source(id3_model.root), path)
+    predictor = compiler.load_module(path)
+
+    assert predictor.KIND == 'id3'
+    assert predictor.predict_batch(test_set) == \
+        id3_model.predict_batch(test_set)
+
+def test_saved_cart_predictor_round_trips(cart_model, cart_split, tmp_path):
+    header, train, test = cart_split
+    path = str(tmp_path / 'cart_model.py')
+
+    compiler.save_source(compiler.cart_source(cart_model.tree, header), path)
+    predictor = compiler.load_module(path)
+
+    assert predictor.KIND == 'cart'
+    assert predictor.HEADER == header
+    assert predictor.predict_batch(test) == cart_model.predict_batch(test)
+
+def test_model_inputs_from_raw_rows(cart_model, cart_split):
+    header, train, test = cart_split
+    predictor = compiler.compile_cart(cart_model.tree, header)
+    raw = [dict(zip(header, row)) for row in test[:50]]
+
+    labels = predictor.predict_batch(compiler.model_inputs(predictor, raw))
+
+    assert [compiler.model_label(predictor, label) for label in labels] == \
+        cart_model.predict_batch(test[:50])
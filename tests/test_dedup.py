@@ -0,0 +1,47 @@
+"""
+PURPOSE
+Training on weighted distinct rows grows the trees of training on every
+row.
+
+AUTHOR
+Warren Lacaba
+"""
+from classes.dataset import WEIGHT
+from helpers import cart_differences, id3_differences
+from logic import cart
+from logic import id3
+
+def test_compressed_movies_keep_the_count(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+
+    compressed = id3.compress_movies(learn_set)
+
+    assert sum(movie[WEIGHT] for movie in compressed) == len(learn_set)
+    assert id3.compress_movies(compressed) == compressed
+
+def test_id3_matches_id3_tree(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+
+    expected = id3.id3_tree(learn_set, attribute_set)
+    compressed = id3.id3_tree(id3.compress_movies(learn_set), attribute_set)
+
+    assert id3_differences(compressed, expected) == []
+
+def test_cart_matches_build_tree(cart_split):
+    header, train, test = cart_split
+    schema = cart.Schema(header)
+    rows = train * 3
+
+    weighted_schema, weighted = cart.compress_rows(rows, schema)
+
+    assert len(weighted) <= len(train)
+    assert cart_differences(cart._build_tree(weighted, weighted_schema),
+                            cart._build_tree(rows, schema)) == []
+
+def test_classifiers_predict_the_same(cart_split):
+    header, train, test = cart_split
+
+    plain = cart.CartClassifier(header).fit(train)
+    dedup = cart.CartClassifier(header, dedup=True).fit(train)
+
+    assert dedup.predict_batch(test) == plain.predict_batch(test)
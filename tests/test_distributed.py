@@ -0,0 +1,66 @@
+"""
+PURPOSE
+Trials run on workers score like adaptive.run_trial on the same seed,
+and a dead worker doesn't lose any trials.
+
+AUTHOR
+Warren Lacaba
+"""
+import asyncio
+import socket
+
+import pytest
+
+from logic import adaptive
+from logic import distributed
+
+def _closed_port():
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+def test_run_spec_matches_run_trial(database, cart_data):
+    header, dataset = cart_data
+    worker = distributed.TrialWorker([database])
+    spec, = distributed.make_specs(database, ['cart'], 1, seed=9)
+
+    answer = worker.run_spec(spec)
+
+    assert answer['ok']
+    assert answer['accuracy'] == adaptive.run_trial(header, dataset, 'cart',
+                                                    9)['accuracy']
+
+def test_run_spec_refuses_other_data(database):
+    worker = distributed.TrialWorker()
+    spec, = distributed.make_specs(database, ['cart'], 1)
+    spec['fingerprint'] = '0' * 64
+
+    with pytest.raises(ValueError):
+        worker.run_spec(spec)
+
+def test_coordinator_runs_every_spec(database, cart_data):
+    header, dataset = cart_data
+    specs = distributed.make_specs(database, ['id3', 'cart'], 2, seed=20)
+
+    async def run():
+        workers = [distributed.TrialWorker() for i in range(2)]
+        addresses = [('127.0.0.1', await worker.start('127.0.0.1', 0))
+                     for worker in workers]
+        addresses.append(('127.0.0.1', _closed_port()))
+        try:
+            coordinator = distributed.Coordinator(addresses, max_retries=2,
+                                                  retry_wait=0.01)
+            return await coordinator.run(specs)
+        finally:
+            for worker in workers:
+                await worker.stop()
+
+    results, failures = asyncio.run(run())
+
+    assert failures == []
+    assert [(answer['id'], answer['accuracy']) for answer in results] == [
+        (spec['id'], adaptive.run_trial(header, dataset, spec['algorithm'],
+                                        spec['seed'])['accuracy'])
+        for spec in specs]
@@ -0,0 +1,54 @@
+"""
+PURPOSE
+The estimator classes fit the trees of the module builders, and keep
+their state to themselves.
+
+AUTHOR
+Min Gyu Park
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers import cart_differences, id3_differences
+from logic import cart
+from logic import id3
+
+def test_cart_classifier_fits_build_tree(cart_split):
+    header, train, test = cart_split
+
+    model = cart.CartClassifier(header).fit(train)
+
+    assert cart_differences(model.tree,
+                            cart._build_tree(train, cart.Schema(header))) == []
+    assert model.predict_batch(test) == [model.predict(row) for row in test]
+
+def test_id3_classifier_fits_id3_tree(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+
+    model = id3.ID3Classifier().fit(learn_set)
+
+    assert id3_differences(model.root,
+                           id3.id3_tree(learn_set, attribute_set)) == []
+    assert model.predict_batch(test_set) == [model.predict(movie)
+                                             for movie in test_set]
+
+def test_classifiers_on_different_layouts_run_together(cart_split):
+    header, train, test = cart_split
+    order = list(reversed(range(len(header))))
+    reordered_header = [header[i] for i in order]
+
+    def reorder(rows):
+        return [[row[i] for i in order] for row in rows]
+
+    def fit_predict(job):
+        job_header, job_train, job_test, target = job
+        model = cart.CartClassifier(job_header, target).fit(job_train)
+        return model.predict_batch(job_test)
+
+    jobs = [(header, train, test, 'revenue'),
+            (reordered_header, reorder(train), reorder(test), 'revenue'),
+            (header, train, test, 'prod_budget')] * 2
+
+    with ThreadPoolExecutor(4) as pool:
+        together = list(pool.map(fit_predict, jobs))
+
+    assert together == [fit_predict(job) for job in jobs]
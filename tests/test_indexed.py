@@ -0,0 +1,40 @@
+"""
+PURPOSE
+The index-based builder on the columnar database grows the tree of
+cart._build_tree on the same rows.
+
+AUTHOR
+Min Gyu Park
+"""
+import random
+from array import array
+
+import pytest
+
+from classes.columnar import ColumnarDataset, csv_to_columnar
+from helpers import cart_differences
+from logic import cart
+from logic import indexed
+from logic import memory
+
+@pytest.fixture(scope='module')
+def columnar(database, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('indexed') / 'movies.bin')
+    csv_to_columnar(database, path)
+    with ColumnarDataset(path) as columnar:
+        yield columnar
+
+def test_matches_build_tree(columnar):
+    order = list(range(len(columnar)))
+    random.Random(7).shuffle(order)
+    train = array('I', order[:len(order) // 2])
+
+    tree = indexed.build_indexed_cart(columnar, train)
+    rows = [indexed.row_at(columnar, i) for i in train]
+    expected = cart._build_tree(rows, cart.Schema(columnar.names))
+
+    assert cart_differences(tree, expected) == []
+
+def test_no_budget_keeps_rows_in_memory(database):
+    assert memory.choose_strategy(database, None) == 'memory'
+    assert memory.choose_strategy(database, 1) == 'stream'
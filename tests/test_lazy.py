@@ -0,0 +1,35 @@
+"""
+PURPOSE
+The lazy ID3 tree predicts like the full one, and grows into id3_tree.
+
+AUTHOR
+Warren Lacaba
+"""
+from helpers import id3_differences
+from logic import id3
+
+def test_predicts_like_the_full_tree(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    full = id3.ID3Classifier().fit(learn_set)
+    lazy = id3.LazyID3Classifier().fit(learn_set)
+
+    assert lazy.predict_batch(test_set) == full.predict_batch(test_set)
+    assert lazy.expanded > 0
+
+def test_probabilities_like_the_full_tree(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    full = id3.ID3Classifier().fit(learn_set)
+    lazy = id3.LazyID3Classifier().fit(learn_set)
+
+    assert lazy.classes == full.classes
+    assert lazy.predict_proba(test_set, 1) == full.predict_proba(test_set, 1)
+
+def test_expand_all_is_id3_tree(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    lazy = id3.LazyID3Classifier().fit(learn_set)
+    lazy.predict(test_set[0])
+
+    root = lazy.expand_all()
+
+    assert lazy.pending == {}
+    assert id3_differences(root, id3.id3_tree(learn_set, attribute_set)) == []
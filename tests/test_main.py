@@ -0,0 +1,111 @@
+"""
+PURPOSE
+Command line checks that don't need a full run.
+
+AUTHOR
+Warren Lacaba
+"""
+import csv
+import random
+
+import pytest
+
+import main
+
+def test_train_leaves_global_random_alone(database):
+    random.seed(1)
+    expected = random.random()
+
+    random.seed(1)
+    main._train('cart', database, 0, 0.5)
+
+    assert random.random() == expected
+
+def test_train_split_depends_on_seed_only(database):
+    first = main._train('cart', database, 3, 0.5)
+    second = main._train('cart', database, 3, 0.5)
+
+    assert first[0] == second[0]
+    assert first[2] == second[2]
+
+@pytest.mark.parametrize('argv', [
+    ['--algorithm', 'id3', '--memory-budget', '64'],
+    ['--algorithm', 'cart', '--memory-budget', '64', '--seed', '1'],
+    ['--algorithm', 'cart', '--memory-budget', '64', '--engine', 'bitset'],
+    ['--algorithm', 'cart', '--memory-budget', '64', '--subset-splits'],
+])
+def test_memory_budget_rejects_other_options(argv, capsys):
+    with pytest.raises(SystemExit) as exit:
+        main.main(['evaluate'] + argv)
+
+    assert exit.value.code == 2
+    assert '--memory-budget' in capsys.readouterr().err
+
+def test_cache_needs_seed(capsys):
+    with pytest.raises(SystemExit) as exit:
+        main.main(['evaluate', '--algorithm', 'cart', '--cache'])
+
+    assert exit.value.code == 2
+    assert '--seed' in capsys.readouterr().err
+
+@pytest.mark.parametrize('argv, option', [
+    (['--batch-size', '0'], '--batch-size'),
+    (['--max-trials', '1'], '--max-trials'),
+    (['--confidence', '1'], '--confidence'),
+])
+def test_adaptive_rejects_bad_options(argv, option, capsys):
+    with pytest.raises(SystemExit) as exit:
+        main.main(['adaptive'] + argv)
+
+    assert exit.value.code == 2
+    assert option in capsys.readouterr().err
+
+def test_regression_needs_the_adjusted_column(database, capsys):
+    with pytest.raises(SystemExit) as exit:
+        main.main(['evaluate', '--algorithm', 'regression', '--data',
+                   database])
+
+    assert exit.value.code == 2
+    assert 'clean --adjusted' in capsys.readouterr().err
+
+def test_regression_rejects_columnar(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit:
+        main.main(['evaluate', '--algorithm', 'regression', '--data',
+                   str(tmp_path / 'movies.bin')])
+
+    assert exit.value.code == 2
+    assert 'CSV' in capsys.readouterr().err
+
+def test_regression_runs_on_adjusted_data(database, tmp_path, capsys):
+    path = str(tmp_path / 'adjusted.csv')
+    with open(database, 'r', encoding='utf-8') as read, \
+            open(path, 'w', newline='', encoding='utf-8') as write:
+        rows = csv.DictReader(read)
+        writer = csv.DictWriter(write, rows.fieldnames +
+                                [main.REGRESSION_TARGET])
+        writer.writeheader()
+        for row in rows:
+            row[main.REGRESSION_TARGET] = int(row['revenue']) * 10**6
+            writer.writerow(row)
+
+    main.main(['evaluate', '--algorithm', 'regression', '--data', path,
+               '--trials', '1'])
+
+    assert 'MAE' in capsys.readouterr().out
+
+@pytest.mark.parametrize('argv, flag', [
+    (['--algorithm', 'id3', '--sample-threshold', '10'], '--sample-threshold'),
+    (['--algorithm', 'id3', '--subset-splits'], '--subset-splits'),
+    (['--algorithm', 'boosting', '--sample-delta', '0.1'], '--sample-delta'),
+    (['--algorithm', 'cart', '--sample-delta', '0.1'], '--sample-delta'),
+    (['--algorithm', 'regression', '--engine', 'bitset'], '--engine'),
+    (['--algorithm', 'boosting', '--dedup'], '--dedup'),
+    (['--algorithm', 'regression', '--seed', '1'], '--seed'),
+    (['--algorithm', 'cart', '--rounds', '5'], '--rounds'),
+])
+def test_evaluate_rejects_options_the_algorithm_ignores(argv, flag, capsys):
+    with pytest.raises(SystemExit) as exit:
+        main.main(['evaluate'] + argv)
+
+    assert exit.value.code == 2
+    assert flag in capsys.readouterr().err
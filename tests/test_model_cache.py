@@ -0,0 +1,81 @@
+"""
+PURPOSE
+Trees come back out of the model cache as they went in, and a cached
+run prints what the run that trained the trees printed.
+
+AUTHOR
+Warren Lacaba
+"""
+import os
+
+import pytest
+
+from helpers import cart_differences
+from logic import cart
+from logic.model_cache import ModelCache, cache_key, fingerprint_rows
+
+def test_round_trip(cart_split, tmp_path):
+    header, train, test = cart_split
+    tree = cart._build_tree(train, cart.Schema(header))
+    cache = ModelCache(str(tmp_path))
+    key = cache_key('cart', fingerprint_rows(train), {'subsets': False})
+
+    assert cache.get(key) is None
+    cache.put(key, tree)
+
+    assert cart_differences(cache.get(key), tree) == []
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_get_or_build_builds_once(tmp_path):
+    cache = ModelCache(str(tmp_path))
+    built = []
+
+    def build():
+        built.append(1)
+        return {'tree': len(built)}
+
+    assert cache.get_or_build('key', build) == {'tree': 1}
+    assert cache.get_or_build('key', build) == {'tree': 1}
+    assert len(built) == 1
+
+def test_key_depends_on_everything():
+    key = cache_key('cart', ['abc', 1], {'subsets': False, 'engine': 'rows'})
+
+    assert key == cache_key('cart', ['abc', 1], {'engine': 'rows',
+                                                 'subsets': False})
+    assert key != cache_key('id3', ['abc', 1], {'subsets': False,
+                                                'engine': 'rows'})
+    assert key != cache_key('cart', ['abc', 2], {'subsets': False,
+                                                 'engine': 'rows'})
+    assert key != cache_key('cart', ['abc', 1], {'subsets': True,
+                                                 'engine': 'rows'})
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ModelCache(str(tmp_path), max_bytes=10**9)
+    for name in ('old', 'new'):
+        cache.put(name, 'x' * 1000)
+    os.utime(cache._path('old'), (0, 0))
+
+    cache.max_bytes = 1500
+    assert cache.evict() == 1
+
+    assert cache.get('old') is None
+    assert cache.get('new') == 'x' * 1000
+
+def test_cached_run_prints_the_same(database, tmp_path, capsys,
+                                    monkeypatch):
+    #run_cart writes results.csv to the current directory
+    monkeypatch.chdir(tmp_path)
+    cache = ModelCache(str(tmp_path / 'cache'))
+
+    cart.run_cart(database, 2, seed=5, cache=cache)
+    trained = capsys.readouterr().out
+    cart.run_cart(database, 2, seed=5, cache=cache)
+    cached = capsys.readouterr().out
+
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert trained.split('Model cache')[0] == cached.split('Model cache')[0]
+
+def test_cache_needs_a_seed(database, tmp_path):
+    with pytest.raises(ValueError):
+        cart.run_cart(database, 1, cache=ModelCache(str(tmp_path)))
@@ -0,0 +1,80 @@
+"""
+PURPOSE
+Class probabilities agree with the labels the classifiers predict, and
+each is a distribution over the classifier's classes.
+
+AUTHOR
+Warren Lacaba
+"""
+import random
+from collections import Counter
+
+import pytest
+
+from logic import cart
+from logic import id3
+from logic.probability import distribution, expected_values
+
+def _sums_to_one(probabilities):
+    return all(abs(sum(row) - 1) < 1e-9 for row in probabilities)
+
+def test_cart_argmax_is_the_prediction(cart_split):
+    header, train, test = cart_split
+    model = cart.CartClassifier(header).fit(train)
+
+    probabilities = model.predict_proba(test)
+
+    assert _sums_to_one(probabilities)
+    assert [model.classes[row.index(max(row))] for row in probabilities] == \
+        model.predict_batch(test)
+
+def test_smoothing_leaves_no_zeros(cart_split):
+    header, train, test = cart_split
+    model = cart.CartClassifier(header).fit(train)
+
+    probabilities = model.predict_proba(test, smoothing=1)
+
+    assert _sums_to_one(probabilities)
+    assert min(min(row) for row in probabilities) > 0
+
+def test_id3_prediction_is_most_probable(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    model = id3.ID3Classifier().fit(learn_set)
+
+    probabilities = model.predict_proba(test_set)
+
+    assert _sums_to_one(probabilities)
+    for row, label in zip(probabilities, model.predict_batch(test_set)):
+        if label is not None:
+            assert row[model.classes.index(label)] == max(row)
+
+def test_id3_root_counts_every_movie_once(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    model = id3.ID3Classifier().fit(learn_set)
+
+    assert model.node_counts[id(model.root)] == \
+        Counter(movie[id3.TARGET] for movie in learn_set)
+
+def test_expected_values():
+    classes = ['1', '2', '3']
+    probabilities = [distribution({'1': 1, '3': 3}, classes)] * 2 + \
+        [distribution({}, classes)]
+
+    assert expected_values(probabilities, [1, 2, 3]) == \
+        pytest.approx([2.5, 2.5, 2.0])
+
+def test_run_cart_scores_like_predict_batch(cart_data, monkeypatch,
+                                            tmp_path):
+    monkeypatch.chdir(tmp_path)
+    header, dataset = cart_data
+    schema = cart.Schema(header)
+    train, test = cart.split_dataset(dataset, 0.5, random.Random(1))
+    model = cart.CartClassifier(header).fit(train)
+    labels = model.predict_batch(test)
+
+    assert [cart.predict(cart.classify(row, model.tree)) for row in test] \
+        == labels
+    correct = sum(label == row[schema.target_pos]
+                  for label, row in zip(labels, test))
+    assert cart._get_accuracy(model.tree, test, schema) == \
+        correct / len(test) * 100
@@ -0,0 +1,73 @@
+"""
+PURPOSE
+The regression tree scores splits from running sums exactly like
+partitioning the rows would.
+
+AUTHOR
+Warren Lacaba
+"""
+from logic import cart
+
+def _sse(rows, target_pos):
+    ys = [row[target_pos] for row in rows]
+    mean = sum(ys) / float(len(ys))
+    return sum((y - mean) ** 2 for y in ys)
+
+def _numeric(cart_split):
+    header, train, test = cart_split
+    schema = cart.Schema(header, 'prod_budget')
+    rows = [list(row) for row in train]
+    for row in rows:
+        row[schema.target_pos] = int(row[schema.target_pos])
+    return schema, rows
+
+def test_best_split_matches_partitioning(cart_split):
+    schema, rows = _numeric(cart_split)
+    stats = cart._target_stats(rows, schema.target_pos)
+
+    gain, split_crit = cart._get_best_regression_split(rows, schema, stats)
+
+    current = _sse(rows, schema.target_pos)
+    best = 0
+    for col_num in schema.attributes:
+        for val in cart._get_unique_values(rows, col_num):
+            true_rows, false_rows = cart._partition(
+                rows, cart._SplittingCriterion(col_num, val, ''))
+            if true_rows and false_rows:
+                best = max(best, current - _sse(true_rows, schema.target_pos)
+                           - _sse(false_rows, schema.target_pos))
+
+    true_rows, false_rows = cart._partition(rows, split_crit)
+    split_gain = (current - _sse(true_rows, schema.target_pos) -
+                  _sse(false_rows, schema.target_pos))
+    assert abs(gain - best) < 1e-6 * current
+    assert abs(split_gain - best) < 1e-6 * current
+
+def test_leaves_hold_the_mean(cart_split):
+    schema, rows = _numeric(cart_split)
+    tree = cart._build_regression_tree(rows, schema, max_depth=3)
+
+    leaves = {}
+    for row in rows:
+        node = tree
+        while isinstance(node, cart._SplittingNode):
+            node = (node.true_branch if node.split_crit.match(row)
+                    else node.false_branch)
+        leaves.setdefault(id(node), (node, []))[1].append(row)
+
+    for leaf, leaf_rows in leaves.values():
+        assert leaf.size == len(leaf_rows)
+        mean = sum(row[schema.target_pos] for row in leaf_rows) / \
+            float(len(leaf_rows))
+        assert abs(leaf.value - mean) < 1e-9
+        assert cart.regress(leaf_rows[0], tree) == leaf.value
+
+def test_constant_target_is_one_leaf(cart_split):
+    schema, rows = _numeric(cart_split)
+    for row in rows:
+        row[schema.target_pos] = 7
+
+    tree = cart._build_regression_tree(rows, schema)
+
+    assert isinstance(tree, cart._MeanLeaf)
+    assert tree.value == 7
@@ -0,0 +1,73 @@
+"""
+PURPOSE
+The rule trie and the rule exports hold the rules of the tree they came
+from.
+
+AUTHOR
+Warren Lacaba
+"""
+import csv
+import io
+import json
+
+import pytest
+
+from classes.rules import ANY, RuleTrie, write_rules_csv, write_rules_json
+from classes.tree import Tree
+from logic import id3
+
+ATTRIBUTES = ['genre', 'company', 'release', 'prod_budget']
+
+@pytest.fixture(scope='module')
+def rules(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    return list(Tree(id3.id3_tree(learn_set, attribute_set)).rule_tuples())
+
+def _fires(conditions, movie, partial):
+    return all(movie[attribute] == value if attribute in movie else partial
+               for attribute, value in conditions)
+
+def test_trie_holds_every_rule_once(rules):
+    trie = RuleTrie(rules)
+
+    assert len(trie) == len(rules)
+    assert sorted(trie) == sorted(rules)
+    assert trie.num_nodes <= 1 + sum(len(conditions)
+                                     for conditions, label in rules)
+
+def test_full_movie_fires_its_rule(rules, id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    trie = RuleTrie(rules)
+
+    for movie in test_set[:200]:
+        assert sorted(trie.matching(movie, partial=False)) == \
+            sorted(rule for rule in rules if _fires(rule[0], movie, False))
+
+def test_partial_movie_fires_every_possible_rule(rules, id3_split):
+    attribute_set, learn_set, test_set = id3_split
+    trie = RuleTrie(rules)
+
+    for movie in test_set[:200]:
+        partial = {'genre': movie['genre'], 'release': movie['release']}
+        assert sorted(trie.matching(partial)) == \
+            sorted(rule for rule in rules if _fires(rule[0], partial, True))
+
+def test_csv_marks_untested_attributes(rules):
+    write = io.StringIO(newline='')
+    assert write_rules_csv(rules, write, ATTRIBUTES) == len(rules)
+
+    read = list(csv.DictReader(io.StringIO(write.getvalue())))
+    assert len(read) == len(rules)
+    for row, (conditions, label) in zip(read, rules):
+        tested = dict(conditions)
+        assert row['revenue'] == label
+        for attribute in ATTRIBUTES:
+            assert row[attribute] == tested.get(attribute, ANY)
+
+def test_json_round_trip(rules):
+    write = io.StringIO()
+    assert write_rules_json(rules, write) == len(rules)
+
+    read = json.loads(write.getvalue())
+    assert [(tuple(map(tuple, rule['conditions'])), rule['label'])
+            for rule in read] == rules
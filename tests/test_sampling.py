@@ -0,0 +1,45 @@
+"""
+PURPOSE
+Sampled split search grows the exact tree when nodes are small, and
+picks the exact split at a large node.
+
+AUTHOR
+Warren Lacaba
+"""
+from helpers import cart_differences
+from logic import cart
+
+def test_small_nodes_are_exact(cart_split):
+    header, train, test = cart_split
+    schema = cart.Schema(header)
+    sampling = cart.SplitSampling(threshold=len(train), seed=1)
+
+    sampled = cart._build_tree(train, schema, sampling)
+
+    assert cart_differences(sampled, cart._build_tree(train, schema)) == []
+    assert sampling.sampled == sampling.fallbacks == 0
+
+def test_large_node_finds_the_exact_split(cart_data):
+    header, dataset = cart_data
+    schema = cart.Schema(header)
+    rows = dataset * 20
+    sampling = cart.SplitSampling(threshold=1000, seed=1)
+
+    gain, split_crit = cart._get_sampled_split(rows, schema, sampling)
+    exact_gain, exact_crit = cart._get_best_split(rows, schema)
+
+    assert sampling.sampled + sampling.fallbacks == 1
+    assert (split_crit.attr_col_num, split_crit.value) == \
+        (exact_crit.attr_col_num, exact_crit.value)
+
+def test_same_seed_same_tree(cart_split):
+    header, train, test = cart_split
+    schema = cart.Schema(header)
+    rows = train * 3
+
+    first = cart._build_tree(rows, schema, cart.SplitSampling(
+        threshold=500, sample_size=1000, seed=3))
+    second = cart._build_tree(rows, schema, cart.SplitSampling(
+        threshold=500, sample_size=1000, seed=3))
+
+    assert cart_differences(first, second) == []
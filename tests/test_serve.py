@@ -0,0 +1,116 @@
+"""
+PURPOSE
+The prediction server scores micro-batches like the model does, and a
+bad request only fails itself.
+
+AUTHOR
+Warren Lacaba
+"""
+import asyncio
+import json
+
+import pytest
+
+from logic import cart
+from logic import compiler
+from logic.serve import PredictionServer
+
+GOOD = {'genre': 'Action', 'company': 'Other', 'release': '12',
+        'prod_budget': '3'}
+
+@pytest.fixture(scope='module')
+def predictor(cart_split):
+    header, train, test = cart_split
+    model = cart.CartClassifier(header).fit(train)
+    return compiler.compile_cart(model.tree, header)
+
+def test_bad_row_only_fails_itself(predictor):
+    async def run():
+        #A long wait puts all four requests in one batch
+        server = PredictionServer(predictor, max_batch_size=64,
+                                  max_wait=0.05)
+        await server.start('127.0.0.1', 0)
+        try:
+            return await asyncio.gather(
+                server.predict(GOOD), server.predict({'genre': 'Action'}),
+                server.predict(dict(GOOD, unknown='x')),
+                server.predict(GOOD), return_exceptions=True)
+        finally:
+            await server.stop()
+
+    results = asyncio.run(run())
+    expected = predictor.predict(compiler.model_input(predictor, GOOD))
+
+    assert results[0] == expected and results[3] == expected
+    assert isinstance(results[1], ValueError)
+    assert isinstance(results[2], ValueError)
+
+def test_pipelined_responses_in_order(predictor, cart_split):
+    header, train, test = cart_split
+    rows = [{name: value for name, value in zip(header, row)
+             if name != 'revenue'} for row in test[:20]]
+
+    async def run():
+        server = PredictionServer(predictor)
+        port = await server.start('127.0.0.1', 0)
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            lines = [json.dumps(row) for row in rows[:10]] + ['not json'] + \
+                [json.dumps(row) for row in rows[10:]]
+            writer.write(('\n'.join(lines) + '\n').encode())
+            await writer.drain()
+            answers = [json.loads(await reader.readline())
+                       for line in lines]
+            writer.close()
+            return answers
+        finally:
+            await server.stop()
+
+    answers = asyncio.run(run())
+    predictions = predictor.predict_batch(compiler.model_inputs(predictor,
+                                                                rows))
+
+    assert 'error' in answers[10]
+    del answers[10]
+    assert [answer['prediction'] for answer in answers] == predictions
+
+def test_stop_ends_open_connections(predictor):
+    async def run():
+        server = PredictionServer(predictor)
+        port = await server.start('127.0.0.1', 0)
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        #Let the server pick up the connection
+        await asyncio.sleep(0.05)
+        handlers = len(server._handlers)
+        await asyncio.wait_for(server.stop(), 5)
+        closed = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return handlers, len(server._handlers), closed
+
+    assert asyncio.run(run()) == (1, 0, b'')
+
+def test_long_line_gets_an_error_and_hangs_up(predictor):
+    async def run():
+        server = PredictionServer(predictor)
+        port = await server.start('127.0.0.1', 0)
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write((json.dumps(GOOD) + '\n').encode())
+            writer.write(b'x' * 2**17 + b'\n')
+            await writer.drain()
+            answers = [json.loads(await asyncio.wait_for(reader.readline(),
+                                                         5))
+                       for i in range(2)]
+            closed = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            #The handler is gone once the connection is
+            await asyncio.sleep(0.05)
+            return answers, closed, len(server._handlers)
+        finally:
+            await server.stop()
+
+    answers, closed, handlers = asyncio.run(run())
+
+    assert 'prediction' in answers[0]
+    assert 'too long' in answers[1]['error']
+    assert (closed, handlers) == (b'', 0)
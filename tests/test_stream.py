@@ -0,0 +1,37 @@
+"""
+PURPOSE
+The streaming builders grow the same trees as the in-memory ones.
+
+AUTHOR
+Warren Lacaba
+"""
+from helpers import cart_differences, id3_differences
+from logic import cart
+from logic import id3
+from logic import stream
+
+def test_stream_id3_matches_id3_tree(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+
+    expected = id3.id3_tree(learn_set, attribute_set)
+    streamed = stream.stream_id3(lambda: iter(learn_set), attribute_set)
+
+    assert id3_differences(streamed, expected) == []
+
+def test_stream_cart_matches_build_tree(cart_split):
+    header, train, test = cart_split
+
+    expected = cart._build_tree(train, cart.Schema(header))
+    streamed = stream.stream_cart(lambda: iter(train), header)
+
+    assert cart_differences(streamed, expected) == []
+
+def test_split_source_replays_the_same_split(database):
+    def source():
+        return stream.cart_rows(database)
+
+    learn = stream.split_source(source, 7, 0.5, True)
+    test = stream.split_source(source, 7, 0.5, False)
+
+    assert list(learn()) == list(learn())
+    assert len(list(learn())) + len(list(test())) == len(list(source()))
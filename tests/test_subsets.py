@@ -0,0 +1,47 @@
+"""
+PURPOSE
+With two classes, the subset split found from the class ordering is the
+best of every subset of values.
+
+AUTHOR
+Min Gyu Park
+"""
+from itertools import combinations
+
+import pytest
+
+from logic import cart
+
+def _two_classes(cart_split):
+    header, train, test = cart_split
+    schema = cart.Schema(header)
+    rows = [list(row) for row in train]
+    for row in rows:
+        row[schema.target_pos] = ('high' if int(row[schema.target_pos]) >= 4
+                                  else 'low')
+    return schema, rows
+
+@pytest.mark.parametrize('attribute', ['release', 'prod_budget'])
+def test_ordering_finds_the_best_subset(cart_split, attribute):
+    schema, rows = _two_classes(cart_split)
+    col_num = schema.header.index(attribute)
+    target_pos = schema.target_pos
+    current = cart._gini(rows, target_pos)
+    class_counts = cart._count_class_values(rows, target_pos)
+
+    gain, split_crit = cart._best_subset_split(rows, schema, col_num,
+                                               current, class_counts)
+
+    values = sorted(cart._get_unique_values(rows, col_num))
+    best = 0
+    for size in range(1, len(values)):
+        for subset in combinations(values, size):
+            true_rows, false_rows = cart._partition(
+                rows, cart._SubsetCriterion(col_num, subset, attribute))
+            best = max(best, cart._info_gain(true_rows, false_rows, current,
+                                             target_pos))
+
+    true_rows, false_rows = cart._partition(rows, split_crit)
+    assert abs(gain - best) < 1e-12
+    assert abs(cart._info_gain(true_rows, false_rows, current, target_pos)
+               - best) < 1e-12
@@ -0,0 +1,73 @@
+"""
+PURPOSE
+The maximal trees of a sweep are the trees of the plain builders, and
+a setting scores like the classifier it stands for.
+
+AUTHOR
+Warren Lacaba
+"""
+from helpers import cart_differences
+from logic import cart
+from logic import id3
+from logic import sweep
+
+def _id3_differences(tree, node, i=0, path=()):
+    """
+    Compare the maximal ID3 tree below node i with a Node tree
+    """
+    children = tree.children[i]
+    if not children:
+        counts = tree.counts[i]
+        if node.children or counts.get(node.label) != max(counts.values()):
+            return [(path, (node.label, counts))]
+        return []
+
+    if node.label != tree.test[i] or node.branches != list(children):
+        return [(path, (node.label, node.branches, tree.test[i],
+                        list(children)))]
+
+    differences = []
+    for branch, child in zip(node.branches, node.children):
+        differences.extend(_id3_differences(tree, child, children[branch],
+                                            path + (branch,)))
+    return differences
+
+def test_grow_cart_matches_build_tree(cart_split):
+    header, train, test = cart_split
+    schema = cart.Schema(header)
+
+    tree = sweep.grow_cart(train, schema)
+    full = sweep.to_cart_tree(tree, sweep.stop_nodes(tree, sweep.Setting()))
+
+    assert cart_differences(full, cart._build_tree(train, schema)) == []
+
+def test_grow_id3_matches_id3_tree(id3_split):
+    attribute_set, learn_set, test_set = id3_split
+
+    tree = sweep.grow_id3(learn_set, attribute_set)
+
+    assert _id3_differences(tree, id3.id3_tree(learn_set, attribute_set)) == []
+
+def test_unlimited_setting_scores_like_the_classifier(cart_split):
+    header, train, test = cart_split
+    schema = cart.Schema(header)
+    actual = [row[schema.target_pos] for row in test]
+
+    tree = sweep.grow_cart(train, schema)
+    accuracy, = sweep.score_settings(tree, [sweep.Setting()], test, actual)
+
+    model = cart.CartClassifier(header).fit(train)
+    predictions = model.predict_batch(test)
+    expected = sum(p == a for p, a in zip(predictions, actual)) / len(test)
+
+    assert accuracy == expected * 100
+
+def test_depth_limit_truncates(cart_split):
+    header, train, test = cart_split
+    tree = sweep.grow_cart(train, cart.Schema(header))
+
+    stop = sweep.stop_nodes(tree, sweep.Setting(max_depth=1))
+
+    assert sweep.num_leaves(tree, stop) == 2
+    assert sweep.num_leaves(tree, sweep.stop_nodes(tree, sweep.Setting(
+        alpha=1.0))) == 1